@@ -2,12 +2,13 @@ from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.security import decode_access_token
 from app.db.models import User
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
@@ -21,32 +22,43 @@ def _extract_token(request: Request, bearer_token: str | None) -> str | None:
     return None
 
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db),
-    token: str | None = Depends(oauth2_scheme),
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _token_user_id(request: Request, token: str | None, *, required: bool) -> str | None:
     resolved_token = _extract_token(request, token)
     if not resolved_token:
-        raise credentials_exception
+        if required:
+            raise _credentials_exception()
+        return None
 
     try:
         payload = decode_access_token(resolved_token)
-        user_id: str | None = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError as exc:
-        raise credentials_exception from exc
+        if required:
+            raise _credentials_exception() from exc
+        return None
+
+    user_id: str | None = payload.get("sub")
+    if not user_id and required:
+        raise _credentials_exception()
+    return user_id or None
+
 
+def get_current_user(
+    request: Request,
+    db: Session = Depends(get_db),
+    token: str | None = Depends(oauth2_scheme),
+) -> User:
+    user_id = _token_user_id(request, token, required=True)
     user = db.scalar(select(User).where(User.id == user_id))
     if not user:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
@@ -55,22 +67,51 @@ def get_optional_current_user(
     db: Session = Depends(get_db),
     token: str | None = Depends(oauth2_scheme),
 ) -> User | None:
-    resolved_token = _extract_token(request, token)
-    if not resolved_token:
+    user_id = _token_user_id(request, token, required=False)
+    if user_id is None:
         return None
+    return db.scalar(select(User).where(User.id == user_id))
 
-    try:
-        payload = decode_access_token(resolved_token)
-        user_id: str | None = payload.get("sub")
-        if not user_id:
-            return None
-    except JWTError:
-        return None
 
-    return db.scalar(select(User).where(User.id == user_id))
+async def get_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    token: str | None = Depends(oauth2_scheme),
+) -> User:
+    """Same as ``get_current_user`` but loads the user into the request's ``AsyncSession``.
+
+    The read transaction is committed straight away so routes that go on to await the LLM or
+    the code runner do not hold a pooled connection meanwhile; ``expire_on_commit=False``
+    keeps the loaded user usable, and the next query checks a connection out again.
+    """
+    user_id = _token_user_id(request, token, required=True)
+    user = await db.scalar(select(User).where(User.id == user_id))
+    await db.commit()
+    if not user:
+        raise _credentials_exception()
+    return user
+
+
+async def get_optional_current_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    token: str | None = Depends(oauth2_scheme),
+) -> User | None:
+    user_id = _token_user_id(request, token, required=False)
+    if user_id is None:
+        return None
+    user = await db.scalar(select(User).where(User.id == user_id))
+    await db.commit()
+    return user
 
 
 def get_current_admin(user: User = Depends(get_current_user)) -> User:
     if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
+
+
+def get_current_admin_async(user: User = Depends(get_current_user_async)) -> User:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -1,12 +1,15 @@
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import desc, func, select
+from sqlalchemy import desc, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_admin
+from app.api.deps import get_current_admin, get_current_admin_async
 from app.db.models import (
+    CodingChallenge,
     Course,
+    EventDailyRollup,
     EventLog,
     LearningTrack,
     Lesson,
@@ -16,10 +19,11 @@ from app.db.models import (
     Subscription,
     User,
 )
-from app.db.session import get_db
+from app.db.session import engine, get_async_db, get_db
 from app.schemas.admin import (
     AdminAnalyticsResponse,
     AdminHealthResponse,
+    ChallengeRegradeResponse,
     CourseAdminUpdate,
     LessonAdminUpdate,
     ModuleAdminUpdate,
@@ -27,10 +31,16 @@ from app.schemas.admin import (
     TrackAdminUpdate,
 )
 from app.services.audit import log_event
+from app.services.code_runner import code_runner_service, format_grade_output, gradable_cases, submission_usage
+from app.services.curriculum_cache import curriculum_cache
+from app.services.event_storage import event_storage_service
 from app.services.observability import observability_service
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+REGRADE_BATCH_SIZE = 200
+MAX_RUNNABLE_CODE_LENGTH = 20000
+
 
 @router.get("/analytics", response_model=AdminAnalyticsResponse)
 def analytics(
@@ -77,18 +87,25 @@ def health(
         slow_requests=snapshot.slow_requests,
         routes=snapshot.routes,
         slow_queries=observability_service.slow_queries(),
+        components=observability_service.component_stats(),
     )
 
 
 @router.get("/events")
 def recent_events(
     limit: int = 100,
+    days: int = 7,
+    before: datetime | None = None,
     db: Session = Depends(get_db),
     _: User = Depends(get_current_admin),
 ) -> list[dict]:
-    rows = db.scalars(
-        select(EventLog).order_by(desc(EventLog.created_at)).limit(max(1, min(limit, 300)))
-    ).all()
+    # Always bound created_at so Postgres only scans the partitions for this window; page
+    # further back by passing the last created_at as ``before``.
+    until = before or datetime.utcnow()
+    query = select(EventLog).where(EventLog.created_at >= until - timedelta(days=max(1, min(days, 93))))
+    if before is not None:
+        query = query.where(EventLog.created_at < before)
+    rows = db.scalars(query.order_by(desc(EventLog.created_at)).limit(max(1, min(limit, 300)))).all()
     return [
         {
             "id": row.id,
@@ -104,6 +121,38 @@ def recent_events(
     ]
 
 
+@router.get("/events/rollups")
+def event_rollups(
+    days: int = 30,
+    source: str | None = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin),
+) -> list[dict]:
+    query = select(EventDailyRollup).where(
+        EventDailyRollup.day >= date.today() - timedelta(days=max(1, min(days, 3660)) - 1)
+    )
+    if source:
+        query = query.where(EventDailyRollup.source == source)
+    rows = db.scalars(query.order_by(desc(EventDailyRollup.day), EventDailyRollup.event_type)).all()
+    return [
+        {
+            "day": row.day.isoformat(),
+            "source": row.source,
+            "event_type": row.event_type,
+            "event_count": row.event_count,
+            "amount_total": row.amount_total,
+        }
+        for row in rows
+    ]
+
+
+@router.post("/events/maintenance")
+def run_event_maintenance(
+    _: User = Depends(get_current_admin),
+) -> dict:
+    return event_storage_service.run_maintenance(engine)
+
+
 @router.get("/subscriptions", response_model=list[SubscriptionOverview])
 def subscriptions(
     db: Session = Depends(get_db),
@@ -170,12 +219,14 @@ def update_course(
     log_event(
         db,
         "admin.course_updated",
+        transactional=True,
         user_id=current_user.id,
         entity_type="course",
         entity_id=str(course.id),
         payload=payload.model_dump(exclude_none=True),
     )
     db.commit()
+    curriculum_cache.invalidate()
     return {"success": True, "course_id": course.id}
 
 
@@ -221,12 +272,14 @@ def update_module(
     log_event(
         db,
         "admin.module_updated",
+        transactional=True,
         user_id=current_user.id,
         entity_type="module",
         entity_id=str(module.id),
         payload=payload.model_dump(exclude_none=True),
     )
     db.commit()
+    curriculum_cache.invalidate()
     return {"success": True, "module_id": module.id}
 
 
@@ -278,12 +331,14 @@ def update_lesson(
     log_event(
         db,
         "admin.lesson_updated",
+        transactional=True,
         user_id=current_user.id,
         entity_type="lesson",
         entity_id=str(lesson.id),
         payload=payload.model_dump(exclude_none=True),
     )
     db.commit()
+    curriculum_cache.invalidate()
     return {"success": True, "lesson_id": lesson.id}
 
 
@@ -332,6 +387,7 @@ def update_track(
     log_event(
         db,
         "admin.track_updated",
+        transactional=True,
         user_id=current_user.id,
         entity_type="track",
         entity_id=str(track.id),
@@ -339,3 +395,71 @@ def update_track(
     )
     db.commit()
     return {"success": True, "track_id": track.id}
+
+
+@router.post("/challenges/{challenge_id}/regrade", response_model=ChallengeRegradeResponse)
+async def regrade_challenge(
+    challenge_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_async),
+) -> ChallengeRegradeResponse:
+    challenge = await db.scalar(select(CodingChallenge).where(CodingChallenge.id == challenge_id))
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+    cases = gradable_cases(challenge.tests_json)
+    if not cases:
+        raise HTTPException(status_code=400, detail="Challenge has no gradable test cases")
+
+    rows = (
+        await db.execute(
+            select(Submission.id, Submission.code, Submission.passed).where(Submission.challenge_id == challenge_id)
+        )
+    ).all()
+    # No connection is held while the runner grades a batch; each batch is committed on its own
+    # so an interrupted re-grade keeps the work already done.
+    await db.commit()
+    previously_passed = {row.id: row.passed for row in rows}
+    runnable = [row for row in rows if row.code and len(row.code) <= MAX_RUNNABLE_CODE_LENGTH]
+
+    regraded = changed = 0
+    for start in range(0, len(runnable), REGRADE_BATCH_SIZE):
+        jobs = [
+            {"id": row.id, "code": row.code, "cases": cases}
+            for row in runnable[start : start + REGRADE_BATCH_SIZE]
+        ]
+        updates: list[dict] = []
+        async for item in code_runner_service.run_batch(jobs):
+            result = item.get("result")
+            if result is None:
+                continue
+            updates.append(
+                {
+                    "id": item["id"],
+                    "passed": result["verdict"] == "passed",
+                    "output": format_grade_output(result),
+                    **submission_usage(result),
+                }
+            )
+        if updates:
+            await db.execute(update(Submission), updates)
+            await db.commit()
+        regraded += len(updates)
+        changed += sum(1 for item in updates if item["passed"] != previously_passed[item["id"]])
+
+    await db.run_sync(
+        log_event,
+        "admin.challenge_regraded",
+        transactional=True,
+        user_id=current_user.id,
+        entity_type="challenge",
+        entity_id=str(challenge_id),
+        payload={"regraded": regraded, "changed": changed},
+    )
+    await db.commit()
+    return ChallengeRegradeResponse(
+        challenge_id=challenge_id,
+        total_submissions=len(rows),
+        regraded=regraded,
+        changed=changed,
+        errors=len(rows) - regraded,
+    )
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user_async
 from app.db.models import User
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.ai import (
     AITutorResponse,
     DebugCodeRequest,
@@ -13,6 +17,7 @@ from app.schemas.ai import (
 )
 from app.core.config import settings
 from app.services.ai_tutor import ai_tutor_service
+from app.services.llm_deadline import llm_deadlines
 from app.services.product_growth import product_growth_service
 
 router = APIRouter(prefix="/ai", tags=["ai"])
@@ -37,22 +42,63 @@ def _consume_or_raise(db: Session, user: User) -> None:
         pass
 
 
+def _has_priority(db: Session, user: User) -> bool:
+    try:
+        return product_growth_service.has_priority_queue(db, user)
+    except Exception:
+        # Database not available, use the normal lane
+        return False
+
+
+def _refund(db: Session, user: User) -> None:
+    if settings.use_offline_ai:
+        return
+    try:
+        product_growth_service.refund_ai_credit(db, user, amount=1)
+    except Exception:
+        print("Database not available, skipping credit refund")
+
+
+@asynccontextmanager
+async def _charged_call(db: AsyncSession, user: User) -> AsyncIterator[bool]:
+    """Charge one AI credit and yield the learner's priority lane for the LLM call.
+
+    The charge is committed before the call so no pooled connection is held during the LLM
+    wait; it is refunded in a new transaction if the call fails.
+    """
+    await db.run_sync(_consume_or_raise, user)
+    priority = await db.run_sync(_has_priority, user)
+    await db.commit()
+    try:
+        yield priority
+    except BaseException:
+        await db.run_sync(_refund, user)
+        await db.commit()
+        raise
+
+
 @router.post("/explain", response_model=AITutorResponse)
 async def explain_concept(
     payload: ExplainConceptRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> AITutorResponse:
-    _consume_or_raise(db, current_user)
-
-    response = await ai_tutor_service.explain_concept(
-        topic=payload.topic,
-        level=payload.student_level,
-        context=payload.context,
-    )
-
-    entitlements = product_growth_service.get_entitlements(db, current_user)
-    db.commit()
+    async with _charged_call(db, current_user) as priority:
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: ai_tutor_service.explain_concept(
+                topic=payload.topic,
+                level=payload.student_level,
+                context=payload.context,
+                user_key=current_user.id,
+                priority=priority,
+            ),
+        )
+
+    entitlements = await db.run_sync(product_growth_service.get_entitlements, current_user)
+    await db.commit()
 
     return AITutorResponse(
         response=response,
@@ -63,18 +109,24 @@ async def explain_concept(
 @router.post("/debug", response_model=AITutorResponse)
 async def debug_code(
     payload: DebugCodeRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> AITutorResponse:
-    _consume_or_raise(db, current_user)
-
-    response = await ai_tutor_service.debug_code(
-        code=payload.code,
-        error_message=payload.error_message,
-    )
-
-    entitlements = product_growth_service.get_entitlements(db, current_user)
-    db.commit()
+    async with _charged_call(db, current_user) as priority:
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: ai_tutor_service.debug_code(
+                code=payload.code,
+                error_message=payload.error_message,
+                user_key=current_user.id,
+                priority=priority,
+            ),
+        )
+
+    entitlements = await db.run_sync(product_growth_service.get_entitlements, current_user)
+    await db.commit()
 
     return AITutorResponse(
         response=response,
@@ -85,20 +137,26 @@ async def debug_code(
 @router.post("/practice", response_model=PracticeProblemResponse)
 async def generate_practice_problem(
     payload: PracticeProblemRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> PracticeProblemResponse:
-    _consume_or_raise(db, current_user)
-
-    generated = await ai_tutor_service.generate_practice(
-        topic=payload.topic,
-        difficulty=payload.difficulty,
-    )
+    async with _charged_call(db, current_user) as priority:
+        generated = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: ai_tutor_service.generate_practice(
+                topic=payload.topic,
+                difficulty=payload.difficulty,
+                user_key=current_user.id,
+                priority=priority,
+            ),
+        )
 
     # Handle database availability
     try:
-        entitlements = product_growth_service.get_entitlements(db, current_user)
-        db.commit()
+        entitlements = await db.run_sync(product_growth_service.get_entitlements, current_user)
+        await db.commit()
         ai_credits = entitlements["ai_credits_remaining"]
     except Exception:
         # Database not available, provide default values
@@ -3,13 +3,13 @@ AI Tutor Chat Router - Supports offline local LLM
 """
 
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_optional_current_user
+from app.api.deps import get_current_user_async, get_optional_current_user_async
 from app.db.models import User
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.ai import (
     AITutorResponse,
     DebugCodeRequest,
@@ -17,7 +17,11 @@ from app.schemas.ai import (
     PracticeProblemRequest,
     PracticeProblemResponse,
 )
+from app.services.chat_stream import TutorStream, chat_stream_registry
+from app.services.llm_deadline import llm_deadlines
+from app.services.llm_scheduler import llm_scheduler
 from app.services.offline_ai_tutor import offline_ai_tutor_service
+from app.services.ollama_health import ollama_health_monitor
 from app.core.config import settings
 import tempfile
 import os
@@ -43,6 +47,22 @@ def _is_local_tutor_unavailable(content: str) -> bool:
     )
 
 
+async def _has_priority(db: AsyncSession, user: User | None) -> bool:
+    """Premium learners (priority_debug_queue) use the LLM scheduler's priority lane.
+
+    This is the last read before the LLM wait, so it also ends the transaction and hands the
+    pooled connection back.
+    """
+    if user is None:
+        return False
+    try:
+        return await db.run_sync(product_growth_service.has_priority_queue, user)
+    except Exception:
+        return False
+    finally:
+        await db.commit()
+
+
 class ChatRequest(BaseModel):
     """Chat message request"""
     message: str
@@ -74,8 +94,9 @@ user_chats = {}
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_tutor(
     payload: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User | None = Depends(get_optional_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User | None = Depends(get_optional_current_user_async),
 ) -> ChatResponse:
     """
     Chat with the offline AI tutor.
@@ -99,12 +120,18 @@ async def chat_with_tutor(
         if current_user is not None and hasattr(current_user, "id"):
             user_key = str(current_user.id)
 
-        response = await offline_ai_tutor_service.chat(
-            payload.message.strip(),
-            mode=payload.mode,
-            language=payload.language,
-            user_name=user_name,
-            user_key=user_key,
+        priority = await _has_priority(db, current_user)
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_chat_budget_sec,
+            lambda: offline_ai_tutor_service.chat(
+                payload.message.strip(),
+                mode=payload.mode,
+                language=payload.language,
+                user_name=user_name,
+                user_key=user_key,
+                priority=priority,
+            ),
         )
 
         if _is_local_tutor_unavailable(response):
@@ -130,80 +157,117 @@ async def chat_with_tutor(
         )
 
 
+def _sse_response(stream: TutorStream, request: Request, after: int = 0) -> StreamingResponse:
+    return StreamingResponse(
+        chat_stream_registry.subscribe(stream, after, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/chat-stream")
-async def chat_stream_with_tutor(payload: ChatRequest, current_user: User | None = Depends(get_optional_current_user)):
+async def chat_stream_with_tutor(
+    payload: ChatRequest,
+    request: Request,
+    last_event_id: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User | None = Depends(get_optional_current_user_async),
+):
     """
-    Stream chat responses from the AI tutor (word-by-word, real-time).
-    Much faster perceived response time!
+    Stream chat responses from the AI tutor as server-sent events.
+    Each ``data:`` frame is ``{"text": ...}`` with an ``id`` of ``<stream>:<seq>``; the stream
+    ends with an ``event: done`` frame carrying token and timing stats. Re-POST with a
+    ``Last-Event-ID`` header to resume a dropped stream.
     Modes: general, explain, debug, practice
     """
+    user_key = str(current_user.id) if current_user is not None and hasattr(current_user, "id") else "global"
+
+    if last_event_id:
+        stream_id, _, seq = last_event_id.partition(":")
+        stream = chat_stream_registry.get(stream_id, user_key)
+        if stream is None:
+            raise HTTPException(status_code=404, detail="Stream can no longer be resumed")
+        chat_stream_registry.resumed += 1
+        return _sse_response(stream, request, after=int(seq) if seq.isdigit() else 0)
+
     if not payload.message or not payload.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
     if payload.mode not in ["general", "explain", "debug", "practice"]:
         raise HTTPException(status_code=400, detail="Invalid mode. Use: general, explain, debug, practice")
 
-    async def generate():
-        try:
-            # Pass optional user name for personalization in streaming responses
-            user_name = None
-            user_key = "global"
-            if current_user is not None and hasattr(current_user, "full_name") and current_user.full_name:
-                user_name = current_user.full_name
-            elif current_user is not None and hasattr(current_user, "email"):
-                user_name = current_user.email.split("@")[0]
-            if current_user is not None and hasattr(current_user, "id"):
-                user_key = str(current_user.id)
-
-            async for chunk in offline_ai_tutor_service.chat_stream(
+    # Pass optional user name for personalization in streaming responses
+    user_name = None
+    if current_user is not None and hasattr(current_user, "full_name") and current_user.full_name:
+        user_name = current_user.full_name
+    elif current_user is not None and hasattr(current_user, "email"):
+        user_name = current_user.email.split("@")[0]
+
+    priority = await _has_priority(db, current_user)
+    with llm_deadlines.budget(settings.llm_stream_budget_sec):
+        # Admit before the response starts so an overloaded tutor still answers with a real 503.
+        ticket = await llm_scheduler.acquire(user_key, priority)
+
+        # The generation runs as its own task (inheriting the deadline) and releases the slot
+        # when it ends or is abandoned.
+        stats: dict = {}
+        stream = chat_stream_registry.start(
+            offline_ai_tutor_service.chat_stream(
                 payload.message.strip(),
                 mode=payload.mode,
                 language=payload.language,
                 user_name=user_name,
                 user_key=user_key,
-            ):
-                if chunk:
-                    yield chunk
-        except Exception as e:
-            yield f"Error: {str(e)}"
-
-    return StreamingResponse(generate(), media_type="text/event-stream")
+                stats=stats,
+            ),
+            owner_key=user_key,
+            on_finish=lambda: llm_scheduler.release(ticket),
+            stats=stats,
+        )
+    return _sse_response(stream, request)
 
 
 
 @router.get("/history")
-async def get_chat_history(current_user: User | None = Depends(get_optional_current_user)) -> list[dict]:
+async def get_chat_history(current_user: User | None = Depends(get_optional_current_user_async)) -> list[dict]:
     """Get conversation history with AI tutor for the logged-in user"""
     if not current_user:
         return []
     user_key = str(current_user.id)
-    return offline_ai_tutor_service.get_conversation_history(user_key=user_key)
+    return await offline_ai_tutor_service.get_conversation_history(user_key=user_key)
 
 
 @router.post("/clear-history")
-async def clear_chat_history(current_user: User | None = Depends(get_optional_current_user)) -> dict:
+async def clear_chat_history(current_user: User | None = Depends(get_optional_current_user_async)) -> dict:
     """Clear conversation history for the logged-in user"""
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required to clear history")
     user_key = str(current_user.id)
-    offline_ai_tutor_service.clear_history(user_key=user_key)
+    await offline_ai_tutor_service.clear_history(user_key=user_key)
     return {"status": "success", "message": "Conversation history cleared"}
 
 
 @router.post("/explain", response_model=AITutorResponse)
 async def explain_concept(
     payload: ExplainConceptRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> AITutorResponse:
     """Explain a Python concept"""
     try:
         user_key = str(current_user.id) if current_user is not None else "global"
-        response = await offline_ai_tutor_service.explain_concept(
-            topic=payload.topic,
-            level=payload.student_level,
-            context=payload.context,
-            user_key=user_key,
+        priority = await _has_priority(db, current_user)
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: offline_ai_tutor_service.explain_concept(
+                topic=payload.topic,
+                level=payload.student_level,
+                context=payload.context,
+                user_key=user_key,
+                priority=priority,
+            ),
         )
 
         # Optional: get entitlements if needed
@@ -215,6 +279,8 @@ async def explain_concept(
             ai_credits_remaining=999,  # Unlimited in offline mode
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Explain error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -223,16 +289,23 @@ async def explain_concept(
 @router.post("/debug", response_model=AITutorResponse)
 async def debug_code(
     payload: DebugCodeRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> AITutorResponse:
     """Debug Python code"""
     try:
         user_key = str(current_user.id) if current_user is not None else "global"
-        response = await offline_ai_tutor_service.debug_code(
-            code=payload.code,
-            error_message=payload.error_message,
-            user_key=user_key,
+        priority = await _has_priority(db, current_user)
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: offline_ai_tutor_service.debug_code(
+                code=payload.code,
+                error_message=payload.error_message,
+                user_key=user_key,
+                priority=priority,
+            ),
         )
 
         return AITutorResponse(
@@ -240,6 +313,8 @@ async def debug_code(
             ai_credits_remaining=999,  # Unlimited in offline mode
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Debug error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -248,16 +323,23 @@ async def debug_code(
 @router.post("/practice", response_model=PracticeProblemResponse)
 async def generate_practice_problem(
     payload: PracticeProblemRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> PracticeProblemResponse:
     """Generate a practice problem"""
     try:
         user_key = str(current_user.id) if current_user is not None else "global"
-        generated = await offline_ai_tutor_service.generate_practice(
-            topic=payload.topic,
-            difficulty=payload.difficulty,
-            user_key=user_key,
+        priority = await _has_priority(db, current_user)
+        generated = await llm_deadlines.run(
+            request,
+            settings.llm_task_budget_sec,
+            lambda: offline_ai_tutor_service.generate_practice(
+                topic=payload.topic,
+                difficulty=payload.difficulty,
+                user_key=user_key,
+                priority=priority,
+            ),
         )
 
         return PracticeProblemResponse(
@@ -265,6 +347,8 @@ async def generate_practice_problem(
             ai_credits_remaining=999,  # Unlimited in offline mode
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Practice error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -273,21 +357,29 @@ async def generate_practice_problem(
 @router.get("/status")
 async def tutor_status() -> dict:
     """Check if AI tutor is online and ready"""
-    # Perform a quick availability check against Ollama
-    available = await offline_ai_tutor_service.is_available()
+    # Served from the background health monitor's cached state
+    health = await ollama_health_monitor.current()
+    available = health.available
     return {
         "status": "online" if available else "offline",
         "mode": "offline-local",
         "model": offline_ai_tutor_service.model,
+        "model_loaded": offline_ai_tutor_service.model in health.models,
+        "available_models": list(health.models),
+        "circuit_open": health.circuit_open,
         "message": "AI tutor is running 100% locally - no API keys needed!" if available else "Ollama is not reachable. Run: ollama serve",
     }
 
 
 @router.post("/test")
-async def test_tutor() -> dict:
+async def test_tutor(request: Request) -> dict:
     """Test endpoint without authentication"""
     try:
-        response = await offline_ai_tutor_service.chat("Say hello", mode="general")
+        response = await llm_deadlines.run(
+            request,
+            settings.llm_chat_budget_sec,
+            lambda: offline_ai_tutor_service.chat("Say hello", mode="general"),
+        )
         return {
             "status": "success",
             "response": response,
@@ -302,7 +394,7 @@ async def test_tutor() -> dict:
 
 
     @router.post("/speak-report", response_model=SpeakReportResponse)
-    async def speak_report(payload: SpeakReportRequest, current_user: User | None = Depends(get_optional_current_user)) -> SpeakReportResponse:
+    async def speak_report(payload: SpeakReportRequest, current_user: User | None = Depends(get_optional_current_user_async)) -> SpeakReportResponse:
         """Generate a short parent-friendly report summary in the requested language using the offline tutor"""
         try:
             # Build a concise prompt for the model
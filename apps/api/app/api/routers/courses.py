@@ -1,98 +1,33 @@
-﻿from fastapi import APIRouter, Depends, HTTPException
+﻿from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy import select
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session
 
 from app.db.models import Course, Lesson, Module, User
 from app.db.session import get_db
 from app.api.deps import get_current_user
-from app.schemas.course import (
-    CodingChallengeOut,
-    CourseOut,
-    LessonOut,
-    LessonPremiumInsightOut,
-    ModuleOut,
-    QuizQuestionOut,
-)
+from app.schemas.course import CourseOut, LessonPremiumInsightOut
+from app.services.curriculum_cache import EncodedDocument, curriculum_cache
 from app.services.premium_learning import premium_learning_service
 from app.services.product_growth import product_growth_service
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
 
-def serialize_course(course: Course) -> CourseOut:
-    modules = sorted(course.modules, key=lambda item: item.order_index)
-    return CourseOut(
-        id=course.id,
-        slug=course.slug,
-        title=course.title,
-        description=course.description,
-        difficulty=course.difficulty,
-        order_index=course.order_index,
-        modules=[
-            ModuleOut(
-                id=module.id,
-                title=module.title,
-                description=module.description,
-                order_index=module.order_index,
-                xp_reward=module.xp_reward,
-                lessons=[
-                    LessonOut(
-                        id=lesson.id,
-                        title=lesson.title,
-                        objective=lesson.objective,
-                        content_md=lesson.content_md,
-                        order_index=lesson.order_index,
-                        estimated_minutes=lesson.estimated_minutes,
-                        quiz_questions=[
-                            QuizQuestionOut(
-                                id=question.id,
-                                prompt=question.prompt,
-                                options=question.options,
-                                correct_option=question.correct_option,
-                                explanation=question.explanation,
-                            )
-                            for question in lesson.quiz_questions
-                        ],
-                        coding_challenges=[
-                            CodingChallengeOut(
-                                id=challenge.id,
-                                title=challenge.title,
-                                prompt=challenge.prompt,
-                                starter_code=challenge.starter_code,
-                                difficulty=challenge.difficulty,
-                                xp_reward=challenge.xp_reward,
-                            )
-                            for challenge in lesson.coding_challenges
-                        ],
-                    )
-                    for lesson in sorted(module.lessons, key=lambda l: l.order_index)
-                ],
-            )
-            for module in modules
-        ],
-    )
+def _encoded_response(document: EncodedDocument, if_none_match: str | None) -> Response:
+    headers = {"ETag": document.etag, "Cache-Control": "private, no-cache"}
+    if document.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
 
 
 @router.get("/catalog", response_model=list[CourseOut])
 def catalog(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_user),
-) -> list[CourseOut]:
-    courses = db.scalars(
-        select(Course)
-        .where(Course.is_published.is_(True))
-        .order_by(Course.order_index)
-        .options(
-            selectinload(Course.modules)
-            .selectinload(Module.lessons)
-            .selectinload(Lesson.quiz_questions),
-            selectinload(Course.modules)
-            .selectinload(Module.lessons)
-            .selectinload(Lesson.coding_challenges),
-        )
-    ).all()
-
-    return [serialize_course(course) for course in courses]
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    snapshot = curriculum_cache.snapshot(db)
+    return _encoded_response(snapshot.catalog, if_none_match)
 
 
 @router.get("/{course_id}", response_model=CourseOut)
@@ -100,23 +35,13 @@ def get_course(
     course_id: int,
     db: Session = Depends(get_db),
     _: User = Depends(get_current_user),
-) -> CourseOut:
-    course = db.scalar(
-        select(Course)
-        .where(Course.id == course_id, Course.is_published.is_(True))
-        .options(
-            selectinload(Course.modules)
-            .selectinload(Module.lessons)
-            .selectinload(Lesson.quiz_questions),
-            selectinload(Course.modules)
-            .selectinload(Module.lessons)
-            .selectinload(Lesson.coding_challenges),
-        )
-    )
-    if not course:
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    document = curriculum_cache.snapshot(db).courses.get(course_id)
+    if document is None:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    return serialize_course(course)
+    return _encoded_response(document, if_none_match)
 
 
 @router.get("/lessons/{lesson_id}/premium-insights", response_model=LessonPremiumInsightOut)
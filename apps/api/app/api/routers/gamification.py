@@ -1,7 +1,7 @@
 ﻿from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import desc, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
@@ -9,44 +9,47 @@ from app.db.models import Achievement, DailyMission, User, UserAchievement, User
 from app.db.session import get_db
 from app.schemas.gamification import AchievementOut, DailyMissionOut, GamificationSummary
 from app.services.gamification import gamification_service
+from app.services.leaderboard import leaderboard_service
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
+LEADERBOARD_SCOPE_PATTERN = "^(global|weekly|squad)$"
+
 
 @router.get("/summary", response_model=GamificationSummary)
 def summary(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> GamificationSummary:
-    # Rank is computed by counting users with higher XP.
-    higher_xp_users = db.scalar(
-        select(func.count(User.id)).where(User.xp > current_user.xp)
-    ) or 0
     return GamificationSummary(
         xp=current_user.xp,
         level=current_user.level,
         streak_days=current_user.streak_days,
         next_level_xp=gamification_service.next_level_xp(current_user.level),
-        leaderboard_rank=higher_xp_users + 1,
+        leaderboard_rank=leaderboard_service.rank(db, current_user),
     )
 
 
 @router.get("/leaderboard")
 def leaderboard(
+    scope: str = Query(default="global", pattern=LEADERBOARD_SCOPE_PATTERN),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
     db: Session = Depends(get_db),
-    _: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ) -> list[dict]:
-    users = db.scalars(select(User).order_by(desc(User.xp)).limit(20)).all()
-    return [
-        {
-            "rank": idx,
-            "user_id": user.id,
-            "name": user.full_name,
-            "xp": user.xp,
-            "level": user.level,
-        }
-        for idx, user in enumerate(users, start=1)
-    ]
+    return leaderboard_service.page(db, current_user, scope=scope, offset=offset, limit=limit)
+
+
+@router.get("/leaderboard/around-me")
+def leaderboard_around_me(
+    scope: str = Query(default="global", pattern=LEADERBOARD_SCOPE_PATTERN),
+    before: int = Query(default=5, ge=0, le=50),
+    after: int = Query(default=5, ge=0, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> dict:
+    return leaderboard_service.around(db, current_user, scope=scope, before=before, after=after)
 
 
 @router.get("/achievements", response_model=list[AchievementOut])
@@ -137,11 +140,10 @@ def complete_mission(
     db.commit()
     db.refresh(current_user)
 
-    higher_xp_users = db.scalar(select(func.count(User.id)).where(User.xp > current_user.xp)) or 0
     return GamificationSummary(
         xp=current_user.xp,
         level=current_user.level,
         streak_days=current_user.streak_days,
         next_level_xp=gamification_service.next_level_xp(current_user.level),
-        leaderboard_rank=higher_xp_users + 1,
+        leaderboard_rank=leaderboard_service.rank(db, current_user),
     )
@@ -5,13 +5,14 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
-from app.db.models import CampaignMessage, LifecycleEvent, User
+from app.db.models import CampaignMessage, User
 from app.db.session import get_db
 from app.schemas.lifecycle import (
     CampaignMessageOut,
     CampaignTriggerResponse,
     LifecycleEventRequest,
 )
+from app.services.audit import log_lifecycle_event
 
 router = APIRouter(prefix="/lifecycle", tags=["lifecycle"])
 
@@ -22,14 +23,10 @@ def log_event(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> dict:
-    event = LifecycleEvent(
-        user_id=current_user.id,
-        event_type=payload.event_type,
-        metadata_json=payload.metadata_json,
-    )
-    db.add(event)
+    log_lifecycle_event(db, current_user.id, payload.event_type, payload.metadata_json)
     db.commit()
-    return {"success": True, "event_id": event.id}
+    # Buffered events have no id until the background writer flushes them.
+    return {"success": True, "event_id": None}
 
 
 @router.post("/campaigns/plan", response_model=CampaignTriggerResponse)
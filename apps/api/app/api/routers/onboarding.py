@@ -3,7 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
-from app.db.models import LearningTrack, LifecycleEvent, User, UserLearningProfile
+from app.db.models import LearningTrack, User, UserLearningProfile
 from app.db.session import get_db
 from app.schemas.onboarding import (
     DiagnosticQuestion,
@@ -11,6 +11,7 @@ from app.schemas.onboarding import (
     OnboardingQuestionsResponse,
     OnboardingStatusResponse,
 )
+from app.services.audit import log_lifecycle_event
 from app.services.product_growth import product_growth_service
 
 router = APIRouter(prefix="/onboarding", tags=["onboarding"])
@@ -107,16 +108,15 @@ def complete_onboarding(
     profile.recommended_track_slug = recommended_track_slug
     profile.parent_email = payload.parent_email
 
-    db.add(
-        LifecycleEvent(
-            user_id=current_user.id,
-            event_type="onboarding_completed",
-            metadata_json={
-                "goal": payload.learning_goal,
-                "diagnostic_score": score,
-                "track": recommended_track_slug,
-            },
-        )
+    log_lifecycle_event(
+        db,
+        current_user.id,
+        "onboarding_completed",
+        {
+            "goal": payload.learning_goal,
+            "diagnostic_score": score,
+            "track": recommended_track_slug,
+        },
     )
 
     db.commit()
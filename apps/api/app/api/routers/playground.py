@@ -1,12 +1,16 @@
+import json
+
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user_async
 from app.db.models import User
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.playground import CodeRunRequest, CodeRunResponse
 from app.services.ai_tutor import ai_tutor_service
 from app.services.code_runner import code_runner_service
+from app.services.llm_scheduler import LLMQueueFullError
 from app.services.product_growth import product_growth_service
 
 router = APIRouter(prefix="/playground", tags=["playground"])
@@ -15,30 +19,69 @@ router = APIRouter(prefix="/playground", tags=["playground"])
 @router.post("/run", response_model=CodeRunResponse)
 async def run_code(
     payload: CodeRunRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> CodeRunResponse:
     result = await code_runner_service.run_python(payload.code, payload.stdin or "")
 
     ai_error_explanation = None
     stderr = result.get("stderr", "")
     if stderr:
-        if product_growth_service.consume_ai_credit(db, current_user, amount=1):
-            ai_error_explanation = await ai_tutor_service.debug_code(
-                code=payload.code,
-                error_message=stderr,
-            )
+        if await db.run_sync(product_growth_service.consume_ai_credit, current_user, 1):
+            priority = await db.run_sync(product_growth_service.has_priority_queue, current_user)
+            # Commit the charge so no pooled connection is held during the LLM wait.
+            await db.commit()
+            try:
+                ai_error_explanation = await ai_tutor_service.debug_code(
+                    code=payload.code,
+                    error_message=stderr,
+                    user_key=current_user.id,
+                    priority=priority,
+                )
+            except LLMQueueFullError:
+                # The run result is still useful; skip the explanation rather than failing the request.
+                await db.run_sync(product_growth_service.refund_ai_credit, current_user, 1)
+                await db.commit()
+                ai_error_explanation = "AI tutor is busy right now. Run the code again in a moment for an explanation."
+            except BaseException:
+                await db.run_sync(product_growth_service.refund_ai_credit, current_user, 1)
+                await db.commit()
+                raise
         else:
             ai_error_explanation = (
                 "Daily AI debug credits exhausted. Continue practicing or upgrade to Pro for unlimited AI debugging."
             )
 
-    db.commit()
+    await db.commit()
 
     return CodeRunResponse(
         stdout=result.get("stdout", ""),
         stderr=stderr,
         exit_code=result.get("exit_code", 1),
         execution_time_ms=result.get("execution_time_ms", 0),
+        truncated=result.get("truncated", False),
+        usage=result.get("usage"),
         ai_error_explanation=ai_error_explanation,
     )
+
+
+@router.post("/run/stream")
+async def run_code_streaming(
+    payload: CodeRunRequest,
+    current_user: User = Depends(get_current_user_async),
+) -> StreamingResponse:
+    """Relay the runner's live NDJSON output (``stdout``/``stderr`` lines, then a ``result`` line)."""
+    events = code_runner_service.stream_python(payload.code, payload.stdin or "")
+    # Pull the first event here so runner errors (busy, blocked import) are real status codes.
+    first = await anext(events)
+
+    async def body():
+        try:
+            yield json.dumps(first) + "\n"
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        finally:
+            # On disconnect or cancellation, close the upstream stream so the runner job ends too.
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
@@ -2,11 +2,12 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_current_user_async
 from app.db.models import CodingChallenge, Lesson, LessonAttempt, LessonProgress, Submission, User
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.schemas.course import (
     ChallengeSubmissionRequest,
     ChallengeSubmissionResponse,
@@ -15,10 +16,13 @@ from app.schemas.course import (
 )
 from app.services.ai_tutor import ai_tutor_service
 from app.services.audit import log_event
-from app.services.code_runner import code_runner_service
+from app.services.code_runner import code_runner_service, format_grade_output, gradable_cases, submission_usage
+from app.services.dashboard import dashboard_service
 from app.services.economy import economy_service
 from app.services.gamification import gamification_service
+from app.services.llm_scheduler import LLMQueueFullError
 from app.services.mastery import mastery_service
+from app.services.product_growth import product_growth_service
 from app.services.tutor_memory import tutor_memory_service
 
 router = APIRouter(prefix="/progress", tags=["progress"])
@@ -199,6 +203,7 @@ def complete_lesson(
     )
 
     db.commit()
+    dashboard_service.invalidate(current_user.id)
     db.refresh(current_user)
 
     return LessonCompletionResponse(
@@ -213,65 +218,101 @@ def complete_lesson(
 @router.post("/challenges/submit", response_model=ChallengeSubmissionResponse)
 async def submit_challenge(
     payload: ChallengeSubmissionRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
 ) -> ChallengeSubmissionResponse:
-    challenge = db.scalar(select(CodingChallenge).where(CodingChallenge.id == payload.challenge_id))
+    challenge = await db.scalar(select(CodingChallenge).where(CodingChallenge.id == payload.challenge_id))
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
+    # Reads are done until the writes below; don't hold a pooled connection through the runner
+    # and LLM waits (expire_on_commit=False keeps ``challenge`` loaded).
+    await db.commit()
 
-    run_result = await code_runner_service.run_python(payload.code)
-    passed = run_result["exit_code"] == 0
+    cases = gradable_cases(challenge.tests_json)
+    verdict = None
+    test_results: list[dict] = []
+    if cases:
+        grade_result = await code_runner_service.grade_python(payload.code, cases)
+        verdict = grade_result["verdict"]
+        test_results = grade_result.get("cases", [])
+        passed = verdict == "passed"
+        output = format_grade_output(grade_result)
+        error_message = grade_result.get("stderr") or output
+        usage = submission_usage(grade_result)
+    else:
+        # Challenges without executable cases only require a clean run.
+        run_result = await code_runner_service.run_python(payload.code)
+        passed = run_result["exit_code"] == 0
+        output = run_result.get("stdout") or run_result.get("stderr")
+        error_message = run_result.get("stderr") or "Execution failed"
+        usage = submission_usage(run_result)
 
     ai_feedback = None
     if not passed:
-        ai_feedback = await ai_tutor_service.debug_code(
+        priority = await db.run_sync(product_growth_service.has_priority_queue, current_user)
+        await db.commit()
+        try:
+            ai_feedback = await ai_tutor_service.debug_code(
+                code=payload.code,
+                error_message=error_message,
+                user_key=current_user.id,
+                priority=priority,
+            )
+        except LLMQueueFullError:
+            # Grading already happened; a busy tutor must not fail the submission.
+            ai_feedback = None
+
+    def record_submission(session: Session) -> Submission:
+        if not passed:
+            tutor_memory_service.remember(
+                session,
+                current_user,
+                category="debug",
+                topic=challenge.title,
+                memory_text=f"Had challenge failure on '{challenge.title}'. Needs more debugging repetition.",
+                confidence_score=70,
+                metadata={"challenge_id": challenge.id, "difficulty": challenge.difficulty},
+            )
+        else:
+            gamification_service.award_xp(session, current_user, challenge.xp_reward)
+            tutor_memory_service.remember(
+                session,
+                current_user,
+                category="strength",
+                topic=challenge.title,
+                memory_text=f"Successfully solved challenge '{challenge.title}'.",
+                confidence_score=82,
+                metadata={"challenge_id": challenge.id, "difficulty": challenge.difficulty},
+            )
+
+        gamification_service.update_streak(current_user)
+        gamification_service.evaluate_achievements(session, current_user)
+
+        submission = Submission(
+            user_id=current_user.id,
+            challenge_id=challenge.id,
             code=payload.code,
-            error_message=run_result.get("stderr") or "Execution failed",
+            output=output,
+            passed=passed,
+            ai_feedback=ai_feedback,
+            **usage,
         )
-        tutor_memory_service.remember(
-            db,
-            current_user,
-            category="debug",
-            topic=challenge.title,
-            memory_text=f"Had challenge failure on '{challenge.title}'. Needs more debugging repetition.",
-            confidence_score=70,
-            metadata={"challenge_id": challenge.id, "difficulty": challenge.difficulty},
-        )
-    else:
-        gamification_service.award_xp(db, current_user, challenge.xp_reward)
-        tutor_memory_service.remember(
-            db,
-            current_user,
-            category="strength",
-            topic=challenge.title,
-            memory_text=f"Successfully solved challenge '{challenge.title}'.",
-            confidence_score=82,
-            metadata={"challenge_id": challenge.id, "difficulty": challenge.difficulty},
+        session.add(submission)
+        log_event(
+            session,
+            "challenge.submitted",
+            user_id=current_user.id,
+            entity_type="challenge",
+            entity_id=str(challenge.id),
+            payload={"passed": passed, "verdict": verdict},
         )
+        return submission
 
-    gamification_service.update_streak(current_user)
-    gamification_service.evaluate_achievements(db, current_user)
-
-    submission = Submission(
-        user_id=current_user.id,
-        challenge_id=challenge.id,
-        code=payload.code,
-        output=run_result.get("stdout") or run_result.get("stderr"),
-        passed=passed,
-        ai_feedback=ai_feedback,
-    )
-    db.add(submission)
-    log_event(
-        db,
-        "challenge.submitted",
-        user_id=current_user.id,
-        entity_type="challenge",
-        entity_id=str(challenge.id),
-        payload={"passed": passed},
-    )
-    db.commit()
-    db.refresh(submission)
+    # The existing sync services run on the async connection without blocking the event loop.
+    submission = await db.run_sync(record_submission)
+    await db.commit()
+    dashboard_service.invalidate(current_user.id)
+    await db.refresh(submission)
 
     return ChallengeSubmissionResponse(
         submission_id=submission.id,
@@ -279,4 +320,6 @@ async def submit_challenge(
         output=submission.output,
         ai_feedback=submission.ai_feedback,
         created_at=submission.created_at,
+        verdict=verdict,
+        test_results=test_results,
     )
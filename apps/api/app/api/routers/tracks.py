@@ -25,6 +25,7 @@ from app.schemas.tracks import (
     TrackOut,
     TranscriptOut,
 )
+from app.services.dashboard import dashboard_service
 from app.services.gamification import gamification_service
 from app.services.product_growth import product_growth_service
 
@@ -250,6 +251,7 @@ def complete_milestone(
             enrollment.updated_at = datetime.utcnow()
 
     db.commit()
+    dashboard_service.invalidate(current_user.id)
 
     return MilestoneCompleteResponse(
         milestone_id=milestone.id,
@@ -35,6 +35,92 @@ class Settings(BaseSettings):
 
     code_runner_url: str = "http://localhost:8100"
 
+    # Shared outbound HTTP clients (see app.services.http_clients)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_sec: float = 30.0
+    http_connect_timeout_sec: float = 5.0
+    code_runner_timeout_sec: float = 10.0
+    code_runner_http2: bool = False
+    ollama_timeout_sec: float = 120.0
+    ollama_health_timeout_sec: float = 6.0
+    ollama_http2: bool = False
+    ollama_health_interval_sec: float = 15.0
+    ollama_circuit_failure_threshold: int = 3
+    ollama_circuit_open_sec: float = 30.0
+
+    # Offline tutor conversation history: "memory" (per-process LRU) or "sql" (shared table)
+    tutor_history_backend: str = "memory"
+    tutor_history_max_messages: int = 20
+    tutor_history_max_users: int = 5000
+    tutor_history_ttl_sec: int = 60 * 60 * 24 * 7
+
+    # AI tutor response cache; "sql" adds a table shared by all workers behind the local LRU
+    ai_cache_backend: str = "memory"
+    ai_cache_max_entries: int = 2000
+    ai_cache_ttl_sec: int = 3600
+
+    # Database pools (ignored for SQLite). With pre-ping off, pool_recycle alone retires stale connections.
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_sec: float = 30.0
+    db_pool_recycle_sec: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0
+    db_slow_query_ms: float = 250.0
+    # Requests issuing more queries than this are logged as likely N+1 regressions (0 disables)
+    db_query_budget_per_request: int = 40
+
+    # Published curriculum snapshot; admin edits invalidate it, the TTL bounds cross-worker staleness
+    curriculum_cache_ttl_sec: float = 300.0
+
+    # Per-user /users/me/dashboard cache (0 disables); progress events invalidate entries
+    dashboard_cache_ttl_sec: float = 15.0
+    dashboard_cache_max_users: int = 10000
+
+    # In-process rank index for /gamification leaderboards; reloaded from the database after
+    # this many seconds so XP awarded through other workers shows up
+    leaderboard_refresh_sec: float = 300.0
+
+    # Write-behind buffer for event_logs / lifecycle_events. Overflow is "inline" (write in the
+    # request transaction) or "drop"
+    event_buffer_enabled: bool = True
+    event_buffer_max_queue: int = 10000
+    event_buffer_batch_size: int = 500
+    event_buffer_flush_interval_sec: float = 1.0
+    event_buffer_overflow: str = "inline"
+
+    # event_logs / economy_transactions storage: monthly range partitions on Postgres, daily
+    # rollups, and gzip JSONL archives of months older than the retention window (0 keeps all)
+    event_partitioning_enabled: bool = True
+    event_partition_months_ahead: int = 2
+    event_retention_months: int = 12
+    event_archive_dir: str = "./data/event_archive"
+    event_maintenance_interval_sec: float = 3600.0
+
+    # Admission control for upstream LLM calls (Ollama or OpenAI-compatible)
+    llm_max_concurrency: int = 2
+    llm_per_user_concurrency: int = 1
+    llm_max_queue: int = 200
+    llm_queue_max_wait_sec: float = 20.0
+
+    # End-to-end budgets for tutor generations. The time left caps scheduler waits, the upstream
+    # timeout and num_predict (via the observed tokens/sec); generations are cancelled when the
+    # client disconnects, checked every llm_disconnect_poll_sec
+    llm_chat_budget_sec: float = 60.0
+    llm_task_budget_sec: float = 45.0
+    llm_stream_budget_sec: float = 120.0
+    llm_tokens_per_sec: float = 8.0
+    llm_min_num_predict: int = 64
+    llm_disconnect_poll_sec: float = 0.5
+
+    # /ai-tutor/chat-stream SSE: token batching window, keepalive interval, how long an
+    # abandoned generation waits for a Last-Event-ID resume, and how long finished streams stay resumable
+    chat_stream_batch_ms: int = 50
+    chat_stream_heartbeat_sec: float = 15.0
+    chat_stream_resume_grace_sec: float = 10.0
+    chat_stream_retention_sec: float = 60.0
+
     stripe_secret_key: Optional[str] = None
     stripe_webhook_secret: Optional[str] = None
     stripe_price_id: str = "price_12345"
@@ -79,6 +165,21 @@ class Settings(BaseSettings):
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        """``database_url`` mapped onto an asyncio driver (aiosqlite / psycopg async)."""
+        explicit_async_url = os.getenv("ASYNC_DATABASE_URL")
+        if explicit_async_url:
+            return explicit_async_url
+
+        url = self.database_url
+        if url.startswith("sqlite:"):
+            return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        for prefix in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+            if url.startswith(prefix):
+                return url.replace(prefix, "postgresql+psycopg:", 1)
+        return url
+
 
 @lru_cache
 def get_settings() -> Settings:
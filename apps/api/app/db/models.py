@@ -9,6 +9,7 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -36,7 +37,7 @@ class User(Base):
     oauth_id: Mapped[str | None] = mapped_column(String(255), nullable=True)  # Provider-specific user ID
     oauth_access_token: Mapped[str | None] = mapped_column(String(1000), nullable=True)
 
-    xp: Mapped[int] = mapped_column(Integer, default=0)
+    xp: Mapped[int] = mapped_column(Integer, default=0, index=True)
     level: Mapped[int] = mapped_column(Integer, default=1)
     streak_days: Mapped[int] = mapped_column(Integer, default=0)
     last_active_date: Mapped[date | None] = mapped_column(Date, nullable=True)
@@ -169,6 +170,13 @@ class Submission(Base):
     output: Mapped[str | None] = mapped_column(Text, nullable=True)
     passed: Mapped[bool] = mapped_column(Boolean, default=False)
     ai_feedback: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Resource accounting for the graded run, as reported by the code runner.
+    cpu_user_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    cpu_system_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    peak_rss_kb: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    startup_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    user_code_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    limit_hit: Mapped[str | None] = mapped_column(String(16), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     user: Mapped[User] = relationship(back_populates="submissions")
@@ -408,6 +416,20 @@ class SquadWeeklyProgress(Base):
     user: Mapped[User] = relationship()
 
 
+class WeeklyXPTotal(Base):
+    __tablename__ = "weekly_xp_totals"
+    __table_args__ = (
+        UniqueConstraint("week_start", "user_id", name="uq_weekly_xp_user"),
+        Index("ix_weekly_xp_week_xp", "week_start", "xp"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    week_start: Mapped[date] = mapped_column(Date)
+    xp: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class PromoCode(Base):
     __tablename__ = "promo_codes"
 
@@ -669,6 +691,25 @@ class AITutorMemory(Base):
     user: Mapped[User] = relationship(back_populates="tutor_memories")
 
 
+class AIResponseCacheEntry(Base):
+    __tablename__ = "ai_response_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class AITutorConversationMessage(Base):
+    __tablename__ = "ai_tutor_conversation_messages"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # User id, or "global" for anonymous tutor sessions.
+    user_key: Mapped[str] = mapped_column(String(64), index=True)
+    role: Mapped[str] = mapped_column(String(20))
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
 class TrialFunnelEvent(Base):
     __tablename__ = "trial_funnel_events"
 
@@ -725,3 +766,24 @@ class NotificationDelivery(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
     user: Mapped[User] = relationship()
+
+
+class SeedState(Base):
+    __tablename__ = "seed_state"
+
+    name: Mapped[str] = mapped_column(String(60), primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64))
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EventDailyRollup(Base):
+    __tablename__ = "event_daily_rollups"
+    __table_args__ = (UniqueConstraint("day", "source", "event_type", name="uq_event_daily_rollup"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    day: Mapped[date] = mapped_column(Date, index=True)
+    source: Mapped[str] = mapped_column(String(40))
+    event_type: Mapped[str] = mapped_column(String(120))
+    event_count: Mapped[int] = mapped_column(Integer, default=0)
+    amount_total: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
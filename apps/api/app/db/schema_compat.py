@@ -14,9 +14,16 @@ LEGACY_COMPAT_QUERIES = [
     "ALTER TABLE IF EXISTS users ADD COLUMN IF NOT EXISTS last_active_date DATE",
     "ALTER TABLE IF EXISTS users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW()",
     "ALTER TABLE IF EXISTS users ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW()",
+    "CREATE INDEX IF NOT EXISTS ix_users_xp ON users (xp)",
     "ALTER TABLE IF EXISTS subscriptions ADD COLUMN IF NOT EXISTS plan VARCHAR(50) DEFAULT 'pro'",
     "ALTER TABLE IF EXISTS subscriptions ADD COLUMN IF NOT EXISTS status VARCHAR(40) DEFAULT 'incomplete'",
     "ALTER TABLE IF EXISTS subscriptions ADD COLUMN IF NOT EXISTS current_period_end TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS cpu_user_ms INTEGER",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS cpu_system_ms INTEGER",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS peak_rss_kb INTEGER",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS startup_ms INTEGER",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS user_code_ms INTEGER",
+    "ALTER TABLE IF EXISTS submissions ADD COLUMN IF NOT EXISTS limit_hit VARCHAR(16)",
 ]
 
 
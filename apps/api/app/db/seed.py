@@ -1,6 +1,8 @@
-﻿from datetime import date
+﻿import hashlib
+import json
+from datetime import date
 
-from sqlalchemy import select
+from sqlalchemy import insert, select, text, update
 from sqlalchemy.orm import Session
 
 from app.db.models import (
@@ -13,6 +15,7 @@ from app.db.models import (
     Module,
     PromoCode,
     QuizQuestion,
+    SeedState,
     TrackLesson,
     TrackMilestone,
 )
@@ -1132,227 +1135,252 @@ PROMO_CODES = [
 ]
 
 
-def seed_database(db: Session) -> None:
-    course = db.scalar(select(Course).where(Course.slug == CURRICULUM["slug"]))
-    if not course:
-        course = Course(
-            slug=CURRICULUM["slug"],
-            title=CURRICULUM["title"],
-            description=CURRICULUM["description"],
-            difficulty=CURRICULUM["difficulty"],
-            order_index=1,
-            is_published=True,
-        )
-        db.add(course)
-        db.flush()
-    else:
-        course.title = CURRICULUM["title"]
-        course.description = CURRICULUM["description"]
-        course.difficulty = CURRICULUM["difficulty"]
-        course.is_published = True
+SEED_STATE_NAME = "curriculum"
+# Arbitrary, stable key for pg_advisory_xact_lock so concurrent workers seed one at a time.
+SEED_ADVISORY_LOCK_KEY = 7_301_184_520
 
-    for module_index, module_payload in enumerate(CURRICULUM["modules"], start=1):
-        module = db.scalar(
-            select(Module).where(
-                Module.course_id == course.id,
-                Module.title == module_payload["title"],
-            )
-        )
-        if not module:
-            module = Module(
-                course_id=course.id,
-                title=module_payload["title"],
-                description=module_payload["description"],
-                order_index=module_index,
-                xp_reward=module_payload["xp_reward"],
-            )
-            db.add(module)
-            db.flush()
-        else:
-            module.description = module_payload["description"]
-            module.order_index = module_index
-            module.xp_reward = module_payload["xp_reward"]
 
-        for lesson_index, lesson_payload in enumerate(module_payload["lessons"], start=1):
-            lesson = db.scalar(
-                select(Lesson).where(
-                    Lesson.module_id == module.id,
-                    Lesson.title == lesson_payload["title"],
-                )
-            )
-            if not lesson:
-                lesson = Lesson(
-                    module_id=module.id,
-                    title=lesson_payload["title"],
-                    objective=lesson_payload["objective"],
-                    content_md=lesson_payload["content_md"],
-                    order_index=lesson_index,
-                    estimated_minutes=15,
-                )
-                db.add(lesson)
-                db.flush()
-            else:
-                lesson.objective = lesson_payload["objective"]
-                lesson.content_md = lesson_payload["content_md"]
-                lesson.order_index = lesson_index
-                lesson.estimated_minutes = 15
+def content_hash() -> str:
+    payload = {
+        "curriculum": CURRICULUM,
+        "achievements": ACHIEVEMENTS,
+        "tracks": TRACKS,
+        "promo_codes": PROMO_CODES,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _acquire_seed_lock(db: Session) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_ADVISORY_LOCK_KEY})
+
+
+def _stored_hash(db: Session) -> str | None:
+    return db.scalar(select(SeedState.content_hash).where(SeedState.name == SEED_STATE_NAME))
+
 
-            existing_quizzes = {
-                item.prompt: item
-                for item in db.scalars(select(QuizQuestion).where(QuizQuestion.lesson_id == lesson.id)).all()
+def _sync_rows(
+    db: Session,
+    model,
+    key_fields: tuple[str, ...],
+    desired: list[dict],
+    scope=None,
+    insert_defaults: dict | None = None,
+) -> dict[tuple, int]:
+    """Bulk-insert missing rows and bulk-update changed ones; returns ids by natural key.
+
+    Rows are matched on ``key_fields``. Fields in ``insert_defaults`` are only written on insert.
+    """
+    if not desired:
+        return {}
+    fields = list(desired[0])
+    query = select(model.id, *(getattr(model, field) for field in fields))
+    if scope is not None:
+        query = query.where(scope)
+    existing = {tuple(getattr(row, field) for field in key_fields): row for row in db.execute(query)}
+
+    inserts: list[dict] = []
+    updates: list[dict] = []
+    for values in desired:
+        row = existing.get(tuple(values[field] for field in key_fields))
+        if row is None:
+            inserts.append({**(insert_defaults or {}), **values})
+        elif any(getattr(row, field) != values[field] for field in fields):
+            updates.append({"id": row.id, **values})
+
+    if updates:
+        db.execute(update(model), updates)
+    if not inserts:
+        return {key: row.id for key, row in existing.items()}
+
+    db.execute(insert(model), inserts)
+    key_columns = [getattr(model, field) for field in key_fields]
+    query = select(model.id, *key_columns)
+    if scope is not None:
+        query = query.where(scope)
+    return {tuple(row[1:]): row.id for row in db.execute(query)}
+
+
+def _seed_curriculum(db: Session) -> None:
+    course_ids = _sync_rows(
+        db,
+        Course,
+        ("slug",),
+        [
+            {
+                "slug": CURRICULUM["slug"],
+                "title": CURRICULUM["title"],
+                "description": CURRICULUM["description"],
+                "difficulty": CURRICULUM["difficulty"],
+                "is_published": True,
             }
-            for q in lesson_payload["quiz"]:
-                quiz = existing_quizzes.get(q["prompt"])
-                if not quiz:
-                    db.add(
-                        QuizQuestion(
-                            lesson_id=lesson.id,
-                            prompt=q["prompt"],
-                            options=q["options"],
-                            correct_option=q["correct_option"],
-                            explanation=q["explanation"],
-                        )
-                    )
-                else:
-                    quiz.options = q["options"]
-                    quiz.correct_option = q["correct_option"]
-                    quiz.explanation = q["explanation"]
+        ],
+        scope=Course.slug == CURRICULUM["slug"],
+        insert_defaults={"order_index": 1},
+    )
+    course_id = course_ids[(CURRICULUM["slug"],)]
 
-            existing_challenges = {
-                item.title: item
-                for item in db.scalars(
-                    select(CodingChallenge).where(CodingChallenge.lesson_id == lesson.id)
-                ).all()
+    module_ids = _sync_rows(
+        db,
+        Module,
+        ("course_id", "title"),
+        [
+            {
+                "course_id": course_id,
+                "title": module["title"],
+                "description": module["description"],
+                "order_index": module_index,
+                "xp_reward": module["xp_reward"],
             }
-            for challenge in lesson_payload["challenges"]:
-                challenge_record = existing_challenges.get(challenge["title"])
-                if not challenge_record:
-                    db.add(
-                        CodingChallenge(
-                            lesson_id=lesson.id,
-                            title=challenge["title"],
-                            prompt=challenge["prompt"],
-                            starter_code=challenge["starter_code"],
-                            tests_json=challenge["tests_json"],
-                            difficulty=challenge["difficulty"],
-                            xp_reward=challenge["xp_reward"],
-                        )
-                    )
-                else:
-                    challenge_record.prompt = challenge["prompt"]
-                    challenge_record.starter_code = challenge["starter_code"]
-                    challenge_record.tests_json = challenge["tests_json"]
-                    challenge_record.difficulty = challenge["difficulty"]
-                    challenge_record.xp_reward = challenge["xp_reward"]
+            for module_index, module in enumerate(CURRICULUM["modules"], start=1)
+        ],
+        scope=Module.course_id == course_id,
+    )
+    module_scope = Module.course_id == course_id
 
-    for achievement in ACHIEVEMENTS:
-        record = db.scalar(select(Achievement).where(Achievement.code == achievement["code"]))
-        if not record:
-            db.add(Achievement(**achievement))
-        else:
-            record.name = achievement["name"]
-            record.description = achievement["description"]
-            record.xp_bonus = achievement["xp_bonus"]
-            record.icon = achievement["icon"]
+    lesson_rows = []
+    for module in CURRICULUM["modules"]:
+        module_id = module_ids[(course_id, module["title"])]
+        for lesson_index, lesson in enumerate(module["lessons"], start=1):
+            lesson_rows.append(
+                {
+                    "module_id": module_id,
+                    "title": lesson["title"],
+                    "objective": lesson["objective"],
+                    "content_md": lesson["content_md"],
+                    "order_index": lesson_index,
+                    "estimated_minutes": 15,
+                }
+            )
+    lesson_ids = _sync_rows(
+        db,
+        Lesson,
+        ("module_id", "title"),
+        lesson_rows,
+        scope=Lesson.module_id.in_(select(Module.id).where(module_scope)),
+    )
+    lesson_scope = select(Lesson.id).join(Module, Lesson.module_id == Module.id).where(module_scope)
 
-    today = date.today()
-    for mission in DAILY_MISSIONS:
-        record = db.scalar(
-            select(DailyMission).where(
-                DailyMission.mission_date == today,
-                DailyMission.title == mission["title"],
+    quiz_rows = []
+    challenge_rows = []
+    for module in CURRICULUM["modules"]:
+        module_id = module_ids[(course_id, module["title"])]
+        for lesson in module["lessons"]:
+            lesson_id = lesson_ids[(module_id, lesson["title"])]
+            quiz_rows.extend(
+                {
+                    "lesson_id": lesson_id,
+                    "prompt": quiz["prompt"],
+                    "options": quiz["options"],
+                    "correct_option": quiz["correct_option"],
+                    "explanation": quiz["explanation"],
+                }
+                for quiz in lesson["quiz"]
             )
-        )
-        if not record:
-            db.add(DailyMission(mission_date=today, **mission))
-        else:
-            record.description = mission["description"]
-            record.xp_reward = mission["xp_reward"]
+            challenge_rows.extend(
+                {
+                    "lesson_id": lesson_id,
+                    "title": challenge["title"],
+                    "prompt": challenge["prompt"],
+                    "starter_code": challenge["starter_code"],
+                    "tests_json": challenge["tests_json"],
+                    "difficulty": challenge["difficulty"],
+                    "xp_reward": challenge["xp_reward"],
+                }
+                for challenge in lesson["challenges"]
+            )
+    _sync_rows(db, QuizQuestion, ("lesson_id", "prompt"), quiz_rows, scope=QuizQuestion.lesson_id.in_(lesson_scope))
+    _sync_rows(
+        db,
+        CodingChallenge,
+        ("lesson_id", "title"),
+        challenge_rows,
+        scope=CodingChallenge.lesson_id.in_(lesson_scope),
+    )
 
-    lesson_by_title = {
-        item.title: item for item in db.scalars(select(Lesson).order_by(Lesson.id)).all()
-    }
 
-    for track_index, track_payload in enumerate(TRACKS, start=1):
-        track = db.scalar(select(LearningTrack).where(LearningTrack.slug == track_payload["slug"]))
-        if not track:
-            track = LearningTrack(
-                slug=track_payload["slug"],
-                name=track_payload["name"],
-                description=track_payload["description"],
-                outcome=track_payload["outcome"],
-                target_audience=track_payload["target_audience"],
-                premium_only=track_payload["premium_only"],
-                order_index=track_index,
-            )
-            db.add(track)
-            db.flush()
-        else:
-            track.name = track_payload["name"]
-            track.description = track_payload["description"]
-            track.outcome = track_payload["outcome"]
-            track.target_audience = track_payload["target_audience"]
-            track.premium_only = track_payload["premium_only"]
-            track.order_index = track_index
+def _seed_tracks(db: Session) -> None:
+    track_ids = _sync_rows(
+        db,
+        LearningTrack,
+        ("slug",),
+        [
+            {
+                "slug": track["slug"],
+                "name": track["name"],
+                "description": track["description"],
+                "outcome": track["outcome"],
+                "target_audience": track["target_audience"],
+                "premium_only": track["premium_only"],
+                "order_index": track_index,
+            }
+            for track_index, track in enumerate(TRACKS, start=1)
+        ],
+    )
+    lesson_by_title = {row.title: row.id for row in db.execute(select(Lesson.id, Lesson.title).order_by(Lesson.id))}
 
-        for lesson_index, lesson_title in enumerate(track_payload["lessons"], start=1):
-            lesson = lesson_by_title.get(lesson_title)
-            if not lesson:
+    track_lesson_rows = []
+    milestone_rows = []
+    for track in TRACKS:
+        track_id = track_ids[(track["slug"],)]
+        for lesson_index, lesson_title in enumerate(track["lessons"], start=1):
+            lesson_id = lesson_by_title.get(lesson_title)
+            if lesson_id is None:
                 continue
-            relation = db.scalar(
-                select(TrackLesson).where(
-                    TrackLesson.track_id == track.id,
-                    TrackLesson.lesson_id == lesson.id,
-                )
-            )
-            if not relation:
-                db.add(
-                    TrackLesson(
-                        track_id=track.id,
-                        lesson_id=lesson.id,
-                        order_index=lesson_index,
-                    )
-                )
-            else:
-                relation.order_index = lesson_index
+            track_lesson_rows.append({"track_id": track_id, "lesson_id": lesson_id, "order_index": lesson_index})
+        milestone_rows.extend(
+            {
+                "track_id": track_id,
+                "title": milestone["title"],
+                "description": milestone["description"],
+                "required_lessons": milestone["required_lessons"],
+                "required_avg_quiz_score": milestone["required_avg_quiz_score"],
+                "required_challenges_passed": milestone["required_challenges_passed"],
+                "reward_xp": milestone["reward_xp"],
+                "order_index": milestone_index,
+            }
+            for milestone_index, milestone in enumerate(track["milestones"], start=1)
+        )
+    _sync_rows(db, TrackLesson, ("track_id", "lesson_id"), track_lesson_rows)
+    _sync_rows(db, TrackMilestone, ("track_id", "title"), milestone_rows)
 
-        for milestone_index, milestone_payload in enumerate(track_payload["milestones"], start=1):
-            milestone = db.scalar(
-                select(TrackMilestone).where(
-                    TrackMilestone.track_id == track.id,
-                    TrackMilestone.title == milestone_payload["title"],
-                )
-            )
-            if not milestone:
-                db.add(
-                    TrackMilestone(
-                        track_id=track.id,
-                        title=milestone_payload["title"],
-                        description=milestone_payload["description"],
-                        required_lessons=milestone_payload["required_lessons"],
-                        required_avg_quiz_score=milestone_payload["required_avg_quiz_score"],
-                        required_challenges_passed=milestone_payload["required_challenges_passed"],
-                        reward_xp=milestone_payload["reward_xp"],
-                        order_index=milestone_index,
-                    )
-                )
-            else:
-                milestone.description = milestone_payload["description"]
-                milestone.required_lessons = milestone_payload["required_lessons"]
-                milestone.required_avg_quiz_score = milestone_payload["required_avg_quiz_score"]
-                milestone.required_challenges_passed = milestone_payload["required_challenges_passed"]
-                milestone.reward_xp = milestone_payload["reward_xp"]
-                milestone.order_index = milestone_index
 
-    for promo in PROMO_CODES:
-        record = db.scalar(select(PromoCode).where(PromoCode.code == promo["code"]))
-        if not record:
-            db.add(PromoCode(**promo))
+def _missing_daily_missions(db: Session, today: date) -> list[dict]:
+    existing = set(db.scalars(select(DailyMission.title).where(DailyMission.mission_date == today)))
+    return [mission for mission in DAILY_MISSIONS if mission["title"] not in existing]
+
+
+def seed_database(db: Session) -> bool:
+    """Apply the built-in content if it changed since the last run; returns whether it did.
+
+    The content hash is stored in ``seed_state`` so a normal startup costs two SELECTs. When
+    the hash differs, the holder of an advisory lock diffs each table with one SELECT and
+    applies bulk INSERT/UPDATE statements; other workers wait for it and then skip.
+    """
+    digest = content_hash()
+    today = date.today()
+    if _stored_hash(db) == digest and not _missing_daily_missions(db, today):
+        db.rollback()
+        return False
+
+    _acquire_seed_lock(db)
+    # Daily missions are dated, so they are checked on every start rather than hashed.
+    missions = _missing_daily_missions(db, today)
+    if missions:
+        db.execute(insert(DailyMission), [{"mission_date": today, **mission} for mission in missions])
+
+    state = db.get(SeedState, SEED_STATE_NAME)
+    applied = state is None or state.content_hash != digest
+    if applied:
+        _seed_curriculum(db)
+        _sync_rows(db, Achievement, ("code",), [dict(item) for item in ACHIEVEMENTS])
+        _seed_tracks(db)
+        _sync_rows(db, PromoCode, ("code",), [{**promo, "active": True} for promo in PROMO_CODES])
+        if state is None:
+            db.add(SeedState(name=SEED_STATE_NAME, content_hash=digest))
         else:
-            record.description = promo["description"]
-            record.discount_percent = promo["discount_percent"]
-            record.student_only = promo["student_only"]
-            record.max_redemptions = promo["max_redemptions"]
-            record.active = True
+            state.content_hash = digest
 
     db.commit()
+    return applied
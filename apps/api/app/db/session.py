@@ -1,38 +1,152 @@
 import time
+from threading import Lock
 
-from sqlalchemy import event
+from sqlalchemy import event, exc
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
 from app.services.observability import observability_service
 
-engine_options: dict = {"pool_pre_ping": True}
-if settings.database_url.startswith("sqlite"):
-    engine_options["connect_args"] = {"check_same_thread": False}
 
-engine = create_engine(settings.database_url, **engine_options)
+class PoolMetrics:
+    """Checkout wait times across every instrumented pool."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.timeouts = 0
+
+    def record_checkout(self, wait_ms: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+
+pool_metrics = PoolMetrics()
+
+
+class _TimedCheckout:
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_checkout(0.0, timed_out=True)
+            raise
+        pool_metrics.record_checkout((time.perf_counter() - started) * 1000, timed_out=False)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, *, is_async: bool = False) -> dict:
+    options: dict = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if url.startswith("sqlite"):
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_sec,
+        pool_recycle=settings.db_pool_recycle_sec,
+    )
+    if settings.db_statement_timeout_ms > 0:
+        if "asyncpg" in url:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Async engine for request paths that also await the code runner or the LLM; sync services
+# run on it through AsyncSession.run_sync without blocking the event loop.
+async_engine = create_async_engine(
+    settings.async_database_url, **engine_options(settings.async_database_url, is_async=True)
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
-@event.listens_for(engine, "before_cursor_execute")
 def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     context._query_start_time = time.perf_counter()
 
 
-@event.listens_for(engine, "after_cursor_execute")
 def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     start = getattr(context, "_query_start_time", None)
     if start is None:
         return
     duration_ms = (time.perf_counter() - start) * 1000
-    if duration_ms >= 250:
+    observability_service.record_query(duration_ms)
+    if duration_ms >= settings.db_slow_query_ms:
         observability_service.record_slow_query(statement, duration_ms)
 
 
+def instrument_engine(target: Engine) -> None:
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    event.listen(target, "after_cursor_execute", after_cursor_execute)
+
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+
+def _pool_status(target: Engine) -> dict:
+    pool = target.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+def pool_stats() -> dict:
+    checkouts = pool_metrics.checkouts
+    return {
+        "sync": _pool_status(engine),
+        "async": _pool_status(async_engine.sync_engine),
+        "checkouts": checkouts,
+        "checkout_timeouts": pool_metrics.timeouts,
+        "avg_checkout_wait_ms": round(pool_metrics.total_wait_ms / checkouts, 3) if checkouts else 0.0,
+        "max_checkout_wait_ms": round(pool_metrics.max_wait_ms, 3),
+    }
+
+
+observability_service.register_stats_provider("db_pool", pool_stats)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -29,7 +29,12 @@ from app.db.models import Base
 from app.db.schema_compat import ensure_schema_compatibility
 from app.db.seed import seed_database
 from app.db.session import SessionLocal, engine
+from app.services.curriculum_cache import curriculum_cache
+from app.services.event_storage import event_storage_service
+from app.services.event_writer import event_writer
+from app.services.http_clients import http_client_registry
 from app.services.observability import observability_service
+from app.services.ollama_health import ollama_health_monitor
 
 app = FastAPI(
     title="PyPilot Learning SaaS API",
@@ -63,10 +68,19 @@ app.add_middleware(
 @app.middleware("http")
 async def request_observability(request: Request, call_next):
     started = time.perf_counter()
-    response = await call_next(request)
+    db_usage, db_usage_token = observability_service.begin_request_db_usage()
+    try:
+        response = await call_next(request)
+    finally:
+        observability_service.end_request_db_usage(db_usage_token)
     duration_ms = (time.perf_counter() - started) * 1000
     route = request.url.path
     observability_service.record(route, duration_ms, response.status_code)
+    # Route templates keep per-route query stats bounded regardless of path parameters.
+    route_template = getattr(request.scope.get("route"), "path", route)
+    observability_service.record_request_db_usage(
+        f"{request.method} {route_template}", db_usage, settings.db_query_budget_per_request
+    )
     return response
 
 
@@ -75,16 +89,34 @@ def on_startup() -> None:
     try:
         Base.metadata.create_all(bind=engine)
         ensure_schema_compatibility(engine)
+        event_storage_service.ensure_partitioning(engine)
         db = SessionLocal()
         try:
             seed_database(db)
         finally:
             db.close()
+        curriculum_cache.invalidate()
     except Exception as e:
         print(f"Warning: Database initialization failed: {e}")
         print("Continuing without database - some features may be limited")
 
 
+@app.on_event("startup")
+async def start_background_services() -> None:
+    ollama_health_monitor.start()
+    if settings.event_buffer_enabled:
+        event_writer.start(engine)
+    event_storage_service.start(engine)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await ollama_health_monitor.stop()
+    await event_writer.stop()
+    await event_storage_service.stop()
+    await http_client_registry.aclose()
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
@@ -56,3 +56,12 @@ class AdminHealthResponse(BaseModel):
     slow_requests: int
     routes: dict[str, int]
     slow_queries: list[dict] = []
+    components: dict[str, dict] = {}
+
+
+class ChallengeRegradeResponse(BaseModel):
+    challenge_id: int
+    total_submissions: int
+    regraded: int
+    changed: int
+    errors: int
@@ -1,4 +1,5 @@
 ﻿from datetime import datetime
+from typing import Any
 
 from pydantic import BaseModel, Field
 
@@ -96,9 +97,20 @@ class ChallengeSubmissionRequest(BaseModel):
     code: str
 
 
+class ChallengeTestResultOut(BaseModel):
+    name: str
+    passed: bool
+    expected: Any = None
+    actual: Any = None
+    error: str | None = None
+    time_ms: float
+
+
 class ChallengeSubmissionResponse(BaseModel):
     submission_id: str
     passed: bool
     output: str | None
     ai_feedback: str | None
     created_at: datetime
+    verdict: str | None = None
+    test_results: list[ChallengeTestResultOut] = Field(default_factory=list)
@@ -6,9 +6,24 @@ class CodeRunRequest(BaseModel):
     stdin: str | None = Field(default="", max_length=4000)
 
 
+class RunUsage(BaseModel):
+    cpu_user_ms: float
+    cpu_system_ms: float
+    peak_rss_kb: int
+    # Interpreter/process start-up before the first line of the program, then the program itself.
+    startup_ms: float | None = None
+    user_code_ms: float | None = None
+    # Which sandbox limit stopped the run: cpu | memory | wall | output.
+    limit_hit: str | None = None
+
+
 class CodeRunResponse(BaseModel):
     stdout: str
     stderr: str
     exit_code: int
     execution_time_ms: int
+    # The runner stopped the program after it exceeded the output cap.
+    truncated: bool = False
+    # Absent when the runner answered without a sandbox run (syntax errors, cached results).
+    usage: RunUsage | None = None
     ai_error_explanation: str | None = None
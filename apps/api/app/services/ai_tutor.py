@@ -1,53 +1,42 @@
 ﻿from __future__ import annotations
 
 from openai import AsyncOpenAI
-import hashlib
-import json
-import time
-from collections import OrderedDict
 
 from app.core.config import settings
+from app.services.llm_deadline import LLMDeadlineExceeded, llm_deadlines, remaining_sec
+from app.services.llm_scheduler import LLMQueueFullError, llm_scheduler
+from app.services.observability import observability_service
+from app.services.response_cache import (
+    build_response_cache,
+    cache_key,
+    normalize_code,
+    normalize_text,
+)
+from app.services.single_flight import SingleFlight
+
+# Fallback/error texts from either backend; these must never be cached.
+UNCACHEABLE_PREFIXES = (
+    "Error:",
+    "Local AI tutor",
+    "AI tutor is temporarily unavailable",
+    "AI tutor key is not configured",
+    "Offline AI not initialized",
+    "No response generated.",
+)
 
 
-class SimpleLRUCache:
-    """A tiny in-memory LRU cache with optional TTL."""
-
-    def __init__(self, maxsize: int = 200, ttl: int | None = 3600) -> None:
-        self.maxsize = maxsize
-        self.ttl = ttl
-        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()
-
-    def get(self, key: str) -> str | None:
-        item = self._data.get(key)
-        if not item:
-            return None
-        value, ts = item
-        if self.ttl and (time.time() - ts) > self.ttl:
-            try:
-                del self._data[key]
-            except KeyError:
-                pass
-            return None
-        # mark as recently used
-        self._data.move_to_end(key)
-        return value
-
-    def set(self, key: str, value: str) -> None:
-        self._data[key] = (value, time.time())
-        self._data.move_to_end(key)
-        # evict oldest
-        if len(self._data) > self.maxsize:
-            self._data.popitem(last=False)
-
 class AITutorService:
     """
     Primary AI Tutor Service - uses offline local model by default.
     Falls back to OpenRouter API if configured.
-    Implements caching for faster responses.
+    Implements tiered (exact + normalized prompt) caching for faster responses.
     """
 
     def __init__(self) -> None:
-        self._response_cache = SimpleLRUCache(maxsize=200, ttl=3600)  # Simple in-memory LRU cache
+        self._response_cache = build_response_cache()
+        observability_service.register_stats_provider("ai_response_cache", self._response_cache.stats)
+        self._single_flight = SingleFlight()
+        observability_service.register_stats_provider("ai_single_flight", self._single_flight.stats)
         self.use_offline = settings.use_offline_ai
         self.offline_client = None
 
@@ -61,53 +50,34 @@ class AITutorService:
                 api_key=settings.openai_api_key, base_url=settings.openai_base_url
             ) if settings.openai_api_key else None
 
-    async def _generate_offline(self, system_prompt: str, user_prompt: str) -> str:
-        """Use offline Ollama model"""
+    async def _generate_offline(
+        self, system_prompt: str, user_prompt: str, user_key: str = "global", priority: bool = False
+    ) -> str:
+        """Use offline Ollama model (admission is handled inside the offline client)"""
         if not self.offline_client:
             return "Offline AI not initialized"
-        # build cache key
-        cache_key = hashlib.md5(f"offline|{system_prompt}|{user_prompt}|{settings.ollama_model}".encode()).hexdigest()
-        cached = self._response_cache.get(cache_key)
-        if cached:
-            print("Offline cache hit!")
-            return cached
-
-        result = await self.offline_client.chat(user_prompt, mode="general")
-        # store in cache
-        try:
-            if result:
-                self._response_cache.set(cache_key, result)
-        except Exception:
-            pass
-        return result
+        return await self.offline_client.chat(user_prompt, mode="general", priority=priority, queue_key=user_key)
 
     async def _generate_online(self, system_prompt: str, user_prompt: str) -> str:
-        """Use online OpenRouter API with caching"""
+        """Use online OpenRouter API"""
         if not self.online_client:
             return (
                 "AI tutor key is not configured. Add OPENAI_API_KEY in your environment to enable "
                 "personalized explanations."
             )
 
-        # Create cache key from prompts
-        cache_key = hashlib.md5(f"online|{system_prompt}|{user_prompt}|{settings.openai_model}".encode()).hexdigest()
-        # Check cache first
-        cached = self._response_cache.get(cache_key)
-        if cached:
-            print("Online cache hit!")
-            return cached
-
         try:
-            response = await self.online_client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.8,
-                max_tokens=300,
-                timeout=15.0,
-            )
+            async with llm_deadlines.upstream():
+                response = await self.online_client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=0.8,
+                    max_tokens=300,
+                    timeout=remaining_sec(15.0),
+                )
         except Exception as e:
             print(f"AI tutor error: {e}")
             return (
@@ -115,25 +85,48 @@ class AITutorService:
                 "then try again."
             )
 
-            if response.choices and len(response.choices) > 0:
-                result = response.choices[0].message.content or "No response generated."
-                # Cache the response
-                try:
-                    self._response_cache.set(cache_key, result)
-                except Exception:
-                    pass
-                return result
-
+        if response.choices and len(response.choices) > 0:
+            return response.choices[0].message.content or "No response generated."
         return "No response generated."
 
-    async def _generate(self, system_prompt: str, user_prompt: str) -> str:
-        """Generate response using configured backend"""
-        if self.use_offline:
-            return await self._generate_offline(system_prompt, user_prompt)
-        else:
-            return await self._generate_online(system_prompt, user_prompt)
+    async def _generate(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        normalized_prompt: str | None = None,
+        user_key: str = "global",
+        priority: bool = False,
+    ) -> str:
+        """Generate response using configured backend, consulting the response cache first.
+
+        ``normalized_prompt`` is a canonical form of the request; prompts that only differ
+        in wording noise (whitespace, case, code formatting) share its cache entry.
+        Cache misses wait for an LLM scheduler slot on behalf of ``user_key``.
+        """
+        backend, model = ("offline", settings.ollama_model) if self.use_offline else ("online", settings.openai_model)
+        exact_key = cache_key(backend, model, system_prompt, user_prompt)
+        normalized_key = cache_key(backend, model, system_prompt, normalized_prompt) if normalized_prompt else None
+
+        cached = await self._response_cache.get(exact_key, normalized_key)
+        if cached is not None:
+            return cached
 
-    async def explain_concept(self, topic: str, level: str, context: str | None) -> str:
+        async def call_backend() -> str:
+            if self.use_offline:
+                result = await self._generate_offline(system_prompt, user_prompt, user_key, priority)
+            else:
+                async with llm_scheduler.slot(user_key, priority):
+                    result = await self._generate_online(system_prompt, user_prompt)
+            if result and not result.startswith(UNCACHEABLE_PREFIXES):
+                await self._response_cache.set(exact_key, normalized_key, result)
+            return result
+
+        # Identical requests arriving before the first one finishes share its upstream call.
+        return await self._single_flight.do(normalized_key or exact_key, call_backend)
+
+    async def explain_concept(
+        self, topic: str, level: str, context: str | None, user_key: str = "global", priority: bool = False
+    ) -> str:
         system_prompt = "You are PyPilot. Give brief, clear Python explanations. Max 200 words."
         user_prompt = (
             f"Level: {level}\n"
@@ -141,23 +134,30 @@ class AITutorService:
             f"Context: {context or 'None'}\n"
             "Explain concisely with example."
         )
-        return await self._generate(system_prompt, user_prompt)
+        normalized = "|".join(["explain", normalize_text(level), normalize_text(topic), normalize_text(context)])
+        return await self._generate(system_prompt, user_prompt, normalized, user_key, priority)
 
-    async def debug_code(self, code: str, error_message: str) -> str:
+    async def debug_code(
+        self, code: str, error_message: str, user_key: str = "global", priority: bool = False
+    ) -> str:
         system_prompt = "You are a Python debugger. Brief cause, fix, and code. Max 200 words."
         user_prompt = (
             f"Code:\n{code}\n\n"
             f"Error:\n{error_message}\n\n"
             "Provide: cause, fix, code, prevention tip."
         )
-        return await self._generate(system_prompt, user_prompt)
+        normalized = "|".join(["debug", normalize_code(code), normalize_text(error_message)])
+        return await self._generate(system_prompt, user_prompt, normalized, user_key, priority)
 
-    async def generate_practice(self, topic: str, difficulty: str) -> dict[str, str]:
+    async def generate_practice(
+        self, topic: str, difficulty: str, user_key: str = "global", priority: bool = False
+    ) -> dict[str, str]:
         system_prompt = "Create a Python coding exercise. Use exact format: Title: [task name]\nPrompt: [clear instructions]\nStarter Code: [code template]\nHint: [helpful tip]. Keep it simple and educational."
         user_prompt = f"Topic: {topic}\nDifficulty: {difficulty}"
         
         try:
-            content = await self._generate(system_prompt, user_prompt)
+            normalized = "|".join(["practice", normalize_text(topic), normalize_text(difficulty)])
+            content = await self._generate(system_prompt, user_prompt, normalized, user_key, priority)
             
             # Fallback content if AI fails
             parsed = {
@@ -191,7 +191,9 @@ class AITutorService:
                             parsed["hint"] = value
             
             return parsed
-            
+
+        except (LLMQueueFullError, LLMDeadlineExceeded):
+            raise
         except Exception as e:
             print(f"Practice generation error: {e}")
             # Return fallback content
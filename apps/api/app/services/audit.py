@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+from datetime import datetime
+
 from sqlalchemy.orm import Session
 
-from app.db.models import EventLog
+from app.db.models import EventLog, LifecycleEvent
+from app.services.event_writer import event_writer
 
 
 def log_event(
@@ -14,14 +17,36 @@ def log_event(
     entity_id: str | None = None,
     severity: str = "info",
     payload: dict | None = None,
-) -> EventLog:
-    event = EventLog(
-        user_id=user_id,
-        event_type=event_type,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        severity=severity,
-        payload_json=payload,
+    transactional: bool = False,
+) -> None:
+    """Record an audit event once ``db`` commits.
+
+    Events go through the write-behind ``event_writer``; pass ``transactional=True`` for ones
+    that must be inserted in the same transaction as the change they describe.
+    """
+    values = {
+        "user_id": user_id,
+        "event_type": event_type,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "severity": severity,
+        "payload_json": payload,
+        "created_at": datetime.utcnow(),
+    }
+    if transactional:
+        db.add(EventLog(**values))
+    else:
+        event_writer.stage(db, EventLog, values)
+
+
+def log_lifecycle_event(db: Session, user_id: str, event_type: str, metadata: dict | None = None) -> None:
+    event_writer.stage(
+        db,
+        LifecycleEvent,
+        {
+            "user_id": user_id,
+            "event_type": event_type,
+            "metadata_json": metadata,
+            "created_at": datetime.utcnow(),
+        },
     )
-    db.add(event)
-    return event
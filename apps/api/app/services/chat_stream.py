@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from uuid import uuid4
+
+from app.core.config import settings
+from app.services.observability import observability_service
+
+SSE_KEEPALIVE = ": keepalive\n\n"
+_END = object()
+
+
+def sse_frame(data: str, *, event: str | None = None, event_id: str | None = None, retry_ms: int | None = None) -> str:
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class TutorStream:
+    """Frames produced for one generation, kept so reconnecting clients can resume."""
+
+    def __init__(self, stream_id: str, owner_key: str) -> None:
+        self.stream_id = stream_id
+        self.owner_key = owner_key
+        self.frames: list[str] = []
+        self.finished = False
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self.abandon_handle: asyncio.TimerHandle | None = None
+        self._changed = asyncio.Event()
+
+    def append(self, data: str, event: str | None = None, retry_ms: int | None = None) -> None:
+        event_id = f"{self.stream_id}:{len(self.frames) + 1}"
+        self.frames.append(sse_frame(data, event=event, event_id=event_id, retry_ms=retry_ms))
+        self.notify()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class ChatStreamRegistry:
+    """Runs tutor generations as tasks that publish SSE frames to any number of subscribers.
+
+    Chunks are batched into one ``data:`` frame per ``batch_ms`` window. Subscribers get a
+    keepalive comment after ``heartbeat_sec`` of silence. When the last subscriber disconnects
+    the generation is cancelled (closing the upstream request) unless a client resumes with
+    ``Last-Event-ID`` within ``resume_grace_sec``. Finished streams stay resumable for
+    ``retention_sec``.
+    """
+
+    def __init__(self, batch_ms: int, heartbeat_sec: float, resume_grace_sec: float, retention_sec: float) -> None:
+        self.batch_sec = batch_ms / 1000
+        self.heartbeat_sec = heartbeat_sec
+        self.resume_grace_sec = resume_grace_sec
+        self.retention_sec = retention_sec
+        self._streams: dict[str, TutorStream] = {}
+        self.started = 0
+        self.completed = 0
+        self.abandoned = 0
+        self.resumed = 0
+        self.frames_sent = 0
+
+    def get(self, stream_id: str, owner_key: str) -> TutorStream | None:
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.owner_key != owner_key:
+            return None
+        return stream
+
+    def start(
+        self,
+        source: AsyncIterator[str],
+        owner_key: str,
+        on_finish: Callable[[], None] | None = None,
+        stats: dict | None = None,
+    ) -> TutorStream:
+        stream = TutorStream(uuid4().hex[:16], owner_key)
+        self._streams[stream.stream_id] = stream
+        stream.task = asyncio.create_task(self._produce(stream, source, on_finish, stats if stats is not None else {}))
+        self.started += 1
+        return stream
+
+    async def _pump(self, source: AsyncIterator[str], queue: asyncio.Queue) -> None:
+        try:
+            async for chunk in source:
+                if chunk:
+                    await queue.put(chunk)
+        except Exception as exc:
+            await queue.put(exc)
+        finally:
+            await queue.put(_END)
+
+    async def _produce(
+        self,
+        stream: TutorStream,
+        source: AsyncIterator[str],
+        on_finish: Callable[[], None] | None,
+        stats: dict,
+    ) -> None:
+        # The pump lets a partial batch flush on time even while the model is between tokens.
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(self._pump(source, queue))
+        started = time.monotonic()
+        first_chunk_at: float | None = None
+        pending: list[str] = []
+        batch_started = 0.0
+        chunks = chars = 0
+        error: Exception | None = None
+
+        def flush() -> None:
+            nonlocal pending
+            if pending:
+                stream.append(json.dumps({"text": "".join(pending)}), retry_ms=3000 if not stream.frames else None)
+                pending = []
+
+        try:
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, self.batch_sec - (time.monotonic() - batch_started))
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    flush()
+                    continue
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    error = item
+                    continue
+                now = time.monotonic()
+                if first_chunk_at is None:
+                    first_chunk_at = now
+                if not pending:
+                    batch_started = now
+                pending.append(item)
+                chunks += 1
+                chars += len(item)
+            flush()
+            if error is not None:
+                stream.append(json.dumps({"message": str(error)}), event="error")
+            stream.append(
+                json.dumps(
+                    {
+                        "stream_id": stream.stream_id,
+                        "tokens": stats.get("eval_count") or chunks,
+                        "prompt_tokens": stats.get("prompt_eval_count"),
+                        "chunks": chunks,
+                        "chars": chars,
+                        "frames": len(stream.frames) + 1,
+                        "time_to_first_token_ms": (
+                            round((first_chunk_at - started) * 1000, 1) if first_chunk_at is not None else None
+                        ),
+                        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                    }
+                ),
+                event="done",
+            )
+            self.completed += 1
+        finally:
+            pump.cancel()
+            stream.finished = True
+            stream.notify()
+            if on_finish is not None:
+                on_finish()
+            asyncio.get_running_loop().call_later(self.retention_sec, self._streams.pop, stream.stream_id, None)
+
+    def _abandon(self, stream: TutorStream) -> None:
+        stream.abandon_handle = None
+        if stream.subscribers == 0 and not stream.finished and stream.task is not None:
+            stream.task.cancel()
+            self.abandoned += 1
+
+    async def subscribe(
+        self,
+        stream: TutorStream,
+        after: int = 0,
+        is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield frames after sequence number ``after``, then follow the stream until it ends."""
+        if stream.abandon_handle is not None:
+            stream.abandon_handle.cancel()
+            stream.abandon_handle = None
+        stream.subscribers += 1
+        position = max(0, after)
+        try:
+            while True:
+                changed = stream._changed
+                if position < len(stream.frames):
+                    frames = stream.frames[position:]
+                    position += len(frames)
+                    self.frames_sent += len(frames)
+                    yield "".join(frames)
+                    continue
+                if stream.finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), self.heartbeat_sec)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+                    yield SSE_KEEPALIVE
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.finished:
+                stream.abandon_handle = asyncio.get_running_loop().call_later(
+                    self.resume_grace_sec, self._abandon, stream
+                )
+
+    def stats(self) -> dict:
+        return {
+            "active": sum(1 for stream in self._streams.values() if not stream.finished),
+            "retained": len(self._streams),
+            "subscribers": sum(stream.subscribers for stream in self._streams.values()),
+            "started": self.started,
+            "completed": self.completed,
+            "abandoned": self.abandoned,
+            "resumed": self.resumed,
+            "frames_sent": self.frames_sent,
+        }
+
+
+chat_stream_registry = ChatStreamRegistry(
+    batch_ms=settings.chat_stream_batch_ms,
+    heartbeat_sec=settings.chat_stream_heartbeat_sec,
+    resume_grace_sec=settings.chat_stream_resume_grace_sec,
+    retention_sec=settings.chat_stream_retention_sec,
+)
+observability_service.register_stats_provider("chat_streams", chat_stream_registry.stats)
@@ -1,21 +1,109 @@
-﻿import httpx
+﻿import json
+from collections.abc import AsyncIterator
+
+import httpx
 from fastapi import HTTPException
 
 from app.core.config import settings
+from app.services.http_clients import http_client_registry
+
+
+def _raise_if_busy(response: httpx.Response) -> None:
+    """The runner's admission control is saturated; let the client back off and retry."""
+    if response.status_code == 429:
+        raise HTTPException(
+            status_code=429,
+            detail="Code runner is busy. Please try again shortly.",
+            headers={"Retry-After": response.headers.get("Retry-After", "1")},
+        )
 
 
 class CodeRunnerService:
     async def run_python(self, code: str, stdin: str = "") -> dict:
-        payload = {"code": code, "stdin": stdin}
+        return await self._post("/run", {"code": code, "stdin": stdin})
+
+    async def stream_python(self, code: str, stdin: str = "") -> AsyncIterator[dict]:
+        """Stream ``/run/stream`` events: output chunks as they are written, then the result."""
+        client = http_client_registry.get("code_runner")
+        timeout = httpx.Timeout(settings.code_runner_timeout_sec, read=settings.code_runner_timeout_sec + 5)
+        try:
+            async with client.stream(
+                "POST", "/run/stream", json={"code": code, "stdin": stdin}, timeout=timeout
+            ) as response:
+                _raise_if_busy(response)
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise HTTPException(status_code=502, detail=f"Code runner error: {body}")
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        except httpx.RequestError as exc:
+            raise HTTPException(status_code=502, detail="Unable to reach code runner service") from exc
+
+    async def grade_python(self, code: str, cases: list[dict]) -> dict:
+        """Evaluate every test case against ``code`` in a single sandboxed run."""
+        return await self._post("/grade", {"code": code, "cases": cases})
+
+    async def run_batch(self, jobs: list[dict]) -> AsyncIterator[dict]:
+        """Stream per-job results from ``/run/batch`` in completion order.
+
+        Each job is ``{"id", "code", "stdin"}`` or ``{"id", "code", "cases"}`` for grading.
+        """
+        client = http_client_registry.get("code_runner")
+        timeout = httpx.Timeout(settings.code_runner_timeout_sec, read=60)
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.post(f"{settings.code_runner_url}/run", json=payload)
-                response.raise_for_status()
-                return response.json()
+            async with client.stream("POST", "/run/batch", json={"jobs": jobs}, timeout=timeout) as response:
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise HTTPException(status_code=502, detail=f"Code runner error: {body}")
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        except httpx.RequestError as exc:
+            raise HTTPException(status_code=502, detail="Unable to reach code runner service") from exc
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        client = http_client_registry.get("code_runner")
+        try:
+            response = await client.post(path, json=payload)
+            _raise_if_busy(response)
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPStatusError as exc:
             raise HTTPException(status_code=502, detail=f"Code runner error: {exc.response.text}") from exc
         except httpx.RequestError as exc:
             raise HTTPException(status_code=502, detail="Unable to reach code runner service") from exc
 
 
+def gradable_cases(tests_json: list[dict] | None) -> list[dict]:
+    """Test cases that declare an expected value; free-text notes are not gradable."""
+    return [case for case in tests_json or [] if isinstance(case, dict) and "expected" in case]
+
+
+def format_grade_output(grade_result: dict) -> str:
+    """Human-readable grading summary stored as ``Submission.output``."""
+    lines = [f"Passed {grade_result['passed_count']}/{grade_result['total_count']} test cases."]
+    for case in grade_result.get("cases", []):
+        if case["passed"]:
+            continue
+        if case.get("error"):
+            lines.append(f"{case['name']}: {case['error']}")
+        else:
+            lines.append(f"{case['name']}: expected {case['expected']!r}, got {case['actual']!r}")
+    if not grade_result.get("cases") and grade_result.get("stderr"):
+        lines.append(grade_result["stderr"])
+    return "\n".join(lines)
+
+
+def submission_usage(result: dict) -> dict:
+    """``Submission`` resource-accounting columns from a runner ``usage`` block (all ``None`` if absent)."""
+    usage = result.get("usage") or {}
+    columns = {
+        name: round(usage[name]) if usage.get(name) is not None else None
+        for name in ("cpu_user_ms", "cpu_system_ms", "peak_rss_kb", "startup_ms", "user_code_ms")
+    }
+    columns["limit_hit"] = usage.get("limit_hit")
+    return columns
+
+
 code_runner_service = CodeRunnerService()
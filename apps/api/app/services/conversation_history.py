@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+from sqlalchemy import delete, desc, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.models import AITutorConversationMessage
+
+
+@dataclass(slots=True)
+class ConversationMessage:
+    """Message in conversation history"""
+
+    role: str  # "user" or "assistant"
+    content: str
+    timestamp: float  # epoch seconds
+
+
+class ConversationHistoryStore(ABC):
+    """Per-user tutor conversation history, capped at ``max_messages`` and expired after ``ttl_sec``.
+
+    Async callers use the ``*_async`` methods, which move the work to a thread for stores
+    whose ``blocking`` flag says they do I/O.
+    """
+
+    blocking = False
+
+    def __init__(self, max_messages: int, ttl_sec: int) -> None:
+        self.max_messages = max_messages
+        self.ttl_sec = ttl_sec
+
+    @abstractmethod
+    def append(self, user_key: str, role: str, content: str) -> None: ...
+
+    @abstractmethod
+    def recent(self, user_key: str, limit: int | None = None) -> list[ConversationMessage]: ...
+
+    @abstractmethod
+    def clear(self, user_key: str) -> None: ...
+
+    async def _call(self, fn, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def append_async(self, user_key: str, role: str, content: str) -> None:
+        await self._call(self.append, user_key, role, content)
+
+    async def recent_async(self, user_key: str, limit: int | None = None) -> list[ConversationMessage]:
+        return await self._call(self.recent, user_key, limit)
+
+    async def clear_async(self, user_key: str) -> None:
+        await self._call(self.clear, user_key)
+
+
+class InMemoryHistoryStore(ConversationHistoryStore):
+    """Process-local LRU over users; each user keeps a bounded deque of messages."""
+
+    def __init__(self, max_messages: int, ttl_sec: int, max_users: int) -> None:
+        super().__init__(max_messages, ttl_sec)
+        self.max_users = max_users
+        self._lock = Lock()
+        self._histories: OrderedDict[str, deque[ConversationMessage]] = OrderedDict()
+
+    def append(self, user_key: str, role: str, content: str) -> None:
+        with self._lock:
+            history = self._histories.get(user_key)
+            if history is None:
+                history = deque(maxlen=self.max_messages)
+                self._histories[user_key] = history
+            history.append(ConversationMessage(role=role, content=content, timestamp=time.time()))
+            self._histories.move_to_end(user_key)
+            while len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+
+    def recent(self, user_key: str, limit: int | None = None) -> list[ConversationMessage]:
+        with self._lock:
+            history = self._histories.get(user_key)
+            if not history:
+                return []
+            cutoff = time.time() - self.ttl_sec
+            while history and history[0].timestamp < cutoff:
+                history.popleft()
+            if not history:
+                del self._histories[user_key]
+                return []
+            self._histories.move_to_end(user_key)
+            messages = list(history)
+        return messages[-limit:] if limit else messages
+
+    def clear(self, user_key: str) -> None:
+        with self._lock:
+            self._histories.pop(user_key, None)
+
+
+class SQLHistoryStore(ConversationHistoryStore):
+    """Database-backed history shared by every API worker and kept across restarts."""
+
+    blocking = True
+
+    def __init__(self, max_messages: int, ttl_sec: int, session_factory: sessionmaker[Session]) -> None:
+        super().__init__(max_messages, ttl_sec)
+        self.session_factory = session_factory
+
+    def append(self, user_key: str, role: str, content: str) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_sec)
+        with self.session_factory() as db:
+            db.add(AITutorConversationMessage(user_key=user_key, role=role, content=content))
+            db.flush()
+            keep_ids = (
+                select(AITutorConversationMessage.id)
+                .where(AITutorConversationMessage.user_key == user_key)
+                .order_by(desc(AITutorConversationMessage.id))
+                .limit(self.max_messages)
+                .scalar_subquery()
+            )
+            db.execute(
+                delete(AITutorConversationMessage)
+                .where(AITutorConversationMessage.user_key == user_key)
+                .where(
+                    (AITutorConversationMessage.created_at < cutoff)
+                    | AITutorConversationMessage.id.not_in(keep_ids)
+                )
+            )
+            db.commit()
+
+    def recent(self, user_key: str, limit: int | None = None) -> list[ConversationMessage]:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_sec)
+        with self.session_factory() as db:
+            rows = db.scalars(
+                select(AITutorConversationMessage)
+                .where(
+                    AITutorConversationMessage.user_key == user_key,
+                    AITutorConversationMessage.created_at >= cutoff,
+                )
+                .order_by(desc(AITutorConversationMessage.id))
+                .limit(min(limit or self.max_messages, self.max_messages))
+            ).all()
+        return [
+            ConversationMessage(
+                role=row.role,
+                content=row.content,
+                timestamp=row.created_at.replace(tzinfo=timezone.utc).timestamp(),
+            )
+            for row in reversed(rows)
+        ]
+
+    def clear(self, user_key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(AITutorConversationMessage).where(AITutorConversationMessage.user_key == user_key))
+            db.commit()
+
+
+def build_history_store() -> ConversationHistoryStore:
+    if settings.tutor_history_backend == "sql":
+        from app.db.session import SessionLocal
+
+        return SQLHistoryStore(
+            max_messages=settings.tutor_history_max_messages,
+            ttl_sec=settings.tutor_history_ttl_sec,
+            session_factory=SessionLocal,
+        )
+    return InMemoryHistoryStore(
+        max_messages=settings.tutor_history_max_messages,
+        ttl_sec=settings.tutor_history_ttl_sec,
+        max_users=settings.tutor_history_max_users,
+    )
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.db.models import Course, Lesson, Module
+from app.schemas.course import (
+    CodingChallengeOut,
+    CourseOut,
+    LessonOut,
+    ModuleOut,
+    QuizQuestionOut,
+)
+from app.services.observability import observability_service
+
+_COURSE_LIST = TypeAdapter(list[CourseOut])
+
+
+def serialize_course(course: Course) -> CourseOut:
+    modules = sorted(course.modules, key=lambda item: item.order_index)
+    return CourseOut(
+        id=course.id,
+        slug=course.slug,
+        title=course.title,
+        description=course.description,
+        difficulty=course.difficulty,
+        order_index=course.order_index,
+        modules=[
+            ModuleOut(
+                id=module.id,
+                title=module.title,
+                description=module.description,
+                order_index=module.order_index,
+                xp_reward=module.xp_reward,
+                lessons=[
+                    LessonOut(
+                        id=lesson.id,
+                        title=lesson.title,
+                        objective=lesson.objective,
+                        content_md=lesson.content_md,
+                        order_index=lesson.order_index,
+                        estimated_minutes=lesson.estimated_minutes,
+                        quiz_questions=[
+                            QuizQuestionOut(
+                                id=question.id,
+                                prompt=question.prompt,
+                                options=question.options,
+                                correct_option=question.correct_option,
+                                explanation=question.explanation,
+                            )
+                            for question in lesson.quiz_questions
+                        ],
+                        coding_challenges=[
+                            CodingChallengeOut(
+                                id=challenge.id,
+                                title=challenge.title,
+                                prompt=challenge.prompt,
+                                starter_code=challenge.starter_code,
+                                difficulty=challenge.difficulty,
+                                xp_reward=challenge.xp_reward,
+                            )
+                            for challenge in lesson.coding_challenges
+                        ],
+                    )
+                    for lesson in sorted(module.lessons, key=lambda l: l.order_index)
+                ],
+            )
+            for module in modules
+        ],
+    )
+
+
+@dataclass(frozen=True)
+class EncodedDocument:
+    body: bytes
+    etag: str
+
+    @classmethod
+    def of(cls, body: bytes) -> EncodedDocument:
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        candidates = {item.strip().removeprefix("W/") for item in if_none_match.split(",")}
+        return "*" in candidates or self.etag in candidates
+
+
+@dataclass(frozen=True)
+class CurriculumSnapshot:
+    version: int
+    built_at: float
+    catalog: EncodedDocument
+    courses: dict[int, EncodedDocument]
+
+
+class CurriculumCache:
+    """Serialized, pre-encoded view of the published curriculum.
+
+    The snapshot is rebuilt lazily after ``invalidate()`` (admin edits, seeding) or once it
+    is older than ``ttl_sec``, which bounds staleness for edits made through another worker.
+    """
+
+    def __init__(self, ttl_sec: float) -> None:
+        self.ttl_sec = ttl_sec
+        self._version = 0
+        self._snapshot: CurriculumSnapshot | None = None
+        self._lock = Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def _fresh(self, snapshot: CurriculumSnapshot | None) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self._version
+            and time.monotonic() - snapshot.built_at < self.ttl_sec
+        )
+
+    def snapshot(self, db: Session) -> CurriculumSnapshot:
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Another thread may have rebuilt it while we waited for the lock.
+            if self._fresh(self._snapshot):
+                self.hits += 1
+                return self._snapshot
+            version = self._version
+
+        snapshot = self._build(db, version)
+        with self._lock:
+            if snapshot.version == self._version:
+                self._snapshot = snapshot
+        return snapshot
+
+    def _build(self, db: Session, version: int) -> CurriculumSnapshot:
+        courses = db.scalars(
+            select(Course)
+            .where(Course.is_published.is_(True))
+            .order_by(Course.order_index)
+            .options(
+                selectinload(Course.modules)
+                .selectinload(Module.lessons)
+                .selectinload(Lesson.quiz_questions),
+                selectinload(Course.modules)
+                .selectinload(Module.lessons)
+                .selectinload(Lesson.coding_challenges),
+            )
+        ).all()
+        serialized = [serialize_course(course) for course in courses]
+        self.builds += 1
+        return CurriculumSnapshot(
+            version=version,
+            built_at=time.monotonic(),
+            catalog=EncodedDocument.of(_COURSE_LIST.dump_json(serialized)),
+            courses={item.id: EncodedDocument.of(item.model_dump_json().encode("utf-8")) for item in serialized},
+        )
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": self._version,
+            "hits": self.hits,
+            "builds": self.builds,
+            "courses": len(snapshot.courses) if snapshot else 0,
+            "catalog_bytes": len(snapshot.catalog.body) if snapshot else 0,
+        }
+
+
+curriculum_cache = CurriculumCache(ttl_sec=settings.curriculum_cache_ttl_sec)
+observability_service.register_stats_provider("curriculum_cache", curriculum_cache.stats)
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy import case, event, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import (
+    CodingChallenge,
+    Course,
+    LearningTrack,
+    Lesson,
+    LessonProgress,
+    Module,
+    PremiumAccessGrant,
+    SquadMembership,
+    StudySquad,
+    Submission,
+    Subscription,
+    TrackMilestone,
+    User,
+    UserMilestoneCompletion,
+    UserTrackEnrollment,
+)
+from app.schemas.user import DashboardStats
+from app.services.observability import observability_service
+from app.services.product_growth import product_growth_service
+
+ADVANCED_UNLOCK_XP_REQUIRED = 1800
+ADVANCED_UNLOCK_LESSONS_REQUIRED = 12
+DEFAULT_WEEKLY_LESSON_GOAL = 5
+LESSON_COMPLETION_XP = 60
+
+_STALE_KEY = "dashboard_stale_users"
+
+
+def start_of_day_utc() -> datetime:
+    now = datetime.utcnow()
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def start_of_week_utc() -> datetime:
+    day_start = start_of_day_utc()
+    return day_start - timedelta(days=day_start.weekday())
+
+
+def _windowed_sum(timestamp, value, since: datetime):
+    return func.coalesce(func.sum(case((timestamp >= since, value), else_=0)), 0)
+
+
+class DashboardService:
+    """Builds ``DashboardStats`` from two aggregate queries plus entitlements.
+
+    Results are kept per user for ``ttl_sec`` (0 disables caching). Lesson completion,
+    challenge submission and milestone completion call ``invalidate`` for that user, and
+    any committed change to a ``User``, ``Subscription`` or ``PremiumAccessGrant`` row
+    (XP awards, billing webhooks, premium grants) invalidates its owner after commit.
+
+    The cache is per worker process: invalidation only reaches the worker that made the
+    change. ``xp``, ``level``, ``streak_days`` and the advanced-access flags are therefore
+    rebuilt from the request's ``User`` on every hit; the lesson and XP-window aggregates
+    and the subscription status can lag by up to ``ttl_sec`` on other workers.
+    """
+
+    def __init__(self, ttl_sec: float, max_users: int) -> None:
+        self.ttl_sec = ttl_sec
+        self.max_users = max_users
+        self._lock = Lock()
+        self._cache: OrderedDict[str, tuple[float, DashboardStats, bool]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def _mark_stale(self, session: Session, flush_context, instances) -> None:
+        stale = session.info.setdefault(_STALE_KEY, set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, User):
+                stale.add(obj.id)
+            elif isinstance(obj, (Subscription, PremiumAccessGrant)):
+                stale.add(obj.user_id)
+
+    def _invalidate_stale(self, session: Session) -> None:
+        for user_id in session.info.pop(_STALE_KEY, ()):
+            self.invalidate(user_id)
+
+    @staticmethod
+    def _discard_stale(session: Session) -> None:
+        session.info.pop(_STALE_KEY, None)
+
+    def _cached(self, user_id: str) -> tuple[DashboardStats, bool] | None:
+        with self._lock:
+            item = self._cache.get(user_id)
+            if item is None:
+                return None
+            expires_at, stats, can_access_premium = item
+            if time.monotonic() >= expires_at:
+                del self._cache[user_id]
+                return None
+            return stats, can_access_premium
+
+    def _store(self, user_id: str, stats: DashboardStats, can_access_premium: bool) -> None:
+        with self._lock:
+            self._cache[user_id] = (time.monotonic() + self.ttl_sec, stats, can_access_premium)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+
+    async def stats_for(self, db: AsyncSession, user: User) -> DashboardStats:
+        if self.ttl_sec > 0:
+            cached = self._cached(user.id)
+            if cached is not None:
+                self.hits += 1
+                return self._with_user_fields(*cached, user)
+        self.misses += 1
+        stats, can_access_premium = await self._build(db, user)
+        if self.ttl_sec > 0:
+            self._store(user.id, stats, can_access_premium)
+        return stats
+
+    @staticmethod
+    def _with_user_fields(stats: DashboardStats, can_access_premium: bool, user: User) -> DashboardStats:
+        """A cached entry refreshed with the fields read straight off the ``User`` row."""
+        earned_advanced_access = (
+            user.xp >= ADVANCED_UNLOCK_XP_REQUIRED
+            or stats.completed_lessons >= ADVANCED_UNLOCK_LESSONS_REQUIRED
+        )
+        return stats.model_copy(
+            update={
+                "xp": user.xp,
+                "level": user.level,
+                "streak_days": user.streak_days,
+                "earned_advanced_access": earned_advanced_access,
+                "can_access_advanced_topics": can_access_premium or earned_advanced_access,
+            }
+        )
+
+    async def build(self, db: AsyncSession, user: User) -> DashboardStats:
+        stats, _ = await self._build(db, user)
+        return stats
+
+    async def _build(self, db: AsyncSession, user: User) -> tuple[DashboardStats, bool]:
+        day_start = start_of_day_utc()
+        week_start = start_of_week_utc()
+
+        completed_rows = (
+            await db.execute(
+                select(LessonProgress.lesson_id, LessonProgress.completed_at).where(
+                    LessonProgress.user_id == user.id,
+                    LessonProgress.status == "completed",
+                )
+            )
+        ).all()
+        completed_lesson_ids = sorted({int(row.lesson_id) for row in completed_rows})
+        completed_lessons = len(completed_lesson_ids)
+        lessons_completed_today = sum(1 for row in completed_rows if row.completed_at and row.completed_at >= day_start)
+        lessons_completed_week = sum(1 for row in completed_rows if row.completed_at and row.completed_at >= week_start)
+
+        summary = (await db.execute(self._summary_query(user.id, day_start, week_start))).one()
+
+        total_lessons = summary.total_lessons or 0
+        completion_rate = round((completed_lessons / total_lessons) * 100, 1) if total_lessons else 0.0
+        daily_xp = int(
+            (lessons_completed_today * LESSON_COMPLETION_XP) + summary.challenge_xp_today + summary.milestone_xp_today
+        )
+        weekly_xp = int(
+            (lessons_completed_week * LESSON_COMPLETION_XP) + summary.challenge_xp_week + summary.milestone_xp_week
+        )
+
+        weekly_goal_target = DEFAULT_WEEKLY_LESSON_GOAL
+        if summary.squad_name is not None:
+            weekly_goal_target = max(1, int(summary.squad_goal))
+        weekly_goal_progress = min(
+            round((lessons_completed_week / max(1, weekly_goal_target)) * 100, 1),
+            100.0,
+        )
+
+        entitlements = await db.run_sync(product_growth_service.get_entitlements, user)
+        earned_advanced_access = (
+            user.xp >= ADVANCED_UNLOCK_XP_REQUIRED
+            or completed_lessons >= ADVANCED_UNLOCK_LESSONS_REQUIRED
+        )
+
+        stats = DashboardStats(
+            total_lessons=total_lessons,
+            completed_lessons=completed_lessons,
+            completion_rate=completion_rate,
+            xp=user.xp,
+            level=user.level,
+            streak_days=user.streak_days,
+            daily_xp=daily_xp,
+            weekly_xp=weekly_xp,
+            weekly_goal_progress=weekly_goal_progress,
+            completed_lesson_ids=completed_lesson_ids,
+            active_track=summary.active_track,
+            completed_milestones=summary.completed_milestones,
+            squad_name=summary.squad_name,
+            subscription_status=entitlements["subscription_status"],
+            earned_advanced_access=earned_advanced_access,
+            can_access_advanced_topics=entitlements["can_access_premium"] or earned_advanced_access,
+            advanced_unlock_xp_required=ADVANCED_UNLOCK_XP_REQUIRED,
+            advanced_unlock_lessons_required=ADVANCED_UNLOCK_LESSONS_REQUIRED,
+        )
+        return stats, entitlements["can_access_premium"]
+
+    @staticmethod
+    def _summary_query(user_id: str, day_start: datetime, week_start: datetime):
+        """One row: XP windows via conditional aggregation, everything else as scalar subqueries."""
+        challenge_xp = (
+            select(
+                _windowed_sum(Submission.created_at, CodingChallenge.xp_reward, day_start).label("today"),
+                _windowed_sum(Submission.created_at, CodingChallenge.xp_reward, week_start).label("week"),
+            )
+            .select_from(Submission)
+            .join(CodingChallenge, Submission.challenge_id == CodingChallenge.id)
+            .where(
+                Submission.user_id == user_id,
+                Submission.passed.is_(True),
+                Submission.created_at >= week_start,
+            )
+            .subquery()
+        )
+        milestones = (
+            select(
+                _windowed_sum(UserMilestoneCompletion.completed_at, TrackMilestone.reward_xp, day_start).label("today"),
+                _windowed_sum(UserMilestoneCompletion.completed_at, TrackMilestone.reward_xp, week_start).label("week"),
+                func.count(UserMilestoneCompletion.id).label("completed"),
+            )
+            .select_from(UserMilestoneCompletion)
+            .join(TrackMilestone, UserMilestoneCompletion.milestone_id == TrackMilestone.id)
+            .where(UserMilestoneCompletion.user_id == user_id)
+            .subquery()
+        )
+        total_lessons = (
+            select(func.count(Lesson.id))
+            .join(Module, Lesson.module_id == Module.id)
+            .join(Course, Module.course_id == Course.id)
+            .where(Course.is_published.is_(True))
+            .scalar_subquery()
+        )
+        # Most recently updated active enrollment, else the most recently updated one.
+        active_track = (
+            select(LearningTrack.name)
+            .join(UserTrackEnrollment, UserTrackEnrollment.track_id == LearningTrack.id)
+            .where(UserTrackEnrollment.user_id == user_id)
+            .order_by(
+                case((UserTrackEnrollment.status == "active", 0), else_=1),
+                UserTrackEnrollment.updated_at.desc(),
+            )
+            .limit(1)
+            .scalar_subquery()
+        )
+        latest_squad = (
+            select(SquadMembership.squad_id)
+            .where(SquadMembership.user_id == user_id)
+            .order_by(SquadMembership.joined_at.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        squad_name = select(StudySquad.name).where(StudySquad.id == latest_squad).scalar_subquery()
+        squad_goal = select(StudySquad.weekly_goal_lessons).where(StudySquad.id == latest_squad).scalar_subquery()
+
+        return select(
+            total_lessons.label("total_lessons"),
+            challenge_xp.c.today.label("challenge_xp_today"),
+            challenge_xp.c.week.label("challenge_xp_week"),
+            milestones.c.today.label("milestone_xp_today"),
+            milestones.c.week.label("milestone_xp_week"),
+            milestones.c.completed.label("completed_milestones"),
+            active_track.label("active_track"),
+            squad_name.label("squad_name"),
+            squad_goal.label("squad_goal"),
+        ).select_from(challenge_xp.join(milestones, true()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached_users = len(self._cache)
+        return {"ttl_sec": self.ttl_sec, "cached_users": cached_users, "hits": self.hits, "misses": self.misses}
+
+
+dashboard_service = DashboardService(
+    ttl_sec=settings.dashboard_cache_ttl_sec,
+    max_users=settings.dashboard_cache_max_users,
+)
+observability_service.register_stats_provider("dashboard_cache", dashboard_service.stats)
+event.listen(Session, "before_flush", dashboard_service._mark_stale)
+event.listen(Session, "after_commit", dashboard_service._invalidate_stale)
+event.listen(Session, "after_rollback", DashboardService._discard_stale)
@@ -16,6 +16,7 @@ from app.db.models import (
     WeeklyUnlockMission,
 )
 from app.services.audit import log_event
+from app.services.gamification import gamification_service
 
 
 class EconomyService:
@@ -197,7 +198,7 @@ class EconomyService:
         inviter_wallet = self.get_or_create_wallet(db, inviter)
         inviter_wallet.referral_credits += invite.reward_credits
         inviter_wallet.premium_unlock_tokens += 1
-        inviter.xp += invite.reward_xp
+        gamification_service.award_xp(db, inviter, invite.reward_xp)
 
         self._record_txn(
             db,
@@ -242,6 +243,7 @@ class EconomyService:
         log_event(
             db,
             "premium_access.granted",
+            transactional=True,
             user_id=user.id,
             entity_type="premium_access_grant",
             payload={"source": "wallet_token", "days": days},
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import re
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import Table, delete, func, insert, literal, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+
+from app.core.config import settings
+from app.db.models import EconomyTransaction, EventDailyRollup, EventLog
+from app.services.observability import observability_service
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES: tuple[Table, ...] = (EventLog.__table__, EconomyTransaction.__table__)
+# Arbitrary, stable key for pg_try_advisory_xact_lock so one worker runs maintenance at a time.
+MAINTENANCE_LOCK_KEY = 7_301_184_521
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_p{month:%Y_%m}"
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date on Postgres.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def _rollup_queries(start: datetime, end: datetime):
+    for source, table, type_column, amount in (
+        ("event_logs", EventLog, EventLog.event_type, literal(0)),
+        ("economy_transactions", EconomyTransaction, EconomyTransaction.source, func.sum(EconomyTransaction.amount)),
+    ):
+        day = func.date(table.created_at)
+        yield source, (
+            select(
+                day.label("day"),
+                type_column.label("event_type"),
+                func.count().label("event_count"),
+                func.coalesce(amount, 0).label("amount_total"),
+            )
+            .where(table.created_at >= start, table.created_at < end)
+            .group_by(day, type_column)
+        )
+
+
+class EventStorageService:
+    """Partitioning, rollups and retention for the append-only event tables.
+
+    On Postgres ``event_logs`` and ``economy_transactions`` are range-partitioned by month on
+    ``created_at`` (converted in place on first start), so old months are archived and dropped
+    as whole partitions. Elsewhere the same months are archived and deleted by range. Per-day
+    counts survive in ``event_daily_rollups``.
+    """
+
+    def __init__(
+        self,
+        archive_dir: str,
+        retention_months: int,
+        months_ahead: int,
+        interval_sec: float,
+        partitioning_enabled: bool,
+    ) -> None:
+        self.archive_dir = Path(archive_dir)
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.interval_sec = interval_sec
+        self.partitioning_enabled = partitioning_enabled
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run_ms = 0.0
+        self.last_report: dict = {}
+
+    # Postgres partitions
+
+    @staticmethod
+    def _is_partitioned(conn: Connection, table_name: str) -> bool:
+        relkind = conn.scalar(
+            text("SELECT relkind FROM pg_class WHERE relname = :name AND pg_table_is_visible(oid)"),
+            {"name": table_name},
+        )
+        return relkind == "p"
+
+    @staticmethod
+    def _partitions(conn: Connection, table_name: str) -> dict[date, str]:
+        rows = conn.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :name"
+            ),
+            {"name": table_name},
+        ).scalars()
+        partitions = {}
+        for name in rows:
+            match = _PARTITION_SUFFIX.search(name)
+            if match:
+                partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+        return partitions
+
+    def _create_partitions(self, conn: Connection, table_name: str, first: date, last: date) -> int:
+        existing = self._partitions(conn, table_name)
+        created = 0
+        month = first
+        while month <= last:
+            if month not in existing:
+                try:
+                    with conn.begin_nested():
+                        # Dates come from add_months, never from input.
+                        conn.execute(
+                            text(
+                                f"CREATE TABLE {partition_name(table_name, month)} PARTITION OF {table_name} "
+                                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                            )
+                        )
+                    created += 1
+                except Exception:
+                    # Usually rows for this month already landed in the default partition.
+                    logger.exception("Could not create partition %s", partition_name(table_name, month))
+            month = add_months(month, 1)
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT"))
+        return created
+
+    def _convert_to_partitioned(self, conn: Connection, table: Table) -> None:
+        name = table.name
+        legacy = f"{name}_unpartitioned"
+        logger.warning("Converting %s to a monthly partitioned table", name)
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+        sequence = conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy})
+        conn.execute(text(f"UPDATE {legacy} SET created_at = NOW() WHERE created_at IS NULL"))
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+        # Unique constraints on a partitioned table must include the partition key.
+        conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_part_pkey PRIMARY KEY (id, created_at)"))
+        for foreign_key in table.foreign_keys:
+            on_delete = f" ON DELETE {foreign_key.ondelete}" if foreign_key.ondelete else ""
+            conn.execute(
+                text(
+                    f"ALTER TABLE {name} ADD FOREIGN KEY ({foreign_key.parent.name}) "
+                    f"REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name}){on_delete}"
+                )
+            )
+
+        oldest = conn.scalar(text(f"SELECT MIN(created_at) FROM {legacy}"))
+        current = month_start(date.today())
+        first = month_start(oldest.date()) if oldest else current
+        self._create_partitions(conn, name, min(first, current), add_months(current, self.months_ahead))
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {legacy}"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+    def ensure_partitioning(self, engine: Engine) -> None:
+        """Convert the event tables to partitioned tables if needed and pre-create partitions."""
+        if engine.dialect.name != "postgresql" or not self.partitioning_enabled:
+            return
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+            current = month_start(date.today())
+            for table in PARTITIONED_TABLES:
+                if not self._is_partitioned(conn, table.name):
+                    self._convert_to_partitioned(conn, table)
+                self._create_partitions(conn, table.name, current, add_months(current, self.months_ahead))
+
+    # Rollups and retention
+
+    def rollup(self, conn: Connection, first_day: date, last_day: date) -> int:
+        """Recompute ``event_daily_rollups`` for ``first_day``..``last_day`` inclusive."""
+        start = datetime.combine(first_day, datetime.min.time())
+        end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+        conn.execute(delete(EventDailyRollup).where(EventDailyRollup.day >= first_day, EventDailyRollup.day <= last_day))
+        written = 0
+        for source, query in _rollup_queries(start, end):
+            rows = [
+                {
+                    "day": _as_date(row.day),
+                    "source": source,
+                    "event_type": row.event_type,
+                    "event_count": row.event_count,
+                    "amount_total": int(row.amount_total),
+                    "updated_at": datetime.utcnow(),
+                }
+                for row in conn.execute(query)
+            ]
+            if rows:
+                conn.execute(insert(EventDailyRollup), rows)
+                written += len(rows)
+        return written
+
+    def _rollup_start(self, conn: Connection) -> date:
+        # Re-roll the last rolled-up day, which may have been partial.
+        last = conn.scalar(select(func.max(EventDailyRollup.day)))
+        if last is not None:
+            return _as_date(last)
+        oldest = [conn.scalar(select(func.min(table.c.created_at))) for table in PARTITIONED_TABLES]
+        oldest = [value for value in oldest if value is not None]
+        return min(oldest).date() if oldest else date.today()
+
+    def archive_month(self, conn: Connection, table: Table, month: date) -> tuple[Path, int]:
+        path = self.archive_dir / table.name / f"{month:%Y-%m}.jsonl.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".partial")
+        rows = conn.execute(
+            select(table)
+            .where(
+                table.c.created_at >= datetime.combine(month, datetime.min.time()),
+                table.c.created_at < datetime.combine(add_months(month, 1), datetime.min.time()),
+            )
+            .order_by(table.c.id)
+            .execution_options(stream_results=True, yield_per=1000)
+        )
+        count = 0
+        with gzip.open(partial, "wt", encoding="utf-8") as handle:
+            for row in rows:
+                handle.write(json.dumps(dict(row._mapping), default=_json_default) + "\n")
+                count += 1
+        partial.replace(path)
+        return path, count
+
+    def _drop_month(self, conn: Connection, table: Table, month: date, partitions: dict[date, str]) -> None:
+        partition = partitions.get(month)
+        if partition is not None:
+            conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {partition}"))
+            conn.execute(text(f"DROP TABLE {partition}"))
+            return
+        conn.execute(
+            delete(table).where(
+                table.c.created_at >= datetime.combine(month, datetime.min.time()),
+                table.c.created_at < datetime.combine(add_months(month, 1), datetime.min.time()),
+            )
+        )
+
+    def apply_retention(self, conn: Connection) -> list[dict]:
+        if self.retention_months <= 0:
+            return []
+        cutoff = add_months(month_start(date.today()), -self.retention_months)
+        is_postgres = conn.dialect.name == "postgresql"
+        archived = []
+        for table in PARTITIONED_TABLES:
+            oldest = conn.scalar(select(func.min(table.c.created_at)))
+            if oldest is None:
+                continue
+            partitions = self._partitions(conn, table.name) if is_postgres and self.partitioning_enabled else {}
+            month = month_start(oldest.date())
+            while month < cutoff:
+                path, count = self.archive_month(conn, table, month)
+                self._drop_month(conn, table, month, partitions)
+                archived.append({"table": table.name, "month": f"{month:%Y-%m}", "rows": count, "path": str(path)})
+                month = add_months(month, 1)
+        return archived
+
+    def run_maintenance(self, engine: Engine) -> dict:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql" and not conn.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}
+            ):
+                return {"skipped": True}
+            created = 0
+            if conn.dialect.name == "postgresql" and self.partitioning_enabled:
+                current = month_start(date.today())
+                for table in PARTITIONED_TABLES:
+                    if self._is_partitioned(conn, table.name):
+                        created += self._create_partitions(
+                            conn, table.name, current, add_months(current, self.months_ahead)
+                        )
+            # Roll up before retention so counts for archived months stay queryable.
+            first_day = self._rollup_start(conn)
+            rollup_rows = self.rollup(conn, first_day, date.today())
+            archived = self.apply_retention(conn)
+
+        report = {
+            "partitions_created": created,
+            "rollup_from": first_day.isoformat(),
+            "rollup_rows": rollup_rows,
+            "archived": archived,
+        }
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        self.last_report = report
+        return report
+
+    async def _run(self, engine: Engine) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_maintenance, engine)
+            except Exception:
+                self.failures += 1
+                logger.exception("Event storage maintenance failed")
+            await asyncio.sleep(self.interval_sec)
+
+    def start(self, engine: Engine) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(engine))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_ms": round(self.last_run_ms, 3),
+            "last_report": self.last_report,
+            "retention_months": self.retention_months,
+        }
+
+
+event_storage_service = EventStorageService(
+    archive_dir=settings.event_archive_dir,
+    retention_months=settings.event_retention_months,
+    months_ahead=settings.event_partition_months_ahead,
+    interval_sec=settings.event_maintenance_interval_sec,
+    partitioning_enabled=settings.event_partitioning_enabled,
+)
+observability_service.register_stats_provider("event_storage", event_storage_service.stats)
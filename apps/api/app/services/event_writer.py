@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.observability import observability_service
+
+logger = logging.getLogger(__name__)
+
+_STAGED_KEY = "event_writer_staged"
+MAX_WRITE_ATTEMPTS = 3
+
+
+class EventWriter:
+    """Write-behind buffer for append-only event rows.
+
+    ``stage`` parks a row on the caller's session; once that session commits the row moves to
+    a bounded in-memory queue, and rolled-back sessions discard theirs. A background task drains
+    the queue every ``flush_interval_sec`` or as soon as ``batch_size`` rows are waiting, with
+    one multi-row INSERT per table. When the writer is not running or the queue is full, the
+    row is added to the session instead (``overflow="inline"``) or dropped (``overflow="drop"``).
+
+    If a batch INSERT fails its rows are retried one per transaction, so a bad row cannot take
+    the rest of the batch with it. Rows that still fail go back on the queue while it has room
+    and are dropped (counted in ``failed``) after ``MAX_WRITE_ATTEMPTS`` tries.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_sec: float, overflow: str) -> None:
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.overflow = overflow
+        # (model, values, failed write attempts so far)
+        self._queue: deque[tuple[type, dict, int]] = deque()
+        self._lock = Lock()
+        self._bind: Engine | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.inline = 0
+        self.dropped = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stage(self, db: Session, model: type, values: dict) -> None:
+        with self._lock:
+            staged = db.info.get(_STAGED_KEY, ())
+            has_room = len(self._queue) + len(staged) < self.max_queue
+        if self.running and has_room:
+            if not db.in_transaction():
+                # Staging emits no SQL; begin explicitly so a rollback still fires and discards it.
+                db.begin()
+            db.info.setdefault(_STAGED_KEY, []).append((model, values))
+            return
+        if self.overflow == "drop" and self.running:
+            self.dropped += 1
+            return
+        self.inline += 1
+        db.add(model(**values))
+
+    def _enqueue_staged(self, session: Session) -> None:
+        staged = session.info.pop(_STAGED_KEY, None)
+        if not staged:
+            return
+        with self._lock:
+            self._queue.extend((model, values, 0) for model, values in staged)
+            self.enqueued += len(staged)
+            depth = len(self._queue)
+        if depth >= self.batch_size and self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    @staticmethod
+    def _discard_staged(session: Session, previous_transaction) -> None:
+        # Staging emits no SQL, so listen for soft rollbacks too; savepoints keep their rows.
+        if not previous_transaction.nested:
+            session.info.pop(_STAGED_KEY, None)
+
+    def start(self, bind: Engine) -> None:
+        if self.running:
+            return
+        self._bind = bind
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="event-writer")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # Anything committed before shutdown still gets written; retries are bounded per row.
+        while await self.flush():
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while await self.flush() >= self.batch_size:
+                pass
+
+    async def flush(self) -> int:
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        if not batch or self._bind is None:
+            return 0
+        return await asyncio.to_thread(self._write, batch)
+
+    def _insert(self, batch: list[tuple[type, dict, int]]) -> None:
+        by_table: dict = {}
+        for model, values, _ in batch:
+            by_table.setdefault(model.__table__, []).append(values)
+        with self._bind.begin() as connection:
+            for table, rows in by_table.items():
+                connection.execute(insert(table), rows)
+
+    def _write(self, batch: list[tuple[type, dict, int]]) -> int:
+        started = time.perf_counter()
+        try:
+            self._insert(batch)
+        except Exception:
+            logger.warning("Batch insert of %d buffered events failed; retrying row by row", len(batch), exc_info=True)
+            self._write_rows(batch)
+            return len(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        return len(batch)
+
+    def _write_rows(self, batch: list[tuple[type, dict, int]]) -> None:
+        retry: list[tuple[type, dict, int]] = []
+        for model, values, attempts in batch:
+            try:
+                self._insert([(model, values, attempts)])
+            except Exception:
+                if attempts + 1 < MAX_WRITE_ATTEMPTS:
+                    retry.append((model, values, attempts + 1))
+                else:
+                    self.failed += 1
+                    logger.exception("Dropping buffered %s event after %d attempts", model.__tablename__, attempts + 1)
+            else:
+                self.written += 1
+        if not retry:
+            return
+        with self._lock:
+            requeued = retry[: max(0, self.max_queue - len(self._queue))]
+            self._queue.extend(requeued)
+        self.retried += len(requeued)
+        if len(requeued) < len(retry):
+            self.failed += len(retry) - len(requeued)
+            logger.error("Event queue full; dropped %d events awaiting retry", len(retry) - len(requeued))
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "inline": self.inline,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "failed": self.failed,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+event_writer = EventWriter(
+    max_queue=settings.event_buffer_max_queue,
+    batch_size=settings.event_buffer_batch_size,
+    flush_interval_sec=settings.event_buffer_flush_interval_sec,
+    overflow=settings.event_buffer_overflow,
+)
+event.listen(Session, "after_commit", event_writer._enqueue_staged)
+event.listen(Session, "after_soft_rollback", EventWriter._discard_staged)
+observability_service.register_stats_provider("event_writer", event_writer.stats)
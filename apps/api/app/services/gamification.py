@@ -4,6 +4,7 @@ from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.db.models import Achievement, LessonProgress, User, UserAchievement
+from app.services.leaderboard import leaderboard_service
 
 
 class GamificationService:
@@ -28,6 +29,7 @@ class GamificationService:
     def award_xp(self, db: Session, user: User, amount: int) -> None:
         user.xp += max(0, amount)
         user.level = self.calculate_level(user.xp)
+        leaderboard_service.record_award(db, user, amount)
 
     def update_streak(self, user: User) -> None:
         today = date.today()
@@ -71,7 +73,7 @@ class GamificationService:
                 continue
 
             db.add(UserAchievement(user_id=user.id, achievement_id=achievement.id))
-            user.xp += achievement.xp_bonus
+            self.award_xp(db, user, achievement.xp_bonus)
             unlocked.append(achievement)
 
         user.level = self.calculate_level(user.xp)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+
+import httpx
+
+from app.core.config import settings
+
+# HTTP/2 needs the optional ``h2`` package; without it every upstream stays on HTTP/1.1.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    base_url: str
+    timeout_sec: float
+    http2: bool = False
+
+
+def _upstreams() -> dict[str, UpstreamConfig]:
+    return {
+        "code_runner": UpstreamConfig(
+            base_url=settings.code_runner_url,
+            timeout_sec=settings.code_runner_timeout_sec,
+            http2=settings.code_runner_http2,
+        ),
+        "ollama": UpstreamConfig(
+            base_url=settings.ollama_base_url,
+            timeout_sec=settings.ollama_timeout_sec,
+            http2=settings.ollama_http2,
+        ),
+    }
+
+
+class HTTPClientRegistry:
+    """Long-lived, keep-alive ``httpx.AsyncClient`` per upstream, closed on app shutdown."""
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._build(upstream)
+            self._clients[upstream] = client
+        return client
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        config = _upstreams()[upstream]
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            timeout=httpx.Timeout(config.timeout_sec, connect=settings.http_connect_timeout_sec),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry_sec,
+            ),
+            http2=config.http2 and HTTP2_AVAILABLE,
+        )
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+http_client_registry = HTTPClientRegistry()
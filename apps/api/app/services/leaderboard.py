@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from threading import Lock
+
+from sortedcontainers import SortedList
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import SquadMembership, User, WeeklyXPTotal
+from app.services.observability import observability_service
+
+LEADERBOARD_SCOPES = ("global", "weekly", "squad")
+_PENDING_KEY = "leaderboard_pending"
+
+
+def current_week_start() -> date:
+    today = datetime.utcnow().date()
+    return today - timedelta(days=today.weekday())
+
+
+class RankBoard:
+    """Scores kept as sorted ``(-xp, user_id)`` keys so rank lookups are a binary search.
+
+    ``SortedList`` keeps updates at O(log n) as well. Ranks are competition ranks: one plus
+    the number of users with strictly more XP.
+    """
+
+    def __init__(self) -> None:
+        self._keys: SortedList = SortedList()
+        self._scores: dict[str, int] = {}
+
+    @classmethod
+    def from_scores(cls, scores: dict[str, int]) -> RankBoard:
+        board = cls()
+        board._scores = dict(scores)
+        board._keys = SortedList((-xp, user_id) for user_id, xp in scores.items())
+        return board
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def score(self, user_id: str) -> int | None:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: str, xp: int) -> None:
+        previous = self._scores.get(user_id)
+        if previous == xp:
+            return
+        if previous is not None:
+            self._keys.remove((-previous, user_id))
+        self._keys.add((-xp, user_id))
+        self._scores[user_id] = xp
+
+    def add(self, user_id: str, amount: int) -> None:
+        self.set(user_id, (self._scores.get(user_id) or 0) + amount)
+
+    def rank_for_score(self, xp: int) -> int:
+        return self._keys.bisect_left((-xp, "")) + 1
+
+    def position(self, user_id: str) -> int | None:
+        xp = self._scores.get(user_id)
+        if xp is None:
+            return None
+        return self._keys.bisect_left((-xp, user_id))
+
+    def slice(self, start: int, stop: int) -> list[tuple[int, str, int]]:
+        """``(rank, user_id, xp)`` for sorted positions ``start:stop``."""
+        return [
+            (self.rank_for_score(-neg_xp), user_id, -neg_xp) for neg_xp, user_id in self._keys.islice(start, stop)
+        ]
+
+
+class LeaderboardService:
+    """Global and weekly rank indexes, updated incrementally as XP is awarded.
+
+    ``record_award`` stages the new totals on the session and they are applied to the in-memory
+    boards only once that session commits. Boards older than ``refresh_sec`` are rebuilt from
+    ``users.xp`` and ``weekly_xp_totals`` on a background thread, to pick up XP awarded by other
+    workers, while requests keep reading the old ones; updates committed during the rebuild are
+    replayed onto the new boards. Only a cold start or a new week loads inline, one request at
+    a time. Squad boards are small and built per request from weekly totals.
+
+    Every worker process holds its own boards, so the global and weekly ranks served by two
+    workers can disagree until each has refreshed; ``weekly_xp_totals`` is the source of truth.
+    """
+
+    def __init__(self, refresh_sec: float) -> None:
+        self.refresh_sec = refresh_sec
+        self._lock = Lock()
+        self._load_lock = Lock()  # at most one load per process
+        self._global: RankBoard | None = None
+        self._weekly: RankBoard | None = None
+        self._week_start: date | None = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._replay: list[tuple[str, tuple]] | None = None
+        self.loads = 0
+        self.background_refreshes = 0
+        self.applied_updates = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._global = None
+            self._weekly = None
+            self._week_start = None
+
+    def record_award(self, db: Session, user: User, amount: int) -> None:
+        """Add ``amount`` to this week's total; call after ``user.xp`` has been updated."""
+        week_start = current_week_start()
+        weekly_xp: int | None = None
+        if amount > 0:
+            row = (WeeklyXPTotal.week_start == week_start, WeeklyXPTotal.user_id == user.id)
+            # Increment in SQL: a read-modify-write would lose concurrent awards for the same week.
+            increment = update(WeeklyXPTotal).where(*row).values(xp=WeeklyXPTotal.xp + amount)
+            if db.execute(increment).rowcount == 0:
+                try:
+                    with db.begin_nested():
+                        db.add(WeeklyXPTotal(user_id=user.id, week_start=week_start, xp=amount))
+                except IntegrityError:
+                    # Another transaction created this week's row first.
+                    db.execute(increment)
+            weekly_xp = db.scalar(select(WeeklyXPTotal.xp).where(*row))
+
+        # Absolute totals rather than deltas, so replaying them after a rebuild is harmless.
+        pending = db.info.setdefault(_PENDING_KEY, {})
+        if weekly_xp is None and user.id in pending:
+            weekly_xp = pending[user.id][2]
+        pending[user.id] = (user.xp, week_start, weekly_xp)
+
+    def _apply(self, user_id: str, xp: int, week_start: date, weekly_xp: int | None) -> None:
+        # Caller holds ``_lock``.
+        if self._global is not None:
+            self._global.set(user_id, xp)
+        if self._weekly is not None and self._week_start == week_start and weekly_xp is not None:
+            self._weekly.set(user_id, weekly_xp)
+
+    def _apply_pending(self, session: Session) -> None:
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        with self._lock:
+            for user_id, update in pending.items():
+                self._apply(user_id, *update)
+                if self._replay is not None:
+                    self._replay.append((user_id, update))
+                self.applied_updates += 1
+
+    @staticmethod
+    def _discard_pending(session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    def _current(self, week_start: date) -> tuple[RankBoard, RankBoard] | None:
+        # Caller holds ``_lock``.
+        if self._global is None or self._weekly is None or self._week_start != week_start:
+            return None
+        return self._global, self._weekly
+
+    def _load(self, db: Session, week_start: date) -> None:
+        """Rebuild both boards from the database and swap them in; caller holds ``_load_lock``."""
+        with self._lock:
+            self._replay = []
+        try:
+            global_scores = {row.id: row.xp or 0 for row in db.execute(select(User.id, User.xp))}
+            weekly_scores = {
+                row.user_id: row.xp
+                for row in db.execute(
+                    select(WeeklyXPTotal.user_id, WeeklyXPTotal.xp).where(
+                        WeeklyXPTotal.week_start == week_start,
+                        WeeklyXPTotal.xp > 0,
+                    )
+                )
+            }
+            global_board = RankBoard.from_scores(global_scores)
+            weekly_board = RankBoard.from_scores(weekly_scores)
+            with self._lock:
+                self._global = global_board
+                self._weekly = weekly_board
+                self._week_start = week_start
+                # Commits that landed after the snapshot was read would otherwise be lost.
+                for user_id, update in self._replay or ():
+                    self._apply(user_id, *update)
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def _refresh_in_background(self, bind: Engine | Connection) -> None:
+        try:
+            with self._load_lock, Session(bind=bind) as db:
+                self._load(db, current_week_start())
+                self.background_refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _boards(self, db: Session) -> tuple[RankBoard, RankBoard]:
+        week_start = current_week_start()
+        with self._lock:
+            boards = self._current(week_start)
+            if boards is not None:
+                if time.monotonic() - self._loaded_at >= self.refresh_sec and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_in_background, args=(db.get_bind(),), daemon=True
+                    ).start()
+                return boards
+
+        # Nothing servable (cold start or a new week): load now, once for all waiting requests.
+        with self._load_lock:
+            with self._lock:
+                boards = self._current(week_start)
+            if boards is None:
+                self._load(db, week_start)
+                with self._lock:
+                    boards = self._current(week_start)
+        assert boards is not None
+        return boards
+
+    def _squad_board(self, db: Session, user: User, weekly: RankBoard) -> RankBoard:
+        squad_id = db.scalar(
+            select(SquadMembership.squad_id)
+            .where(SquadMembership.user_id == user.id)
+            .order_by(SquadMembership.joined_at.desc())
+            .limit(1)
+        )
+        if squad_id is None:
+            return RankBoard()
+        member_ids = db.scalars(select(SquadMembership.user_id).where(SquadMembership.squad_id == squad_id)).all()
+        return RankBoard.from_scores({member_id: weekly.score(member_id) or 0 for member_id in member_ids})
+
+    def _board(self, db: Session, user: User, scope: str) -> RankBoard:
+        if scope not in LEADERBOARD_SCOPES:
+            raise ValueError(f"Unknown leaderboard scope: {scope}")
+        global_board, weekly_board = self._boards(db)
+        if scope == "global":
+            if global_board.score(user.id) is None:
+                # Signed up since the last load.
+                with self._lock:
+                    global_board.set(user.id, user.xp)
+            return global_board
+        if scope == "weekly":
+            return weekly_board
+        return self._squad_board(db, user, weekly_board)
+
+    @staticmethod
+    def _rank_on(board: RankBoard, user_id: str, scope: str) -> int | None:
+        xp = board.score(user_id)
+        if xp is None and scope == "squad":
+            return None
+        return board.rank_for_score(xp or 0)
+
+    def rank(self, db: Session, user: User, scope: str = "global") -> int | None:
+        board = self._board(db, user, scope)
+        with self._lock:
+            return self._rank_on(board, user.id, scope)
+
+    def page(self, db: Session, user: User, scope: str = "global", offset: int = 0, limit: int = 20) -> list[dict]:
+        board = self._board(db, user, scope)
+        with self._lock:
+            rows = board.slice(offset, offset + limit)
+        return self._entries(db, rows)
+
+    def around(self, db: Session, user: User, scope: str = "global", before: int = 5, after: int = 5) -> dict:
+        board = self._board(db, user, scope)
+        with self._lock:
+            position = board.position(user.id)
+            if position is None:
+                # No XP on this board yet: show the tail, where the user would appear.
+                position = len(board)
+            rows = board.slice(max(0, position - before), position + after + 1)
+            rank = self._rank_on(board, user.id, scope)
+            total = len(board)
+        return {
+            "scope": scope,
+            "rank": rank,
+            "total": total,
+            "entries": self._entries(db, rows),
+        }
+
+    @staticmethod
+    def _entries(db: Session, rows: list[tuple[int, str, int]]) -> list[dict]:
+        if not rows:
+            return []
+        users = {
+            row.id: row
+            for row in db.execute(
+                select(User.id, User.full_name, User.level).where(User.id.in_([user_id for _, user_id, _ in rows]))
+            )
+        }
+        return [
+            {
+                "rank": rank,
+                "user_id": user_id,
+                "name": users[user_id].full_name,
+                "xp": xp,
+                "level": users[user_id].level,
+            }
+            for rank, user_id, xp in rows
+            if user_id in users
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "global_users": len(self._global) if self._global is not None else 0,
+                "weekly_users": len(self._weekly) if self._weekly is not None else 0,
+                "week_start": self._week_start.isoformat() if self._week_start else None,
+                "loads": self.loads,
+                "background_refreshes": self.background_refreshes,
+                "refreshing": self._refreshing,
+                "applied_updates": self.applied_updates,
+            }
+
+
+leaderboard_service = LeaderboardService(refresh_sec=settings.leaderboard_refresh_sec)
+event.listen(Session, "after_commit", leaderboard_service._apply_pending)
+event.listen(Session, "after_rollback", LeaderboardService._discard_pending)
+observability_service.register_stats_provider("leaderboard", leaderboard_service.stats)
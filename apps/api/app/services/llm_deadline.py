@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import httpx
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.services.observability import observability_service
+
+T = TypeVar("T")
+
+
+class LLMDeadlineExceeded(HTTPException):
+    """Raised when a tutor generation could not finish within its endpoint's budget."""
+
+    def __init__(self) -> None:
+        super().__init__(status_code=504, detail="AI tutor took too long to answer. Please try a shorter question.")
+
+
+class ClientClosedRequest(HTTPException):
+    """Raised after cancelling a generation whose client has already gone away."""
+
+    def __init__(self) -> None:
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+class Deadline:
+    """Absolute end time of one tutor request, plus the upstream time spent against it."""
+
+    def __init__(self, budget_sec: float) -> None:
+        self.budget_sec = budget_sec
+        self.expires_at = time.monotonic() + budget_sec
+        self.upstream_sec = 0.0
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+# Set around each tutor request; tasks spawned inside (single flight, chat streams) inherit it.
+_current_deadline: ContextVar[Deadline | None] = ContextVar("llm_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+def remaining_sec(default: float) -> float:
+    """``default`` capped by the current request's remaining budget."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline.remaining())
+
+
+class LLMDeadlines:
+    """Propagates per-endpoint budgets into upstream LLM calls and reclaims abandoned generations.
+
+    ``run`` bounds a non-streaming generation by its budget and cancels it as soon as the
+    client disconnects; cancelling the task closes the Ollama request, which stops the
+    generation. Upstream calls wrap themselves in ``upstream`` so that time spent on
+    generations nobody received is reported as wasted.
+    """
+
+    def __init__(self, tokens_per_sec: float, min_num_predict: int, poll_sec: float) -> None:
+        self.tokens_per_sec = tokens_per_sec  # EWMA of observed generation throughput
+        self.min_num_predict = min_num_predict
+        self.poll_sec = poll_sec
+        self.completed = 0
+        self.cancelled = 0
+        self.deadline_exceeded = 0
+        self.client_disconnects = 0
+        self.generation_sec = 0.0
+        self.cancelled_sec = 0.0
+        self.wasted_sec = 0.0
+
+    @contextmanager
+    def budget(self, budget_sec: float) -> Iterator[Deadline]:
+        deadline = Deadline(budget_sec)
+        token = _current_deadline.set(deadline)
+        try:
+            yield deadline
+        finally:
+            _current_deadline.reset(token)
+
+    def expired(self) -> bool:
+        deadline = _current_deadline.get()
+        return deadline is not None and deadline.expired
+
+    def num_predict(self, cap: int) -> int:
+        """Largest token count the current budget can still produce at the observed throughput."""
+        deadline = _current_deadline.get()
+        if deadline is None:
+            return cap
+        affordable = int(deadline.remaining() * self.tokens_per_sec * 0.9)
+        return max(self.min_num_predict, min(cap, affordable))
+
+    def upstream_timeout(self) -> httpx.Timeout | Any:
+        deadline = _current_deadline.get()
+        if deadline is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(
+            max(0.1, min(settings.ollama_timeout_sec, deadline.remaining())),
+            connect=settings.http_connect_timeout_sec,
+        )
+
+    def record_throughput(self, data: dict) -> None:
+        """Fold Ollama's ``eval_count`` / ``eval_duration`` (ns) into the tokens/sec estimate."""
+        eval_count = data.get("eval_count")
+        eval_duration = data.get("eval_duration")
+        if not eval_count or not eval_duration:
+            return
+        observed = eval_count / (eval_duration / 1e9)
+        self.tokens_per_sec = 0.8 * self.tokens_per_sec + 0.2 * observed
+
+    @asynccontextmanager
+    async def upstream(self):
+        """Time one upstream generation and classify how it ended."""
+        deadline = _current_deadline.get()
+        started = time.monotonic()
+        outcome = "completed"
+        try:
+            yield deadline
+        except BaseException as exc:
+            if deadline is not None and deadline.expired:
+                outcome = "deadline"
+            elif isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+                outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            if deadline is not None:
+                deadline.upstream_sec += elapsed
+            self.generation_sec += elapsed
+            if outcome == "cancelled":
+                self.cancelled += 1
+                self.cancelled_sec += elapsed
+                self.wasted_sec += elapsed
+            elif outcome == "deadline":
+                self.deadline_exceeded += 1
+                self.wasted_sec += elapsed
+            else:
+                self.completed += 1
+
+    async def run(self, request: Request, budget_sec: float, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()`` within ``budget_sec``, cancelling it if the deadline passes or the client leaves."""
+        with self.budget(budget_sec) as deadline:
+            task = asyncio.ensure_future(fn())
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=min(self.poll_sec, deadline.remaining()))
+                if done:
+                    return task.result()
+                if deadline.expired:
+                    raise LLMDeadlineExceeded()
+                if await request.is_disconnected():
+                    self.client_disconnects += 1
+                    raise ClientClosedRequest()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "deadline_exceeded": self.deadline_exceeded,
+            "client_disconnects": self.client_disconnects,
+            "generation_sec": round(self.generation_sec, 2),
+            "cancelled_sec": round(self.cancelled_sec, 2),
+            "wasted_sec": round(self.wasted_sec, 2),
+            "tokens_per_sec": round(self.tokens_per_sec, 2),
+        }
+
+
+llm_deadlines = LLMDeadlines(
+    tokens_per_sec=settings.llm_tokens_per_sec,
+    min_num_predict=settings.llm_min_num_predict,
+    poll_sec=settings.llm_disconnect_poll_sec,
+)
+observability_service.register_stats_provider("llm_generations", llm_deadlines.stats)
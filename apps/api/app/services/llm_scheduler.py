@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.llm_deadline import remaining_sec
+from app.services.observability import observability_service
+
+
+class LLMQueueFullError(HTTPException):
+    """Raised instead of queueing when a tutor request could not start within the deadline."""
+
+    def __init__(self, retry_after_sec: float) -> None:
+        super().__init__(
+            status_code=503,
+            detail="AI tutor is busy right now. Please try again in a few seconds.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after_sec)))},
+        )
+
+
+@dataclass
+class LLMTicket:
+    user_key: str
+    admitted_at: float
+
+
+@dataclass
+class _Waiter:
+    user_key: str
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class LLMScheduler:
+    """Admission control in front of every upstream LLM call.
+
+    At most ``max_concurrency`` generations run at once and each user holds at most
+    ``per_user_concurrency`` of them. Waiting requests sit in a priority lane (premium
+    ``priority_debug_queue`` users) or a normal lane; within a lane users are served
+    round-robin so one user's burst cannot starve everyone else. Requests that would
+    wait longer than ``max_wait_sec`` are rejected with a 503 instead of queueing.
+    """
+
+    def __init__(self, max_concurrency: int, per_user_concurrency: int, max_queue: int, max_wait_sec: float) -> None:
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.max_queue = max_queue
+        self.max_wait_sec = max_wait_sec
+        # Lane 0 is the priority lane; each lane maps user_key -> that user's waiters.
+        self._lanes: tuple[OrderedDict[str, deque[_Waiter]], ...] = (OrderedDict(), OrderedDict())
+        self._in_flight = 0
+        self._user_in_flight: dict[str, int] = {}
+        self._service_time_sec: float | None = None  # EWMA of slot hold time
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def _queued(self, lane: int | None = None) -> int:
+        lanes = self._lanes if lane is None else (self._lanes[lane],)
+        return sum(len(waiters) for queue in lanes for waiters in queue.values())
+
+    def _estimated_wait_sec(self, priority: bool) -> float:
+        if self._in_flight < self.max_concurrency or self._service_time_sec is None:
+            return 0.0
+        ahead = self._queued(0) if priority else self._queued()
+        return (ahead + 1) / self.max_concurrency * self._service_time_sec
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.max_concurrency:
+            waiter = self._next_eligible()
+            if waiter is None:
+                return
+            self._in_flight += 1
+            self._user_in_flight[waiter.user_key] = self._user_in_flight.get(waiter.user_key, 0) + 1
+            waiter.future.set_result(None)
+
+    def _next_eligible(self) -> _Waiter | None:
+        for lane in self._lanes:
+            for user_key in list(lane):
+                if self._user_in_flight.get(user_key, 0) >= self.per_user_concurrency:
+                    continue
+                waiters = lane[user_key]
+                waiter = waiters.popleft()
+                if waiters:
+                    lane.move_to_end(user_key)
+                else:
+                    del lane[user_key]
+                return waiter
+        return None
+
+    def _discard(self, lane: int, waiter: _Waiter) -> None:
+        waiters = self._lanes[lane].get(waiter.user_key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        if not waiters:
+            del self._lanes[lane][waiter.user_key]
+
+    async def acquire(self, user_key: str, priority: bool = False) -> LLMTicket:
+        # Never queue past the request's own deadline (see app.services.llm_deadline).
+        max_wait_sec = remaining_sec(self.max_wait_sec)
+        estimated_wait = self._estimated_wait_sec(priority)
+        if self._queued() >= self.max_queue or estimated_wait > max_wait_sec:
+            self.rejected += 1
+            raise LLMQueueFullError(estimated_wait)
+
+        lane = 0 if priority else 1
+        waiter = _Waiter(user_key, asyncio.get_running_loop().create_future(), time.monotonic())
+        self._lanes[lane].setdefault(user_key, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max_wait_sec)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._discard(lane, waiter)
+                self.timed_out += 1
+                raise LLMQueueFullError(self._service_time_sec or self.max_wait_sec)
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                # Admitted just as the caller went away: hand the slot straight back.
+                self.release(LLMTicket(user_key, time.monotonic()))
+            else:
+                self._discard(lane, waiter)
+            raise
+
+        now = time.monotonic()
+        wait_ms = (now - waiter.enqueued_at) * 1000
+        self.admitted += 1
+        self._total_wait_ms += wait_ms
+        self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        return LLMTicket(user_key, now)
+
+    def release(self, ticket: LLMTicket) -> None:
+        held = time.monotonic() - ticket.admitted_at
+        previous = self._service_time_sec
+        self._service_time_sec = held if previous is None else 0.8 * previous + 0.2 * held
+        self._in_flight = max(0, self._in_flight - 1)
+        remaining = self._user_in_flight.get(ticket.user_key, 0) - 1
+        if remaining > 0:
+            self._user_in_flight[ticket.user_key] = remaining
+        else:
+            self._user_in_flight.pop(ticket.user_key, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_key: str, priority: bool = False):
+        ticket = await self.acquire(user_key, priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queued_priority": self._queued(0),
+            "queued_normal": self._queued(1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self._total_wait_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self._max_wait_ms, 2),
+            "avg_service_ms": round((self._service_time_sec or 0.0) * 1000, 2),
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    per_user_concurrency=settings.llm_per_user_concurrency,
+    max_queue=settings.llm_max_queue,
+    max_wait_sec=settings.llm_queue_max_wait_sec,
+)
+observability_service.register_stats_provider("llm_scheduler", llm_scheduler.stats)
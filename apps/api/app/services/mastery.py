@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Select, and_, case, func, select
 from sqlalchemy.orm import Session
 
-from app.db.models import Course, Lesson, LessonProgress, Module, ModuleMastery, User
+from app.db.models import Lesson, LessonProgress, Module, ModuleMastery, User
 
 DEFAULT_QUIZ_THRESHOLD = 70
 
@@ -22,94 +23,110 @@ class ModuleGateState:
 
 
 class MasteryService:
-    def evaluate_module_mastery(
+    def evaluate_modules(
         self,
         db: Session,
         user: User,
-        module_id: int,
+        module_query: Select,
         quiz_threshold: int = DEFAULT_QUIZ_THRESHOLD,
-    ) -> ModuleMastery:
-        lesson_ids = db.scalars(
-            select(Lesson.id).where(Lesson.module_id == module_id).order_by(Lesson.order_index)
+    ) -> list[tuple[ModuleMastery, int]]:
+        """Refresh mastery for every module selected by ``module_query`` in two round trips.
+
+        One grouped aggregate over modules, lessons and this user's progress supplies every
+        count; one query loads the existing mastery rows. Rows are only touched when a value
+        changed, so repeated reads flush nothing. Returns ``(mastery, total_lessons)`` in
+        module order.
+        """
+        modules = module_query.subquery()
+        progress = and_(LessonProgress.lesson_id == Lesson.id, LessonProgress.user_id == user.id)
+        rows = db.execute(
+            select(
+                modules.c.id,
+                func.count(func.distinct(Lesson.id)),
+                func.count(case((LessonProgress.status == "completed", LessonProgress.id))),
+                func.avg(LessonProgress.quiz_score),
+                func.count(case((LessonProgress.challenge_passed.is_(True), LessonProgress.id))),
+            )
+            .select_from(modules)
+            .outerjoin(Lesson, Lesson.module_id == modules.c.id)
+            .outerjoin(LessonProgress, progress)
+            .group_by(modules.c.id, modules.c.order_index)
+            .order_by(modules.c.order_index)
         ).all()
-        total_lessons = len(lesson_ids)
+        if not rows:
+            return []
 
-        if total_lessons == 0:
-            existing = db.scalar(
+        module_ids = [row[0] for row in rows]
+        existing = {
+            record.module_id: record
+            for record in db.scalars(
                 select(ModuleMastery).where(
                     ModuleMastery.user_id == user.id,
-                    ModuleMastery.module_id == module_id,
+                    ModuleMastery.module_id.in_(module_ids),
                 )
             )
-            if existing:
-                existing.mastery_threshold_met = True
-                existing.lessons_completed = 0
-                existing.average_quiz_score = 100
-                existing.challenges_passed = 0
-                return existing
-
-            record = ModuleMastery(
-                user_id=user.id,
-                module_id=module_id,
-                mastery_threshold_met=True,
-                average_quiz_score=100,
-            )
-            db.add(record)
-            return record
-
-        completed_lessons = db.scalar(
-            select(func.count(LessonProgress.id)).where(
-                LessonProgress.user_id == user.id,
-                LessonProgress.lesson_id.in_(lesson_ids),
-                LessonProgress.status == "completed",
-            )
-        ) or 0
+        }
+
+        now = datetime.utcnow()
+        results: list[tuple[ModuleMastery, int]] = []
+        for module_id, total_lessons, completed_lessons, avg_quiz_raw, challenges_passed in rows:
+            if total_lessons == 0:
+                # Empty modules never block progression.
+                values = {
+                    "lessons_completed": 0,
+                    "average_quiz_score": 100,
+                    "challenges_passed": 0,
+                    "mastery_threshold_met": True,
+                }
+            else:
+                average_quiz_score = int(float(avg_quiz_raw)) if avg_quiz_raw is not None else 0
+                values = {
+                    "lessons_completed": int(completed_lessons),
+                    "average_quiz_score": average_quiz_score,
+                    "challenges_passed": int(challenges_passed),
+                    "mastery_threshold_met": (
+                        completed_lessons >= total_lessons
+                        and challenges_passed >= total_lessons
+                        and average_quiz_score >= quiz_threshold
+                    ),
+                }
+
+            record = existing.get(module_id)
+            if record is None:
+                record = ModuleMastery(user_id=user.id, module_id=module_id)
+                db.add(record)
+            for key, value in values.items():
+                if getattr(record, key) != value:
+                    setattr(record, key, value)
+            if total_lessons and record.mastery_threshold_met and record.unlocked_at is None:
+                record.unlocked_at = now
+            results.append((record, int(total_lessons)))
+        return results
 
-        avg_quiz_raw = db.scalar(
-            select(func.avg(LessonProgress.quiz_score)).where(
-                LessonProgress.user_id == user.id,
-                LessonProgress.lesson_id.in_(lesson_ids),
-                LessonProgress.quiz_score.is_not(None),
-            )
-        )
-        average_quiz_score = int(float(avg_quiz_raw)) if avg_quiz_raw is not None else 0
-
-        challenges_passed = db.scalar(
-            select(func.count(LessonProgress.id)).where(
-                LessonProgress.user_id == user.id,
-                LessonProgress.lesson_id.in_(lesson_ids),
-                LessonProgress.challenge_passed.is_(True),
-            )
-        ) or 0
-
-        mastered = (
-            completed_lessons >= total_lessons
-            and challenges_passed >= total_lessons
-            and average_quiz_score >= quiz_threshold
+    def evaluate_module_mastery(
+        self,
+        db: Session,
+        user: User,
+        module_id: int,
+        quiz_threshold: int = DEFAULT_QUIZ_THRESHOLD,
+    ) -> ModuleMastery:
+        results = self.evaluate_modules(
+            db,
+            user,
+            select(Module.id, Module.order_index).where(Module.id == module_id),
+            quiz_threshold=quiz_threshold,
         )
-
-        record = db.scalar(
-            select(ModuleMastery).where(
-                ModuleMastery.user_id == user.id,
-                ModuleMastery.module_id == module_id,
-            )
+        if results:
+            return results[0][0]
+        # Unknown module: nothing to gate on, mirror the empty-module behaviour without persisting.
+        return ModuleMastery(
+            user_id=user.id,
+            module_id=module_id,
+            mastery_threshold_met=True,
+            average_quiz_score=100,
+            lessons_completed=0,
+            challenges_passed=0,
         )
-        if not record:
-            record = ModuleMastery(
-                user_id=user.id,
-                module_id=module_id,
-            )
-            db.add(record)
-
-        record.lessons_completed = int(completed_lessons)
-        record.average_quiz_score = average_quiz_score
-        record.challenges_passed = int(challenges_passed)
-        record.mastery_threshold_met = mastered
-        if mastered and record.unlocked_at is None:
-            from datetime import datetime
-
-            record.unlocked_at = datetime.utcnow()
-        return record
 
     def module_gate_states(
         self,
@@ -117,29 +134,22 @@ class MasteryService:
         user: User,
         course_id: int | None = None,
     ) -> list[ModuleGateState]:
-        module_query = select(Module).order_by(Module.order_index)
+        module_query = select(Module.id, Module.order_index)
         if course_id is not None:
             module_query = module_query.where(Module.course_id == course_id)
 
-        modules = db.scalars(module_query).all()
         states: list[ModuleGateState] = []
         previous_mastered = True
 
-        for module in modules:
-            mastery = self.evaluate_module_mastery(db, user, module.id)
-            total_lessons = db.scalar(
-                select(func.count(Lesson.id)).where(Lesson.module_id == module.id)
-            ) or 0
-
-            unlocked = previous_mastered
+        for mastery, total_lessons in self.evaluate_modules(db, user, module_query):
             states.append(
                 ModuleGateState(
-                    module_id=module.id,
-                    unlocked=unlocked,
+                    module_id=mastery.module_id,
+                    unlocked=previous_mastered,
                     mastered=bool(mastery.mastery_threshold_met),
                     average_quiz_score=mastery.average_quiz_score,
                     lessons_completed=mastery.lessons_completed,
-                    total_lessons=int(total_lessons),
+                    total_lessons=total_lessons,
                     challenges_passed=mastery.challenges_passed,
                 )
             )
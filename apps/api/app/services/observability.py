@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import logging
+from collections.abc import Callable
+from contextvars import ContextVar, Token
 from dataclasses import dataclass, field
 from threading import Lock
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class ObservabilitySnapshot:
@@ -14,6 +19,16 @@ class ObservabilitySnapshot:
     routes: dict[str, int] = field(default_factory=dict)
 
 
+@dataclass
+class RequestDBUsage:
+    query_count: int = 0
+    db_time_ms: float = 0.0
+
+
+# Set by the HTTP middleware; engine events add to whichever request is running the query.
+_request_db_usage: ContextVar[RequestDBUsage | None] = ContextVar("request_db_usage", default=None)
+
+
 class ObservabilityService:
     def __init__(self) -> None:
         self._lock = Lock()
@@ -23,6 +38,13 @@ class ObservabilityService:
         self._slow_requests = 0
         self._route_counts: dict[str, int] = {}
         self._slow_queries: list[dict] = []
+        self._stats_providers: dict[str, Callable[[], dict]] = {}
+        self._db_requests = 0
+        self._db_queries = 0
+        self._db_time_ms = 0.0
+        self._db_max_queries = 0
+        self._db_over_budget = 0
+        self._db_route_max_queries: dict[str, int] = {}
 
     def record(self, route_key: str, latency_ms: float, status_code: int, slow_threshold_ms: float = 700.0) -> None:
         with self._lock:
@@ -48,6 +70,52 @@ class ObservabilityService:
             if len(self._slow_queries) > 100:
                 self._slow_queries = self._slow_queries[-60:]
 
+    def begin_request_db_usage(self) -> tuple[RequestDBUsage, Token]:
+        usage = RequestDBUsage()
+        return usage, _request_db_usage.set(usage)
+
+    def end_request_db_usage(self, token: Token) -> None:
+        _request_db_usage.reset(token)
+
+    def record_query(self, duration_ms: float) -> None:
+        usage = _request_db_usage.get()
+        if usage is not None:
+            usage.query_count += 1
+            usage.db_time_ms += duration_ms
+
+    def record_request_db_usage(self, route_key: str, usage: RequestDBUsage, query_budget: int) -> None:
+        over_budget = query_budget > 0 and usage.query_count > query_budget
+        with self._lock:
+            self._db_requests += 1
+            self._db_queries += usage.query_count
+            self._db_time_ms += usage.db_time_ms
+            self._db_max_queries = max(self._db_max_queries, usage.query_count)
+            if usage.query_count > self._db_route_max_queries.get(route_key, 0):
+                self._db_route_max_queries[route_key] = usage.query_count
+            if over_budget:
+                self._db_over_budget += 1
+        if over_budget:
+            logger.warning(
+                "Request %s ran %d queries (budget %d, %.1f ms in DB); likely an N+1",
+                route_key,
+                usage.query_count,
+                query_budget,
+                usage.db_time_ms,
+            )
+
+    def db_usage_stats(self) -> dict:
+        with self._lock:
+            requests = self._db_requests
+            worst_routes = sorted(self._db_route_max_queries.items(), key=lambda item: item[1], reverse=True)[:10]
+            return {
+                "requests": requests,
+                "avg_queries_per_request": round(self._db_queries / requests, 2) if requests else 0.0,
+                "avg_db_time_ms": round(self._db_time_ms / requests, 2) if requests else 0.0,
+                "max_queries_per_request": self._db_max_queries,
+                "over_budget_requests": self._db_over_budget,
+                "max_queries_by_route": dict(worst_routes),
+            }
+
     def snapshot(self) -> ObservabilitySnapshot:
         with self._lock:
             if not self._latencies:
@@ -77,5 +145,16 @@ class ObservabilityService:
         with self._lock:
             return list(self._slow_queries)
 
+    def register_stats_provider(self, name: str, provider: Callable[[], dict]) -> None:
+        """Expose a component's counters (caches, queues, pools) on the admin health view."""
+        with self._lock:
+            self._stats_providers[name] = provider
+
+    def component_stats(self) -> dict[str, dict]:
+        with self._lock:
+            providers = dict(self._stats_providers)
+        return {name: provider() for name, provider in providers.items()}
+
 
 observability_service = ObservabilityService()
+observability_service.register_stats_provider("db_requests", observability_service.db_usage_stats)
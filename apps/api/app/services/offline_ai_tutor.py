@@ -5,21 +5,16 @@ Runs models locally for complete privacy and offline capability
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+import json
 
 import httpx
 
 from app.core.config import settings
-
-
-@dataclass
-class ConversationMessage:
-    """Message in conversation history"""
-
-    role: str  # "user" or "assistant"
-    content: str
-    timestamp: datetime
+from app.services.conversation_history import ConversationMessage, build_history_store
+from app.services.http_clients import http_client_registry
+from app.services.llm_deadline import LLMDeadlineExceeded, llm_deadlines
+from app.services.llm_scheduler import llm_scheduler
+from app.services.ollama_health import ollama_health_monitor
 
 
 class OfflineAITutorService:
@@ -31,8 +26,8 @@ class OfflineAITutorService:
     def __init__(self) -> None:
         self.base_url = settings.ollama_base_url
         self.model = settings.ollama_model
-        # Store histories per user key (user id or session key)
-        self.conversation_histories: dict[str, list[ConversationMessage]] = {}
+        # Bounded per-user histories keyed by user id (or "global" for anonymous sessions)
+        self.history_store = build_history_store()
         self.system_prompt = self._build_system_prompt()
 
     def _build_system_prompt(self) -> str:
@@ -58,45 +53,61 @@ class OfflineAITutorService:
             "If the user later asks in a different language, switch to that requested language."
         )
 
-    async def _call_ollama(self, prompt: str, context: str = "", user_key: str = "global") -> str:
+    async def _call_ollama(
+        self,
+        prompt: str,
+        context: str = "",
+        user_key: str = "global",
+        priority: bool = False,
+        queue_key: str | None = None,
+    ) -> str:
+        """
+        Call local Ollama model once an LLM scheduler slot is granted.
+        ``queue_key`` is the fairness identity when it differs from the history key.
+        """
+        async with llm_scheduler.slot(queue_key or user_key, priority):
+            return await self._request_ollama(prompt, context, user_key)
+
+    async def _request_ollama(self, prompt: str, context: str = "", user_key: str = "global") -> str:
         """
         Call local Ollama model via HTTP API.
         No authentication needed - everything runs locally.
         """
         try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                # Quick availability check
-                try:
-                    tags_resp = await client.get(f"{self.base_url}/api/tags")
-                    if tags_resp.status_code != 200:
-                        return (
-                            f"Local AI tutor unavailable (status {tags_resp.status_code}). "
-                            "Confirm Ollama is running (ollama serve) and reachable at the configured URL."
-                        )
-                except Exception:
+            client = http_client_registry.get("ollama")
+            # Availability comes from the background health monitor, not a per-request probe
+            health = ollama_health_monitor.state
+            if not health.available:
+                if health.status_code is not None:
                     return (
-                        "Local AI tutor is not available. Please start Ollama:\n"
-                        "1. Install: https://ollama.ai\n"
-                        "2. Run: ollama serve\n"
-                        "3. Download model: ollama pull mistral"
+                        f"Local AI tutor unavailable (status {health.status_code}). "
+                        "Confirm Ollama is running (ollama serve) and reachable at the configured URL."
                     )
+                return (
+                    "Local AI tutor is not available. Please start Ollama:\n"
+                    "1. Install: https://ollama.ai\n"
+                    "2. Run: ollama serve\n"
+                    "3. Download model: ollama pull mistral"
+                )
 
-                messages = []
+            messages = []
 
-                # Add conversation history for context (per-user)
-                history = self.conversation_histories.get(user_key, [])
-                for msg in history[-5:]:  # Last 5 messages for context
-                    messages.append({"role": msg.role, "content": msg.content})
+            # Add conversation history for context (per-user)
+            history = await self.history_store.recent_async(user_key, limit=5)
+            for msg in history:  # Last 5 messages for context
+                messages.append({"role": msg.role, "content": msg.content})
 
-                # Add current message
-                messages.append({"role": "user", "content": prompt})
+            # Add current message
+            messages.append({"role": "user", "content": prompt})
 
-                # Primary endpoint attempt
-                # If a context (system prompt override) was provided, use it; otherwise use default system prompt
-                system_field = context if context else self.system_prompt
+            # Primary endpoint attempt
+            # If a context (system prompt override) was provided, use it; otherwise use default system prompt
+            system_field = context if context else self.system_prompt
 
+            # The request's remaining budget bounds both the wait and how much the model may generate
+            async with llm_deadlines.upstream():
                 resp = await client.post(
-                    f"{self.base_url}/api/chat",
+                    "/api/chat",
                     json={
                         "model": self.model,
                         "messages": messages,
@@ -104,51 +115,60 @@ class OfflineAITutorService:
                         "system": system_field,
                         "options": {
                             "temperature": 0.6,
-                            "num_predict": 1024,  # Allow longer outputs for full programs
+                            "num_predict": llm_deadlines.num_predict(1024),  # Allow longer outputs for full programs
                             "top_k": 40,
                             "top_p": 0.9,
                         },
                     },
+                    timeout=llm_deadlines.upstream_timeout(),
                 )
 
-                # If 404, try a common alternative endpoint (/api/generate)
-                if resp.status_code == 404:
-                    try:
+            # If 404, try a common alternative endpoint (/api/generate)
+            if resp.status_code == 404:
+                try:
+                    async with llm_deadlines.upstream():
                         alt = await client.post(
-                            f"{self.base_url}/api/generate",
+                            "/api/generate",
                             json={
                                 "model": self.model,
                                 "prompt": self.system_prompt + "\n" + prompt,
-                                "max_tokens": 512,
+                                "max_tokens": llm_deadlines.num_predict(512),
                             },
+                            timeout=llm_deadlines.upstream_timeout(),
                         )
-                        if alt.status_code == 200:
-                            data = alt.json()
-                            return data.get("text") or data.get("message", {}).get("content") or "No response generated."
-                    except Exception:
-                        pass
-
-                if resp.status_code != 200:
-                    # Include response body for easier debugging
-                    body = None
-                    try:
-                        body = resp.text
-                    except Exception:
-                        body = "(unable to read response body)"
+                    if alt.status_code == 200:
+                        data = alt.json()
+                        return data.get("text") or data.get("message", {}).get("content") or "No response generated."
+                except Exception:
+                    pass
 
-                    return (
-                        f"Local AI tutor error: {resp.status_code}. Response: {body}\n"
-                        "Make sure Ollama is running (ollama serve) and the model is available. "
-                        "You can test with: curl http://<ollama_host>:<port>/api/tags"
-                    )
+            if resp.status_code != 200:
+                # Include response body for easier debugging
+                body = None
+                try:
+                    body = resp.text
+                except Exception:
+                    body = "(unable to read response body)"
 
-                data = resp.json()
-                # Ollama may return different shapes; try common locations
-                if isinstance(data, dict):
-                    return data.get("message", {}).get("content") or data.get("text") or json.dumps(data)
-                return str(data)
+                return (
+                    f"Local AI tutor error: {resp.status_code}. Response: {body}\n"
+                    "Make sure Ollama is running (ollama serve) and the model is available. "
+                    "You can test with: curl http://<ollama_host>:<port>/api/tags"
+                )
 
-        except httpx.ConnectError:
+            data = resp.json()
+            # Ollama may return different shapes; try common locations
+            if isinstance(data, dict):
+                llm_deadlines.record_throughput(data)
+                return data.get("message", {}).get("content") or data.get("text") or json.dumps(data)
+            return str(data)
+
+        except httpx.TimeoutException:
+            if llm_deadlines.expired():
+                raise LLMDeadlineExceeded()
+            return "Error: Local AI tutor timed out."
+        except httpx.ConnectError as exc:
+            ollama_health_monitor.record_failure(f"ConnectError: {exc}")
             return (
                 "Local AI tutor is not available. Please start Ollama:\n"
                 "1. Install: https://ollama.ai\n"
@@ -158,7 +178,14 @@ class OfflineAITutorService:
         except Exception as e:
             return f"Error: {str(e)}"
 
-    async def explain_concept(self, topic: str, level: str, context: str | None = None, user_key: str = "global") -> str:
+    async def explain_concept(
+        self,
+        topic: str,
+        level: str,
+        context: str | None = None,
+        user_key: str = "global",
+        priority: bool = False,
+    ) -> str:
         """Explain a Python concept with examples"""
         prompt = f"""Explain the Python concept: {topic}
 
@@ -171,12 +198,14 @@ Please:
 3. Explain what the code does
 4. Give a real-world use case"""
 
-        response = await self._call_ollama(prompt, user_key=user_key)
-        self._add_to_history("user", prompt, user_key)
-        self._add_to_history("assistant", response, user_key)
+        response = await self._call_ollama(prompt, user_key=user_key, priority=priority)
+        await self._add_to_history("user", prompt, user_key)
+        await self._add_to_history("assistant", response, user_key)
         return response
 
-    async def debug_code(self, code: str, error_message: str, user_key: str = "global") -> str:
+    async def debug_code(
+        self, code: str, error_message: str, user_key: str = "global", priority: bool = False
+    ) -> str:
         """Debug Python code and explain the fix"""
         prompt = f"""Help me fix this Python code error:
 
@@ -194,12 +223,14 @@ Please:
 3. Show the corrected code
 4. Explain how to avoid this in the future"""
 
-        response = await self._call_ollama(prompt, user_key=user_key)
-        self._add_to_history("user", prompt, user_key)
-        self._add_to_history("assistant", response, user_key)
+        response = await self._call_ollama(prompt, user_key=user_key, priority=priority)
+        await self._add_to_history("user", prompt, user_key)
+        await self._add_to_history("assistant", response, user_key)
         return response
 
-    async def generate_practice(self, topic: str, difficulty: str, user_key: str = "global") -> dict[str, str]:
+    async def generate_practice(
+        self, topic: str, difficulty: str, user_key: str = "global", priority: bool = False
+    ) -> dict[str, str]:
         """Generate a practice problem"""
         prompt = f"""Create a Python practice exercise:
 
@@ -221,9 +252,9 @@ Format your response exactly like this:
 
 **Learning Goal:** [What they'll learn]"""
 
-        content = await self._call_ollama(prompt, user_key=user_key)
-        self._add_to_history("user", prompt, user_key)
-        self._add_to_history("assistant", content, user_key)
+        content = await self._call_ollama(prompt, user_key=user_key, priority=priority)
+        await self._add_to_history("user", prompt, user_key)
+        await self._add_to_history("assistant", content, user_key)
 
         # Parse the response
         parsed = self._parse_practice_response(content)
@@ -236,13 +267,14 @@ Format your response exactly like this:
         language: str | None = None,
         user_name: str | None = None,
         user_key: str = "global",
+        stats: dict | None = None,
     ):
         """
         Stream chat responses from AI tutor.
         Yields chunks of text as they are generated.
+        Callers hold the LLM scheduler slot for the stream's lifetime.
+        Ollama's final token counts are written to ``stats`` when given.
         """
-        import json
-        
         mode_prompts = {
             "explain": "Explain this concept to me: ",
             "debug": "Help me debug this: ",
@@ -260,66 +292,78 @@ Format your response exactly like this:
             system_prompt = f"{system_prompt}\nUser-Name: {user_name}"
 
         try:
-            async with httpx.AsyncClient(timeout=120) as client:
-                # Quick availability check
-                try:
-                    tags_resp = await client.get(f"{self.base_url}/api/tags")
-                    if tags_resp.status_code != 200:
-                        yield f"Local AI tutor unavailable (status {tags_resp.status_code}). Confirm Ollama is running."
-                        return
-                except Exception:
+            client = http_client_registry.get("ollama")
+            # Availability comes from the background health monitor, not a per-request probe
+            health = ollama_health_monitor.state
+            if not health.available:
+                if health.status_code is not None:
+                    yield f"Local AI tutor unavailable (status {health.status_code}). Confirm Ollama is running."
+                else:
                     yield "Local AI tutor is not available. Please start Ollama with: ollama serve"
+                return
+
+            messages = []
+
+            # Add conversation history for context (per-user)
+            history = await self.history_store.recent_async(user_key, limit=5)
+            for msg in history:  # Last 5 messages for context
+                messages.append({"role": msg.role, "content": msg.content})
+
+            # Add current message
+            messages.append({"role": "user", "content": prompt})
+
+            # Stream response from Ollama; cancelling this generator closes the upstream request
+            async with llm_deadlines.upstream(), client.stream(
+                "POST",
+                "/api/chat",
+                json={
+                    "model": self.model,
+                    "messages": messages,
+                    "stream": True,
+                    "system": system_prompt,
+                    "options": {
+                        "temperature": 0.6,
+                        "num_predict": llm_deadlines.num_predict(1024),  # Allow longer outputs for full programs
+                        "top_k": 40,
+                        "top_p": 0.9,
+                    },
+                },
+                timeout=llm_deadlines.upstream_timeout(),
+            ) as resp:
+                if resp.status_code != 200:
+                    yield f"Error: {resp.status_code}. Make sure Ollama is running."
                     return
 
-                messages = []
-
-                # Add conversation history for context (per-user)
-                history = self.conversation_histories.get(user_key, [])
-                for msg in history[-5:]:  # Last 5 messages for context
-                    messages.append({"role": msg.role, "content": msg.content})
-
-                # Add current message
-                messages.append({"role": "user", "content": prompt})
-
-                # Stream response from Ollama
-                import json
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/api/chat",
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "stream": True,
-                        "system": system_prompt,
-                        "options": {
-                            "temperature": 0.6,
-                            "num_predict": 1024,  # Allow longer outputs for full programs
-                            "top_k": 40,
-                            "top_p": 0.9,
-                        },
-                    },
-                ) as resp:
-                    if resp.status_code != 200:
-                        yield f"Error: {resp.status_code}. Make sure Ollama is running."
-                        return
-
-                    full_response = ""
-                    async for line in resp.aiter_lines():
-                        if line:
-                            try:
-                                data = json.loads(line)
-                                if "message" in data and "content" in data["message"]:
-                                    chunk = data["message"]["content"]
-                                    full_response += chunk
-                                    yield chunk
-                            except Exception:
-                                pass
-
-                    # Add to history after streaming completes (per-user)
-                    self._add_to_history("user", user_message, user_key)
-                    self._add_to_history("assistant", full_response, user_key)
-
-        except httpx.ConnectError:
+                parts: list[str] = []
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        continue
+                    chunk = (data.get("message") or {}).get("content")
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+                    if data.get("done"):
+                        llm_deadlines.record_throughput(data)
+                        if stats is not None:
+                            stats["eval_count"] = data.get("eval_count")
+                            stats["prompt_eval_count"] = data.get("prompt_eval_count")
+                        break
+                    if llm_deadlines.expired():
+                        raise LLMDeadlineExceeded()
+                full_response = "".join(parts)
+
+                # Add to history after streaming completes (per-user)
+                await self._add_to_history("user", user_message, user_key)
+                await self._add_to_history("assistant", full_response, user_key)
+
+        except (LLMDeadlineExceeded, httpx.TimeoutException):
+            yield "\n\n[Response cut short: the tutor ran out of time for this answer.]"
+        except httpx.ConnectError as exc:
+            ollama_health_monitor.record_failure(f"ConnectError: {exc}")
             yield "Connection error: Ollama is not running. Start it with: ollama serve"
         except Exception as e:
             yield f"Error: {str(e)}"
@@ -331,6 +375,8 @@ Format your response exactly like this:
         language: str | None = None,
         user_name: str | None = None,
         user_key: str = "global",
+        priority: bool = False,
+        queue_key: str | None = None,
     ) -> str:
         """
         General chat with the AI tutor.
@@ -353,28 +399,25 @@ Format your response exactly like this:
         if user_name:
             system_prompt = f"{system_prompt}\nUser-Name: {user_name}"
 
-        response = await self._call_ollama(prompt, context=system_prompt, user_key=user_key)
-        self._add_to_history("user", user_message, user_key)
-        self._add_to_history("assistant", response, user_key)
+        response = await self._call_ollama(
+            prompt, context=system_prompt, user_key=user_key, priority=priority, queue_key=queue_key
+        )
+        await self._add_to_history("user", user_message, user_key)
+        await self._add_to_history("assistant", response, user_key)
         return response
 
-    def get_conversation_history(self, user_key: str = "global") -> list[dict]:
+    async def get_conversation_history(self, user_key: str = "global") -> list[dict]:
         """Get conversation history for a specific user key"""
-        history = self.conversation_histories.get(user_key, [])
+        history: list[ConversationMessage] = await self.history_store.recent_async(user_key)
         return [{"role": msg.role, "content": msg.content} for msg in history]
 
-    def clear_history(self, user_key: str = "global") -> None:
+    async def clear_history(self, user_key: str = "global") -> None:
         """Clear conversation history for a specific user key"""
-        if user_key in self.conversation_histories:
-            self.conversation_histories[user_key] = []
+        await self.history_store.clear_async(user_key)
 
-    def _add_to_history(self, role: str, content: str, user_key: str = "global") -> None:
+    async def _add_to_history(self, role: str, content: str, user_key: str = "global") -> None:
         """Add message to a user's history"""
-        if user_key not in self.conversation_histories:
-            self.conversation_histories[user_key] = []
-        self.conversation_histories[user_key].append(
-            ConversationMessage(role=role, content=content, timestamp=datetime.now())
-        )
+        await self.history_store.append_async(user_key, role, content)
 
     def _parse_practice_response(self, content: str) -> dict[str, str]:
         """Parse practice problem response"""
@@ -418,13 +461,9 @@ Format your response exactly like this:
         return result
 
     async def is_available(self) -> bool:
-        """Check if Ollama server is reachable and returning tags"""
-        try:
-            async with httpx.AsyncClient(timeout=6) as client:
-                r = await client.get(f"{self.base_url}/api/tags")
-                return r.status_code == 200
-        except Exception:
-            return False
+        """Check if Ollama server is reachable, using the cached health monitor state"""
+        health = await ollama_health_monitor.current()
+        return health.available
 
 
 # Global instance
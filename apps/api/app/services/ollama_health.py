@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+
+from app.core.config import settings
+from app.services.http_clients import http_client_registry
+
+
+@dataclass(frozen=True)
+class OllamaHealthState:
+    reachable: bool = False
+    models: tuple[str, ...] = field(default_factory=tuple)
+    status_code: int | None = None
+    error: str | None = None
+    checked_at: float | None = None
+    consecutive_failures: int = 0
+    circuit_open_until: float = 0.0
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.circuit_open_until
+
+    @property
+    def available(self) -> bool:
+        # Before the first probe completes, let requests through and let them fail on their own.
+        if self.checked_at is None:
+            return True
+        return self.reachable and not self.circuit_open
+
+
+class OllamaHealthMonitor:
+    """Polls ``/api/tags`` in the background so request paths read cached health in O(1).
+
+    After ``failure_threshold`` consecutive failed probes or upstream calls the circuit
+    opens for ``open_sec`` seconds; the poller keeps probing and closes it on success.
+    """
+
+    def __init__(self, interval_sec: float, failure_threshold: int, open_sec: float) -> None:
+        self.interval_sec = interval_sec
+        self.failure_threshold = failure_threshold
+        self.open_sec = open_sec
+        self._state = OllamaHealthState()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def state(self) -> OllamaHealthState:
+        return self._state
+
+    def record_success(self, models: tuple[str, ...] | None = None, status_code: int = 200) -> None:
+        self._state = OllamaHealthState(
+            reachable=True,
+            models=self._state.models if models is None else models,
+            status_code=status_code,
+            checked_at=time.monotonic(),
+        )
+
+    def record_failure(self, error: str, status_code: int | None = None) -> None:
+        failures = self._state.consecutive_failures + 1
+        open_until = self._state.circuit_open_until
+        if failures >= self.failure_threshold:
+            open_until = time.monotonic() + self.open_sec
+        self._state = replace(
+            self._state,
+            reachable=False,
+            status_code=status_code,
+            error=error,
+            checked_at=time.monotonic(),
+            consecutive_failures=failures,
+            circuit_open_until=open_until,
+        )
+
+    async def probe(self) -> OllamaHealthState:
+        client = http_client_registry.get("ollama")
+        try:
+            response = await client.get("/api/tags", timeout=settings.ollama_health_timeout_sec)
+        except Exception as exc:
+            self.record_failure(f"{type(exc).__name__}: {exc}")
+            return self._state
+
+        if response.status_code != 200:
+            self.record_failure(f"HTTP {response.status_code}", status_code=response.status_code)
+            return self._state
+
+        try:
+            models = tuple(item.get("name", "") for item in response.json().get("models", []))
+        except ValueError:
+            models = ()
+        self.record_success(models)
+        return self._state
+
+    async def current(self) -> OllamaHealthState:
+        """Cached state, probing inline only when the background poller is not keeping it fresh."""
+        checked_at = self._state.checked_at
+        if checked_at is None or time.monotonic() - checked_at > self.interval_sec * 2:
+            return await self.probe()
+        return self._state
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval_sec)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+ollama_health_monitor = OllamaHealthMonitor(
+    interval_sec=settings.ollama_health_interval_sec,
+    failure_threshold=settings.ollama_circuit_failure_threshold,
+    open_sec=settings.ollama_circuit_open_sec,
+)
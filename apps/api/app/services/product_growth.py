@@ -80,6 +80,9 @@ class ProductGrowthService:
             "priority_debug_queue": priority_debug_queue,
         }
 
+    def has_priority_queue(self, db: Session, user: User) -> bool:
+        return bool(self.get_entitlements(db, user)["priority_debug_queue"])
+
     def consume_ai_credit(self, db: Session, user: User, amount: int = 1) -> bool:
         entitlements = self.get_entitlements(db, user)
         if entitlements["can_access_premium"]:
@@ -92,6 +95,13 @@ class ProductGrowthService:
         profile.ai_credits_remaining -= amount
         return True
 
+    def refund_ai_credit(self, db: Session, user: User, amount: int = 1) -> None:
+        """Give back credits charged for an AI call that then failed."""
+        if self.get_entitlements(db, user)["can_access_premium"]:
+            return
+        profile = self.get_or_create_profile(db, user)
+        profile.ai_credits_remaining = min(FREE_DAILY_AI_CREDITS, profile.ai_credits_remaining + amount)
+
     def pricing_plans(self) -> list[dict]:
         return [
             {
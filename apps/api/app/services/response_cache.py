@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import ast
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.models import AIResponseCacheEntry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class SimpleLRUCache:
+    """A tiny in-memory LRU cache with optional TTL."""
+
+    def __init__(self, maxsize: int = 200, ttl: int | None = 3600) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        item = self._data.get(key)
+        if not item:
+            return None
+        value, ts = item
+        if self.ttl and (time.time() - ts) > self.ttl:
+            try:
+                del self._data[key]
+            except KeyError:
+                pass
+            return None
+        # mark as recently used
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._data[key] = (value, time.time())
+        self._data.move_to_end(key)
+        # evict oldest
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class SQLResponseCache:
+    """Shared cache table so every API worker benefits from each other's LLM calls.
+
+    Its methods block on the database; ``TieredResponseCache`` runs them in a thread.
+    """
+
+    PRUNE_EVERY_SETS = 200
+
+    def __init__(self, session_factory: sessionmaker[Session], ttl: int) -> None:
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._sets = 0
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(AIResponseCacheEntry.cache_key, AIResponseCacheEntry.response).where(
+                    AIResponseCacheEntry.cache_key.in_(keys),
+                    AIResponseCacheEntry.created_at >= cutoff,
+                )
+            )
+            return {row.cache_key: row.response for row in rows}
+
+    def set_many(self, entries: dict[str, str]) -> None:
+        """Write every entry in one transaction."""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            for key, value in entries.items():
+                db.merge(AIResponseCacheEntry(cache_key=key, response=value, created_at=now))
+            self._sets += 1
+            if self._sets % self.PRUNE_EVERY_SETS == 0:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+                db.execute(delete(AIResponseCacheEntry).where(AIResponseCacheEntry.created_at < cutoff))
+            db.commit()
+
+
+def cache_key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def normalize_text(text: str | None) -> str:
+    return _WHITESPACE.sub(" ", (text or "").strip()).casefold()
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form of Python source: formatting and comments do not change the key."""
+    try:
+        return ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        return normalize_text(code)
+
+
+class TieredResponseCache:
+    """Exact-prompt layer first, then a near-duplicate layer keyed on a normalized prompt.
+
+    Both layers live in a per-process LRU; when a shared backend is configured it sits
+    behind the LRU and back-fills it on hit. The shared backend is only touched from a
+    worker thread, with one query per lookup and one transaction per write.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, shared: SQLResponseCache | None = None) -> None:
+        self._local = SimpleLRUCache(maxsize=maxsize, ttl=ttl)
+        self._shared = shared
+        self.exact_hits = 0
+        self.normalized_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _keys(exact_key: str, normalized_key: str | None) -> list[str]:
+        return [f"x:{exact_key}"] + ([f"n:{normalized_key}"] if normalized_key else [])
+
+    async def get(self, exact_key: str, normalized_key: str | None = None) -> str | None:
+        keys = self._keys(exact_key, normalized_key)
+        hit = next(((key, value) for key in keys if (value := self._local.get(key)) is not None), None)
+        if hit is None and self._shared is not None:
+            found = await asyncio.to_thread(self._shared.get_many, keys)
+            hit = next(((key, found[key]) for key in keys if key in found), None)
+            if hit is not None:
+                self.shared_hits += 1
+                self._local.set(*hit)
+        if hit is None:
+            self.misses += 1
+            return None
+        key, value = hit
+        if key.startswith("x:"):
+            self.exact_hits += 1
+        else:
+            self.normalized_hits += 1
+        return value
+
+    async def set(self, exact_key: str, normalized_key: str | None, value: str) -> None:
+        keys = self._keys(exact_key, normalized_key)
+        for key in keys:
+            self._local.set(key, value)
+        if self._shared is not None:
+            await asyncio.to_thread(self._shared.set_many, dict.fromkeys(keys, value))
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.normalized_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "normalized_hits": self.normalized_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_response_cache() -> TieredResponseCache:
+    shared = None
+    if settings.ai_cache_backend == "sql":
+        from app.db.session import SessionLocal
+
+        shared = SQLResponseCache(SessionLocal, ttl=settings.ai_cache_ttl_sec)
+    return TieredResponseCache(maxsize=settings.ai_cache_max_entries, ttl=settings.ai_cache_ttl_sec, shared=shared)
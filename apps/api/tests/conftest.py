@@ -4,27 +4,48 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.api.routers import auth, courses, learning, progress, users
 from app.db.models import Base
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
+from app.services.curriculum_cache import curriculum_cache
+from app.services.leaderboard import leaderboard_service
 
 
 @pytest.fixture()
-def db_session_factory() -> sessionmaker[Session]:
+def database_path(tmp_path) -> str:
+    # A file rather than ":memory:" so the sync and async engines see the same database.
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture()
+def db_session_factory(database_path: str) -> sessionmaker[Session]:
     engine = create_engine(
-        "sqlite://",
+        f"sqlite:///{database_path}",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+        poolclass=NullPool,
     )
     Base.metadata.create_all(bind=engine)
+    # Process-wide snapshots must not leak between per-test databases.
+    curriculum_cache.invalidate()
+    leaderboard_service.invalidate()
     return sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
 @pytest.fixture()
-def client(db_session_factory: sessionmaker[Session]) -> TestClient:
+def async_session_factory(database_path: str, db_session_factory) -> async_sessionmaker[AsyncSession]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture()
+def client(
+    db_session_factory: sessionmaker[Session],
+    async_session_factory: async_sessionmaker[AsyncSession],
+) -> TestClient:
     app = FastAPI()
     app.include_router(auth.router)
     app.include_router(users.router)
@@ -39,7 +60,12 @@ def client(db_session_factory: sessionmaker[Session]) -> TestClient:
         finally:
             db.close()
 
+    async def override_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
 
     with TestClient(app) as test_client:
         yield test_client
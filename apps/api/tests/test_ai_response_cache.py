@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import AIResponseCacheEntry
+from app.services.ai_tutor import AITutorService
+from app.services.response_cache import SQLResponseCache, TieredResponseCache
+
+
+def _service(monkeypatch, replies: list[str]) -> tuple[AITutorService, list[str]]:
+    service = AITutorService()
+    service.use_offline = False
+    service._response_cache = TieredResponseCache(maxsize=50, ttl=3600)
+    calls: list[str] = []
+
+    async def fake_online(system_prompt: str, user_prompt: str) -> str:
+        calls.append(user_prompt)
+        return replies[len(calls) - 1]
+
+    monkeypatch.setattr(service, "_generate_online", fake_online)
+    return service, calls
+
+
+def test_debug_requests_with_reformatted_code_share_a_cache_entry(monkeypatch):
+    service, calls = _service(monkeypatch, ["Index 5 is out of range"])
+    error = "IndexError: list index out of range"
+
+    first = asyncio.run(service.debug_code("x = [1,2]\nprint(x[5])", error))
+    reformatted = asyncio.run(service.debug_code("x = [1, 2]  # pair\n\nprint( x[5] )", error))
+    repeated = asyncio.run(service.debug_code("x = [1,2]\nprint(x[5])", error))
+    assert first == reformatted == repeated == "Index 5 is out of range"
+    assert len(calls) == 1
+
+    stats = service._response_cache.stats()
+    assert stats["exact_hits"] == 1
+    assert stats["normalized_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_explain_requests_ignore_case_and_whitespace(monkeypatch):
+    service, calls = _service(monkeypatch, ["[x for x in items]"])
+
+    first = asyncio.run(service.explain_concept("List  Comprehensions", "beginner", None))
+    second = asyncio.run(service.explain_concept("list comprehensions", "Beginner", None))
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_error_responses_are_not_cached(monkeypatch):
+    service, calls = _service(monkeypatch, ["AI tutor is temporarily unavailable.", "Use a for loop"])
+
+    asyncio.run(service.explain_concept("loops", "beginner", None))
+    result = asyncio.run(service.explain_concept("loops", "beginner", None))
+    assert result == "Use a for loop"
+    assert len(calls) == 2
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(monkeypatch):
+    service, calls = _service(monkeypatch, [])
+
+    async def slow_online(system_prompt: str, user_prompt: str) -> str:
+        calls.append(user_prompt)
+        await asyncio.sleep(0.05)
+        return "Title: Loop drill"
+
+    monkeypatch.setattr(service, "_generate_online", slow_online)
+
+    async def burst() -> list[dict[str, str]]:
+        return await asyncio.gather(*(service.generate_practice("loops", "easy") for _ in range(40)))
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert {item["title"] for item in results} == {"Loop drill"}
+    assert service._single_flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 39}
+
+
+def test_shared_cache_runs_off_the_loop_and_writes_both_tiers_at_once(db_session_factory: sessionmaker[Session]):
+    shared = SQLResponseCache(db_session_factory, ttl=3600)
+    commit_threads: list[int] = []
+
+    def on_commit(session: Session) -> None:
+        commit_threads.append(threading.get_ident())
+
+    event.listen(Session, "after_commit", on_commit)
+    try:
+        writer = TieredResponseCache(maxsize=10, ttl=3600, shared=shared)
+        asyncio.run(writer.set("exact", "normalized", "Use enumerate"))
+    finally:
+        event.remove(Session, "after_commit", on_commit)
+    assert len(commit_threads) == 1
+    assert commit_threads[0] != threading.get_ident()
+    with db_session_factory() as db:
+        assert db.scalar(select(func.count(AIResponseCacheEntry.cache_key))) == 2
+
+    # Another worker's empty LRU finds the normalized entry through the shared table.
+    reader = TieredResponseCache(maxsize=10, ttl=3600, shared=shared)
+    assert asyncio.run(reader.get("other-exact", "normalized")) == "Use enumerate"
+    assert asyncio.run(reader.get("other-exact", "normalized")) == "Use enumerate"
+    stats = reader.stats()
+    assert (stats["shared_hits"], stats["normalized_hits"], stats["misses"]) == (1, 2, 0)
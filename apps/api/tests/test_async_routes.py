@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.api.routers import ai_tutor as ai_tutor_router
+from app.api.routers import playground
+from app.db.session import get_async_db
+from app.services import ai_tutor, code_runner
+from app.services.llm_deadline import LLMDeadlineExceeded
+from app.services.llm_scheduler import LLMScheduler
+from tests.test_auth_learning_progress import _seed_curriculum, _signup
+
+
+def test_async_submit_updates_dashboard(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    monkeypatch,
+):
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    _signup(client, email="async@example.com")
+
+    async def fake_grade(code: str, cases: list[dict]) -> dict:
+        return {
+            "verdict": "passed",
+            "passed_count": 1,
+            "total_count": 1,
+            "cases": [{"name": "basic", "passed": True, "expected": "1", "actual": "1", "error": None, "time_ms": 1}],
+            "stderr": "",
+            "exit_code": 0,
+            "execution_time_ms": 3,
+        }
+
+    monkeypatch.setattr(code_runner.code_runner_service, "grade_python", fake_grade)
+
+    submit = client.post(
+        "/progress/challenges/submit",
+        json={"challenge_id": ids["challenge_one_id"], "code": "x = 1\nprint(x)"},
+    )
+    assert submit.status_code == 200, submit.text
+    assert submit.json()["passed"] is True
+
+    dashboard = client.get("/users/me/dashboard")
+    assert dashboard.status_code == 200, dashboard.text
+    stats = dashboard.json()
+    assert stats["xp"] == 50
+    assert stats["daily_xp"] == 50
+    assert stats["subscription_status"] == "free"
+
+
+def test_async_playground_explains_errors_and_spends_credit(client: TestClient, monkeypatch):
+    client.app.include_router(playground.router)
+    _signup(client, email="playground@example.com")
+
+    async def fake_run(code: str, stdin: str = "") -> dict:
+        return {"stdout": "", "stderr": "NameError: name 'y' is not defined", "exit_code": 1, "execution_time_ms": 4}
+
+    async def fake_debug(code: str, error_message: str, **kwargs) -> str:
+        assert kwargs["priority"] is False
+        return "Define y before printing it."
+
+    monkeypatch.setattr(code_runner.code_runner_service, "run_python", fake_run)
+    monkeypatch.setattr(ai_tutor.ai_tutor_service, "debug_code", fake_debug)
+
+    before = client.get("/users/me/entitlements").json()["ai_credits_remaining"]
+    response = client.post("/playground/run", json={"code": "print(y)"})
+    assert response.status_code == 200, response.text
+    assert response.json()["ai_error_explanation"] == "Define y before printing it."
+    assert client.get("/users/me/entitlements").json()["ai_credits_remaining"] == before - 1
+
+
+
+def test_saturated_llm_scheduler_refunds_the_playground_credit(client: TestClient, monkeypatch):
+    client.app.include_router(playground.router)
+    _signup(client, email="busy@example.com")
+
+    async def fake_run(code: str, stdin: str = "") -> dict:
+        return {"stdout": "", "stderr": "NameError: name 'z' is not defined", "exit_code": 1, "execution_time_ms": 4}
+
+    monkeypatch.setattr(code_runner.code_runner_service, "run_python", fake_run)
+    monkeypatch.setattr(ai_tutor.ai_tutor_service, "use_offline", False)
+    # No queue room at all: every cache miss is rejected at admission.
+    saturated = LLMScheduler(max_concurrency=1, per_user_concurrency=1, max_queue=0, max_wait_sec=1)
+    monkeypatch.setattr(ai_tutor, "llm_scheduler", saturated)
+
+    before = client.get("/users/me/entitlements").json()["ai_credits_remaining"]
+    response = client.post("/playground/run", json={"code": "print(z)  # saturated"})
+    assert response.status_code == 200, response.text
+    assert response.json()["ai_error_explanation"].startswith("AI tutor is busy")
+    assert saturated.rejected == 1
+    assert client.get("/users/me/entitlements").json()["ai_credits_remaining"] == before
+
+def test_upstream_waits_do_not_hold_pooled_connections(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    database_path: str,
+    monkeypatch,
+):
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    # A real queue pool, so checkouts during the (fake) upstream waits are observable.
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{database_path}", poolclass=AsyncAdaptedQueuePool, pool_size=2, max_overflow=0
+    )
+    pooled_sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with pooled_sessions() as db:
+            yield db
+
+    client.app.dependency_overrides[get_async_db] = override_get_async_db
+    client.app.include_router(ai_tutor_router.router)
+    _signup(client, email="pool@example.com")
+    checked_out: list[int] = []
+
+    async def slow_debug(code: str, error_message: str, **kwargs) -> str:
+        await asyncio.sleep(0.05)
+        checked_out.append(engine.pool.checkedout())
+        return "Check the types."
+
+    async def slow_grade(code: str, cases: list[dict]) -> dict:
+        await asyncio.sleep(0.05)
+        checked_out.append(engine.pool.checkedout())
+        return {
+            "verdict": "failed",
+            "passed_count": 0,
+            "total_count": 1,
+            "cases": [{"name": "basic", "passed": False, "expected": "1", "actual": "2", "error": None, "time_ms": 1}],
+            "stderr": "",
+            "exit_code": 0,
+            "execution_time_ms": 3,
+        }
+
+    monkeypatch.setattr(ai_tutor.ai_tutor_service, "debug_code", slow_debug)
+    monkeypatch.setattr(code_runner.code_runner_service, "grade_python", slow_grade)
+
+    try:
+        debug = client.post("/ai/debug", json={"code": "1 + '1'", "error_message": "TypeError"})
+        assert debug.status_code == 200, debug.text
+        submit = client.post(
+            "/progress/challenges/submit",
+            json={"challenge_id": ids["challenge_one_id"], "code": "print(2)"},
+        )
+        assert submit.status_code == 200, submit.text
+        # /ai/debug's LLM call, the submission's runner call, then its feedback LLM call.
+        assert checked_out == [0, 0, 0]
+    finally:
+        asyncio.run(engine.dispose())
+
+
+def test_failed_llm_call_refunds_the_ai_credit(client: TestClient, monkeypatch):
+    client.app.include_router(ai_tutor_router.router)
+    _signup(client, email="refund@example.com")
+
+    async def timed_out_debug(code: str, error_message: str, **kwargs) -> str:
+        raise LLMDeadlineExceeded()
+
+    monkeypatch.setattr(ai_tutor.ai_tutor_service, "debug_code", timed_out_debug)
+
+    before = client.get("/users/me/entitlements").json()["ai_credits_remaining"]
+    response = client.post("/ai/debug", json={"code": "1 + '1'", "error_message": "TypeError"})
+    assert response.status_code == 504, response.text
+    assert client.get("/users/me/entitlements").json()["ai_credits_remaining"] == before
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routers import admin
+from app.db.models import Submission, User
+from app.services import ai_tutor, code_runner
+from tests.test_auth_learning_progress import _seed_curriculum, _signup
+
+
+def test_submit_challenge_grades_test_cases(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    monkeypatch,
+):
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    _signup(client, email="grader@example.com")
+
+    graded: list[list[dict]] = []
+
+    async def fake_grade(code: str, cases: list[dict]) -> dict:
+        graded.append(cases)
+        return {
+            "verdict": "failed",
+            "passed_count": 0,
+            "total_count": 1,
+            "cases": [
+                {"name": "basic", "passed": False, "expected": "1", "actual": "2", "error": None, "time_ms": 0.1}
+            ],
+            "stderr": "",
+            "exit_code": 0,
+            "execution_time_ms": 5,
+            "usage": {
+                "cpu_user_ms": 1960.4,
+                "cpu_system_ms": 12.0,
+                "peak_rss_kb": 38140,
+                "startup_ms": 52.6,
+                "user_code_ms": 1935.5,
+                "limit_hit": "cpu",
+            },
+        }
+
+    async def fail_run(code: str, stdin: str = "") -> dict:
+        raise AssertionError("graded challenges must not fall back to a plain run")
+
+    async def fake_debug(code: str, error_message: str, **kwargs) -> str:
+        return "hint"
+
+    monkeypatch.setattr(code_runner.code_runner_service, "grade_python", fake_grade)
+    monkeypatch.setattr(code_runner.code_runner_service, "run_python", fail_run)
+    monkeypatch.setattr(ai_tutor.ai_tutor_service, "debug_code", fake_debug)
+
+    response = client.post(
+        "/progress/challenges/submit",
+        json={"challenge_id": ids["challenge_one_id"], "code": "x = 2\nprint(x)"},
+    )
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["passed"] is False
+    assert payload["verdict"] == "failed"
+    assert payload["test_results"][0]["name"] == "basic"
+    assert "Passed 0/1" in payload["output"]
+    assert graded == [[{"name": "basic", "input": "", "expected": "1"}]]
+
+    with db_session_factory() as db:
+        submission = db.get(Submission, payload["submission_id"])
+        assert submission is not None
+        assert (submission.cpu_user_ms, submission.peak_rss_kb, submission.startup_ms) == (1960, 38140, 53)
+        assert submission.limit_hit == "cpu"
+
+
+def test_admin_regrade_rewrites_submissions(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    monkeypatch,
+):
+    client.app.include_router(admin.router)
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    admin_id = _signup(client, email="regrader@example.com")["user"]["id"]
+    with db_session_factory() as db:
+        db.get(User, admin_id).is_admin = True
+        submissions = {
+            name: Submission(
+                user_id=admin_id, challenge_id=ids["challenge_one_id"], code=f"# {name}", output="old", passed=passed
+            )
+            for name, passed in (("fixed", False), ("broken", True), ("crashed", True))
+        }
+        db.add_all(submissions.values())
+        db.commit()
+        submission_ids = {name: submission.id for name, submission in submissions.items()}
+
+    def grade(verdict: str, passed_count: int) -> dict:
+        return {
+            "verdict": verdict,
+            "passed_count": passed_count,
+            "total_count": 1,
+            "cases": [
+                {"name": "basic", "passed": bool(passed_count), "expected": "1", "actual": "1", "error": None}
+            ],
+            "stderr": "",
+            "exit_code": 0,
+            "execution_time_ms": 4,
+            "usage": {"cpu_user_ms": 12.4, "cpu_system_ms": 2.0, "peak_rss_kb": 9000, "limit_hit": None},
+        }
+
+    verdicts = {"# fixed": grade("passed", 1), "# broken": grade("failed", 0)}
+    batches: list[list[dict]] = []
+    rewritten_before_batch: list[int] = []
+
+    async def fake_run_batch(jobs: list[dict]):
+        with db_session_factory() as db:
+            rewritten_before_batch.append(
+                db.scalar(select(func.count()).select_from(Submission).where(Submission.output != "old"))
+            )
+        batches.append(jobs)
+        for job in jobs:
+            if job["code"] in verdicts:
+                yield {"id": job["id"], "kind": "grade", "result": verdicts[job["code"]]}
+            else:
+                # A job the runner could not take (e.g. saturated) leaves its submission untouched.
+                yield {"id": job["id"], "status_code": 429, "error": "Code runner is busy."}
+
+    monkeypatch.setattr(code_runner.code_runner_service, "run_batch", fake_run_batch)
+    monkeypatch.setattr(admin, "REGRADE_BATCH_SIZE", 2)
+
+    response = client.post(f"/admin/challenges/{ids['challenge_one_id']}/regrade")
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "challenge_id": ids["challenge_one_id"],
+        "total_submissions": 3,
+        "regraded": 2,
+        "changed": 2,
+        "errors": 1,
+    }
+    assert [job["cases"] for job in batches[0]] == [[{"name": "basic", "input": "", "expected": "1"}]] * 2
+    # Each batch is committed before the next one is sent to the runner.
+    assert rewritten_before_batch == [0, 2]
+
+    with db_session_factory() as db:
+        fixed, broken, crashed = (db.get(Submission, submission_ids[name]) for name in ("fixed", "broken", "crashed"))
+        assert (fixed.passed, broken.passed, crashed.passed) == (True, False, True)
+        assert fixed.output.startswith("Passed 1/1")
+        assert broken.output.startswith("Passed 0/1")
+        assert crashed.output == "old"
+        assert (fixed.cpu_user_ms, fixed.peak_rss_kb, fixed.startup_ms) == (12, 9000, None)
+        assert crashed.cpu_user_ms is None
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.routers import ai_tutor_chat
+from app.services import offline_ai_tutor
+from app.services.chat_stream import ChatStreamRegistry
+
+
+def _parse(body: str) -> list[dict]:
+    frames = []
+    for block in body.strip().split("\n\n"):
+        frame: dict = {"event": "message", "data": []}
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            if field == "data":
+                frame["data"].append(value)
+            elif field in {"event", "id"}:
+                frame[field] = value
+        frame["data"] = json.loads("\n".join(frame["data"]))
+        frames.append(frame)
+    return frames
+
+
+def test_chunks_are_batched_and_abandoned_streams_cancel_upstream():
+    registry = ChatStreamRegistry(batch_ms=30, heartbeat_sec=5, resume_grace_sec=0.01, retention_sec=5)
+    finished: list[str] = []
+
+    async def burst():
+        for chunk in "abcde":
+            yield chunk
+        await asyncio.sleep(0.1)
+        yield "f"
+
+    async def endless(closed: asyncio.Event):
+        try:
+            while True:
+                yield "tok "
+                await asyncio.sleep(0.005)
+        finally:
+            closed.set()
+
+    async def scenario() -> tuple[list[dict], list[dict]]:
+        stream = registry.start(burst(), owner_key="u1", on_finish=lambda: finished.append("burst"))
+        frames = _parse("".join([chunk async for chunk in registry.subscribe(stream)]))
+        resumed = _parse("".join([chunk async for chunk in registry.subscribe(stream, after=1)]))
+
+        closed = asyncio.Event()
+        slow = registry.start(endless(closed), owner_key="u1", on_finish=lambda: finished.append("endless"))
+        subscriber = registry.subscribe(slow)
+        await subscriber.__anext__()
+        await subscriber.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        return frames, resumed
+
+    frames, resumed = asyncio.run(scenario())
+
+    assert [frame["data"].get("text") for frame in frames[:2]] == ["abcde", "f"]
+    assert frames[-1]["event"] == "done"
+    assert frames[-1]["data"]["chunks"] == 6
+    assert resumed == frames[1:]
+    assert finished == ["burst", "endless"]
+    assert registry.stats()["abandoned"] == 1
+
+
+def test_chat_stream_route_emits_sse_and_resumes(client: TestClient, monkeypatch):
+    client.app.include_router(ai_tutor_chat.router)
+
+    async def fake_stream(message: str, **kwargs):
+        kwargs["stats"]["eval_count"] = 3
+        for chunk in ("Hello", " there", "!"):
+            yield chunk
+            await asyncio.sleep(0.06)
+
+    monkeypatch.setattr(offline_ai_tutor.offline_ai_tutor_service, "chat_stream", fake_stream)
+
+    response = client.post("/ai-tutor/chat-stream", json={"message": "hi"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = _parse(response.text)
+    assert "".join(frame["data"].get("text", "") for frame in frames) == "Hello there!"
+    assert frames[-1]["event"] == "done"
+    assert frames[-1]["data"]["tokens"] == 3
+
+    resumed = client.post(
+        "/ai-tutor/chat-stream",
+        json={"message": "hi"},
+        headers={"Last-Event-ID": frames[0]["id"]},
+    )
+    assert _parse(resumed.text) == frames[1:]
+
+    missing = client.post("/ai-tutor/chat-stream", json={"message": "hi"}, headers={"Last-Event-ID": "gone:1"})
+    assert missing.status_code == 404
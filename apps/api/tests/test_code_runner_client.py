@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.routers import playground
+from app.services.code_runner import code_runner_service
+from app.services.http_clients import http_client_registry
+from tests.test_auth_learning_progress import _signup
+
+
+def test_saturated_runner_surfaces_429_with_retry_after(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": "3"}, json={"detail": "busy"})
+
+    client = httpx.AsyncClient(base_url="http://runner", transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client_registry._clients, "code_runner", client)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(code_runner_service.run_python("print(1)"))
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers == {"Retry-After": "3"}
+
+
+def test_streamed_run_relays_output_events(client: TestClient, monkeypatch):
+    events = [
+        {"type": "stdout", "data": "0\n"},
+        {"type": "stdout", "data": "1\n"},
+        {"type": "result", "stdout": "0\n1\n", "stderr": "", "exit_code": 0, "truncated": False},
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/run/stream"
+        return httpx.Response(200, content="".join(json.dumps(event) + "\n" for event in events))
+
+    runner = httpx.AsyncClient(base_url="http://runner", transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client_registry._clients, "code_runner", runner)
+    client.app.include_router(playground.router)
+    _signup(client, email="stream@example.com")
+
+    response = client.post("/playground/run/stream", json={"code": "print(0)\nprint(1)"})
+
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == events
+
+
+def test_abandoned_stream_closes_the_upstream_run(monkeypatch):
+    closed: list[bool] = []
+
+    async def fake_stream(code: str, stdin: str = ""):
+        try:
+            for index in range(1000):
+                yield {"type": "stdout", "data": f"{index}\n"}
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(code_runner_service, "stream_python", fake_stream)
+
+    async def scenario() -> tuple[str, list[bool]]:
+        payload = playground.CodeRunRequest(code="while True: print(1)")
+        response = await playground.run_code_streaming(payload, current_user=None)
+        first = await anext(response.body_iterator)
+        # What Starlette does to the body when the client goes away.
+        await response.body_iterator.aclose()
+        # Checked before the loop shuts down, which would finalize the generator anyway.
+        return first, list(closed)
+
+    first, closed_on_disconnect = asyncio.run(scenario())
+    assert json.loads(first) == {"type": "stdout", "data": "0\n"}
+    assert closed_on_disconnect == [True]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.services.conversation_history import InMemoryHistoryStore, SQLHistoryStore
+
+
+def test_in_memory_history_caps_messages_and_users():
+    store = InMemoryHistoryStore(max_messages=3, ttl_sec=3600, max_users=2)
+    for index in range(5):
+        store.append("alice", "user", f"message {index}")
+    assert [msg.content for msg in store.recent("alice")] == ["message 2", "message 3", "message 4"]
+    assert [msg.content for msg in store.recent("alice", limit=1)] == ["message 4"]
+
+    store.append("bob", "user", "hi")
+    store.append("carol", "user", "hello")
+    # alice was least recently used and is evicted once a third user arrives
+    assert store.recent("alice") == []
+    assert len(store.recent("carol")) == 1
+
+
+def test_in_memory_history_expires_after_ttl():
+    store = InMemoryHistoryStore(max_messages=10, ttl_sec=0, max_users=10)
+    store.append("alice", "user", "stale")
+    assert store.recent("alice") == []
+
+
+def test_sql_history_trims_to_cap_and_clears(db_session_factory: sessionmaker[Session]):
+    store = SQLHistoryStore(max_messages=2, ttl_sec=3600, session_factory=db_session_factory)
+    for index in range(4):
+        store.append("user-1", "assistant", f"answer {index}")
+    store.append("user-2", "user", "other")
+
+    assert [msg.content for msg in store.recent("user-1")] == ["answer 2", "answer 3"]
+    store.clear("user-1")
+    assert store.recent("user-1") == []
+    assert [msg.content for msg in store.recent("user-2")] == ["other"]
+
+
+def test_sql_history_async_calls_run_off_the_event_loop(db_session_factory: sessionmaker[Session]):
+    store = SQLHistoryStore(max_messages=5, ttl_sec=3600, session_factory=db_session_factory)
+    threads: list[int] = []
+    append = store.append
+
+    def recording_append(user_key: str, role: str, content: str) -> None:
+        threads.append(threading.get_ident())
+        append(user_key, role, content)
+
+    store.append = recording_append
+
+    async def scenario() -> list[str]:
+        await store.append_async("user-1", "user", "hello")
+        return [msg.content for msg in await store.recent_async("user-1")]
+
+    assert asyncio.run(scenario()) == ["hello"]
+    assert threads and threads[0] != threading.get_ident()
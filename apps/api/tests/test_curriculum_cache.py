@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routers import admin
+from app.db.models import User
+from app.services.curriculum_cache import curriculum_cache
+from tests.test_auth_learning_progress import _seed_curriculum, _signup
+
+
+def test_catalog_is_served_from_snapshot_with_etags(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    with db_session_factory() as db:
+        _seed_curriculum(db)
+    _signup(client, email="catalog@example.com")
+
+    first = client.get("/courses/catalog")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    course_id = first.json()[0]["id"]
+    assert [module["title"] for module in first.json()[0]["modules"]] == ["Foundations", "Applied Skills"]
+
+    builds = curriculum_cache.builds
+    assert client.get("/courses/catalog", headers={"If-None-Match": etag}).status_code == 304
+    course = client.get(f"/courses/{course_id}")
+    assert course.status_code == 200
+    assert course.json()["id"] == course_id
+    assert client.get(f"/courses/{course_id}", headers={"If-None-Match": course.headers["etag"]}).status_code == 304
+    assert client.get("/courses/999999").status_code == 404
+    assert curriculum_cache.builds == builds
+
+
+def test_admin_edits_invalidate_the_snapshot(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    client.app.include_router(admin.router)
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    user_id = _signup(client, email="curator@example.com")["user"]["id"]
+    with db_session_factory() as db:
+        db.scalar(select(User).where(User.id == user_id)).is_admin = True
+        db.commit()
+
+    before = client.get("/courses/catalog")
+    response = client.patch(f"/admin/modules/{ids['module_one_id']}", json={"title": "Basics"})
+    assert response.status_code == 200, response.text
+
+    after = client.get("/courses/catalog", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.json()[0]["modules"][0]["title"] == "Basics"
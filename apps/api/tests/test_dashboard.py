@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import (
+    LearningTrack,
+    LessonProgress,
+    PremiumAccessGrant,
+    SquadMembership,
+    StudySquad,
+    TrackMilestone,
+    User,
+    UserMilestoneCompletion,
+    UserTrackEnrollment,
+)
+from app.services.dashboard import dashboard_service
+from app.services.gamification import gamification_service
+from tests.test_auth_learning_progress import _seed_curriculum, _signup
+
+
+def test_dashboard_aggregates_and_caches_per_user(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    with db_session_factory() as db:
+        ids = _seed_curriculum(db)
+    user_id = _signup(client, email="dash@example.com")["user"]["id"]
+
+    with db_session_factory() as db:
+        old_track = LearningTrack(slug="old", name="Old Track", description="", outcome="", target_audience="all")
+        new_track = LearningTrack(slug="new", name="Data Track", description="", outcome="", target_audience="all")
+        milestone = TrackMilestone(track=new_track, title="First", description="", reward_xp=120)
+        squad = StudySquad(name="Night Owls", join_code="OWLS", owner_user_id=user_id, weekly_goal_lessons=2)
+        db.add_all([old_track, new_track, milestone, squad])
+        db.flush()
+        db.add_all(
+            [
+                # A paused enrollment touched more recently must not beat the active one.
+                UserTrackEnrollment(user_id=user_id, track_id=new_track.id, status="active"),
+                UserTrackEnrollment(
+                    user_id=user_id,
+                    track_id=old_track.id,
+                    status="paused",
+                    updated_at=datetime.utcnow() + timedelta(minutes=5),
+                ),
+                SquadMembership(squad_id=squad.id, user_id=user_id),
+                UserMilestoneCompletion(user_id=user_id, milestone_id=milestone.id, completion_score=90),
+                LessonProgress(
+                    user_id=user_id,
+                    lesson_id=ids["lesson_one_id"],
+                    status="completed",
+                    quiz_score=80,
+                    completed_at=datetime.utcnow(),
+                ),
+            ]
+        )
+        db.commit()
+
+    stats = client.get("/users/me/dashboard").json()
+    assert stats["total_lessons"] == 2
+    assert stats["completed_lesson_ids"] == [ids["lesson_one_id"]]
+    assert stats["completion_rate"] == 50.0
+    assert stats["daily_xp"] == 60 + 120
+    assert stats["weekly_xp"] == 60 + 120
+    assert stats["active_track"] == "Data Track"
+    assert stats["completed_milestones"] == 1
+    assert stats["squad_name"] == "Night Owls"
+    assert stats["weekly_goal_progress"] == 50.0
+
+    hits = dashboard_service.hits
+    assert client.get("/users/me/dashboard").json() == stats
+    assert dashboard_service.hits == hits + 1
+
+    dashboard_service.invalidate(user_id)
+    assert client.get("/users/me/dashboard").json() == stats
+    assert dashboard_service.hits == hits + 1
+
+
+def test_dashboard_cache_tracks_xp_and_entitlement_changes(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    with db_session_factory() as db:
+        _seed_curriculum(db)
+    user_id = _signup(client, email="dash-fresh@example.com")["user"]["id"]
+
+    stats = client.get("/users/me/dashboard").json()
+    assert stats["xp"] == 0
+    assert stats["subscription_status"] == "free"
+    assert stats["can_access_advanced_topics"] is False
+
+    # An XP award committed by this worker drops the cached entry.
+    with db_session_factory() as db:
+        gamification_service.award_xp(db, db.get(User, user_id), 50)
+        db.commit()
+    assert dashboard_service._cached(user_id) is None
+    assert client.get("/users/me/dashboard").json()["xp"] == 50
+
+    # A change another worker made never reaches this cache, yet the user fields stay current.
+    with db_session_factory() as db:
+        db.execute(update(User).where(User.id == user_id).values(xp=2000, level=9))
+        db.commit()
+    assert dashboard_service._cached(user_id) is not None
+    stats = client.get("/users/me/dashboard").json()
+    assert (stats["xp"], stats["level"]) == (2000, 9)
+    assert stats["earned_advanced_access"] is True
+    assert stats["can_access_advanced_topics"] is True
+
+    with db_session_factory() as db:
+        db.add(PremiumAccessGrant(user_id=user_id, source="test", granted_at=datetime.utcnow()))
+        db.commit()
+    assert dashboard_service._cached(user_id) is None
+    assert client.get("/users/me/dashboard").json()["can_access_advanced_topics"] is True
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import create_engine, text
+
+from app.db.session import TimedQueuePool, instrument_engine, pool_metrics
+from app.services.observability import ObservabilityService, observability_service
+
+
+def test_queries_are_attributed_to_the_current_request(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}", poolclass=TimedQueuePool, pool_size=2)
+    instrument_engine(engine)
+    checkouts_before = pool_metrics.checkouts
+
+    usage, token = observability_service.begin_request_db_usage()
+    try:
+        with engine.connect() as conn:
+            for _ in range(5):
+                conn.execute(text("SELECT 1"))
+    finally:
+        observability_service.end_request_db_usage(token)
+
+    assert usage.query_count == 5
+    assert usage.db_time_ms > 0
+    assert pool_metrics.checkouts == checkouts_before + 1
+
+    service = ObservabilityService()
+    with caplog.at_level(logging.WARNING, logger="app.services.observability"):
+        service.record_request_db_usage("GET /learning/gates", usage, query_budget=3)
+        service.record_request_db_usage("GET /users/me", usage, query_budget=10)
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Request GET /learning/gates ran 5 queries (budget 3, %.1f ms in DB); likely an N+1" % usage.db_time_ms
+    ]
+    stats = service.db_usage_stats()
+    assert stats["requests"] == 2
+    assert stats["over_budget_requests"] == 1
+    assert stats["max_queries_by_route"] == {"GET /learning/gates": 5, "GET /users/me": 5}
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import EconomyTransaction, EventDailyRollup, EventLog
+from app.services.event_storage import EventStorageService, add_months, month_start
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_maintenance_rolls_up_then_archives_expired_months(
+    db_session_factory: sessionmaker[Session],
+    tmp_path,
+):
+    this_month = month_start(date.today())
+    expired = datetime.combine(add_months(this_month, -4), datetime.min.time()) + timedelta(days=2, hours=5)
+    recent = datetime.utcnow() - timedelta(minutes=5)
+    with db_session_factory() as db:
+        db.add_all(
+            [
+                EventLog(event_type="lesson.completed", created_at=expired),
+                EventLog(event_type="lesson.completed", created_at=expired + timedelta(hours=1)),
+                EventLog(event_type="lesson.completed", created_at=recent),
+                EconomyTransaction(user_id="u1", source="referral_reward", amount=5, created_at=expired),
+                EconomyTransaction(user_id="u1", source="referral_reward", amount=7, created_at=expired),
+            ]
+        )
+        db.commit()
+
+    service = EventStorageService(
+        archive_dir=str(tmp_path / "archive"),
+        retention_months=3,
+        months_ahead=2,
+        interval_sec=3600,
+        partitioning_enabled=True,
+    )
+    report = service.run_maintenance(db_session_factory.kw["bind"])
+
+    assert {(item["table"], item["rows"]) for item in report["archived"]} == {
+        ("event_logs", 2),
+        ("economy_transactions", 2),
+    }
+    archive = tmp_path / "archive" / "event_logs" / f"{expired:%Y-%m}.jsonl.gz"
+    with gzip.open(archive, "rt", encoding="utf-8") as handle:
+        archived_rows = [json.loads(line) for line in handle]
+    assert [row["event_type"] for row in archived_rows] == ["lesson.completed", "lesson.completed"]
+
+    with db_session_factory() as db:
+        assert db.scalars(select(EventLog.created_at)).all() == [recent]
+        assert db.scalar(select(EconomyTransaction.id)) is None
+        rollups = {
+            (row.day, row.source, row.event_type): (row.event_count, row.amount_total)
+            for row in db.scalars(select(EventDailyRollup))
+        }
+    assert rollups[(expired.date(), "event_logs", "lesson.completed")] == (2, 0)
+    assert rollups[(expired.date(), "economy_transactions", "referral_reward")] == (2, 12)
+    assert rollups[(recent.date(), "event_logs", "lesson.completed")] == (1, 0)
+
+    # A second run only re-rolls from the last rolled-up day and leaves the counts intact.
+    assert service.run_maintenance(db_session_factory.kw["bind"])["archived"] == []
+    with db_session_factory() as db:
+        assert len(db.scalars(select(EventDailyRollup)).all()) == len(rollups)
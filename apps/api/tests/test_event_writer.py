@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import EventLog, LifecycleEvent
+from app.services.audit import log_event, log_lifecycle_event
+from app.services.event_writer import _STAGED_KEY, event_writer
+
+
+def test_committed_events_are_written_behind_in_batches(db_session_factory: sessionmaker[Session], monkeypatch):
+    monkeypatch.setattr(event_writer, "max_queue", 3)
+    written_before = event_writer.written
+
+    async def scenario() -> None:
+        event_writer.start(db_session_factory.kw["bind"])
+        with db_session_factory() as db:
+            log_event(db, "lesson.completed", entity_type="lesson", entity_id="1")
+            log_lifecycle_event(db, "user-1", "trial_started", {"plan": "pro"})
+            assert not db.new
+            db.commit()
+
+        with db_session_factory() as db:
+            log_event(db, "lesson.progressed")
+            db.rollback()
+
+        with db_session_factory() as db:
+            log_event(db, "admin.course_updated", transactional=True)
+            # The queue holds two committed events, so only one more fits.
+            log_event(db, "challenge.submitted")
+            log_event(db, "challenge.overflow")
+            assert len(db.new) == 2
+            db.commit()
+
+        assert event_writer.stats()["queue_depth"] == 3
+        await event_writer.stop()
+
+    asyncio.run(scenario())
+
+    assert event_writer.stats()["queue_depth"] == 0
+    assert event_writer.written == written_before + 3
+    with db_session_factory() as db:
+        assert sorted(db.scalars(select(EventLog.event_type))) == [
+            "admin.course_updated",
+            "challenge.overflow",
+            "challenge.submitted",
+            "lesson.completed",
+        ]
+        lifecycle = db.scalar(select(LifecycleEvent))
+        assert (lifecycle.event_type, lifecycle.metadata_json) == ("trial_started", {"plan": "pro"})
+
+
+def test_rolled_back_events_are_never_written(db_session_factory: sessionmaker[Session]):
+    written_before = event_writer.written
+
+    async def scenario() -> None:
+        event_writer.start(db_session_factory.kw["bind"])
+        with db_session_factory() as db:
+            log_event(db, "lesson.abandoned")
+            assert db.info[_STAGED_KEY]
+            db.rollback()
+            assert _STAGED_KEY not in db.info
+            db.commit()
+        assert event_writer.stats()["queue_depth"] == 0
+        await event_writer.stop()
+
+    asyncio.run(scenario())
+
+    assert event_writer.written == written_before
+    with db_session_factory() as db:
+        assert db.scalar(select(EventLog).where(EventLog.event_type == "lesson.abandoned")) is None
+
+
+def test_a_bad_row_does_not_lose_the_rest_of_its_batch(db_session_factory: sessionmaker[Session]):
+    written_before, failed_before = event_writer.written, event_writer.failed
+
+    async def scenario() -> None:
+        event_writer.start(db_session_factory.kw["bind"])
+        with db_session_factory() as db:
+            log_event(db, "lesson.completed")
+            # NOT NULL violation: fails the multi-row INSERT and every retry of its own.
+            event_writer.stage(db, EventLog, {"event_type": None})
+            log_event(db, "quiz.submitted")
+            db.commit()
+        await event_writer.stop()
+
+    asyncio.run(scenario())
+
+    assert event_writer.written == written_before + 2
+    assert event_writer.failed == failed_before + 1
+    assert event_writer.stats()["queue_depth"] == 0
+    with db_session_factory() as db:
+        assert sorted(db.scalars(select(EventLog.event_type))) == ["lesson.completed", "quiz.submitted"]
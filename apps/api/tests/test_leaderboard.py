@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routers import gamification
+from app.db.models import SquadMembership, StudySquad, User, WeeklyXPTotal
+from app.services.gamification import gamification_service
+from app.services.leaderboard import RankBoard, leaderboard_service
+from tests.test_auth_learning_progress import _signup
+
+
+def test_rank_board_uses_competition_ranks():
+    board = RankBoard.from_scores({"a": 300, "b": 100, "c": 300})
+    board.set("d", 200)
+    board.add("b", 250)
+
+    assert board.slice(0, 10) == [(1, "b", 350), (2, "a", 300), (2, "c", 300), (4, "d", 200)]
+    assert board.rank_for_score(300) == 2
+    assert board.rank_for_score(0) == 5
+    assert board.position("d") == 3
+
+
+def test_awards_update_ranks_after_commit_only(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    client.app.include_router(gamification.router)
+    others = [_signup(client, email=f"rival{idx}@example.com")["user"]["id"] for idx in range(3)]
+    me = _signup(client, email="climber@example.com")["user"]["id"]
+
+    with db_session_factory() as db:
+        squad = StudySquad(name="Climbers", join_code="CLIMB", owner_user_id=me)
+        db.add(squad)
+        db.flush()
+        db.add_all([SquadMembership(squad_id=squad.id, user_id=user_id) for user_id in (me, others[0])])
+        for user_id, amount in zip(others, (500, 300, 100)):
+            gamification_service.award_xp(db, db.get(User, user_id), amount)
+        db.commit()
+
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 4
+
+    with db_session_factory() as db:
+        gamification_service.award_xp(db, db.get(User, me), 1000)
+        db.rollback()
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 4
+
+    with db_session_factory() as db:
+        user = db.get(User, me)
+        gamification_service.award_xp(db, user, 250)
+        gamification_service.award_xp(db, user, 150)
+        db.commit()
+        assert db.scalar(select(WeeklyXPTotal.xp).where(WeeklyXPTotal.user_id == me)) == 400
+
+    loads = leaderboard_service.loads
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 2
+    assert leaderboard_service.loads == loads
+
+    top = client.get("/gamification/leaderboard", params={"limit": 2}).json()
+    assert [(row["rank"], row["xp"]) for row in top] == [(1, 500), (2, 400)]
+
+    around = client.get("/gamification/leaderboard/around-me", params={"before": 1, "after": 1}).json()
+    assert around["rank"] == 2
+    assert around["total"] == 4
+    assert [row["user_id"] for row in around["entries"]] == [others[0], me, others[1]]
+
+    weekly = client.get("/gamification/leaderboard", params={"scope": "weekly", "offset": 1, "limit": 1}).json()
+    assert [(row["rank"], row["user_id"]) for row in weekly] == [(2, me)]
+
+    squad = client.get("/gamification/leaderboard/around-me", params={"scope": "squad"}).json()
+    assert squad["rank"] == 2
+    assert [row["user_id"] for row in squad["entries"]] == [others[0], me]
+
+    assert client.get("/gamification/leaderboard", params={"scope": "everyone"}).status_code == 422
+
+
+
+def test_weekly_totals_are_incremented_in_sql(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+):
+    me = _signup(client, email="racer@example.com")["user"]["id"]
+    with db_session_factory() as db:
+        gamification_service.award_xp(db, db.get(User, me), 100)
+        db.commit()
+
+    weekly_for_me = select(WeeklyXPTotal).where(WeeklyXPTotal.user_id == me)
+    with db_session_factory() as slow, db_session_factory() as fast:
+        # ``slow`` has already loaded the row when ``fast`` commits its award.
+        loaded = slow.scalar(weekly_for_me)
+        assert loaded.xp == 100
+        gamification_service.award_xp(fast, fast.get(User, me), 50)
+        fast.commit()
+        gamification_service.award_xp(slow, slow.get(User, me), 25)
+        slow.commit()
+
+    with db_session_factory() as db:
+        assert db.scalar(select(WeeklyXPTotal.xp).where(WeeklyXPTotal.user_id == me)) == 175
+
+def test_stale_boards_are_served_while_a_background_refresh_runs(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    monkeypatch,
+):
+    client.app.include_router(gamification.router)
+    rival = _signup(client, email="rival@example.com")["user"]["id"]
+    me = _signup(client, email="me@example.com")["user"]["id"]
+    with db_session_factory() as db:
+        gamification_service.award_xp(db, db.get(User, rival), 500)
+        db.commit()
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 2
+
+    # XP awarded through another worker never reaches this process's boards directly.
+    with db_session_factory() as db:
+        db.execute(update(User).where(User.id == me).values(xp=900))
+        db.commit()
+    monkeypatch.setattr(leaderboard_service, "refresh_sec", 0.0)
+    refreshes = leaderboard_service.background_refreshes
+
+    # The stale boards answer at once; the rebuild happens off the request.
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 2
+    deadline = time.monotonic() + 5
+    while leaderboard_service.background_refreshes == refreshes and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert leaderboard_service.background_refreshes == refreshes + 1
+
+    monkeypatch.setattr(leaderboard_service, "refresh_sec", 300.0)
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 1
+
+
+def test_awards_committed_during_a_rebuild_are_replayed(
+    client: TestClient,
+    db_session_factory: sessionmaker[Session],
+    monkeypatch,
+):
+    client.app.include_router(gamification.router)
+    rival = _signup(client, email="rival@example.com")["user"]["id"]
+    me = _signup(client, email="me@example.com")["user"]["id"]
+    with db_session_factory() as db:
+        gamification_service.award_xp(db, db.get(User, rival), 500)
+        db.commit()
+
+    build = RankBoard.from_scores.__func__
+    fired: list[bool] = []
+
+    def from_scores_with_concurrent_award(cls, scores: dict[str, int]) -> RankBoard:
+        # Lands after the load read its snapshot but before the new boards are swapped in.
+        if not fired:
+            fired.append(True)
+            with db_session_factory() as db:
+                gamification_service.award_xp(db, db.get(User, me), 700)
+                db.commit()
+        return build(cls, scores)
+
+    monkeypatch.setattr(RankBoard, "from_scores", classmethod(from_scores_with_concurrent_award))
+    leaderboard_service.invalidate()
+
+    assert client.get("/gamification/summary").json()["leaderboard_rank"] == 1
+    weekly = client.get("/gamification/leaderboard", params={"scope": "weekly"}).json()
+    assert [(row["user_id"], row["xp"]) for row in weekly] == [(me, 700), (rival, 500)]
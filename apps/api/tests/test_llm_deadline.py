@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.llm_deadline import ClientClosedRequest, LLMDeadlineExceeded, LLMDeadlines
+from app.services.llm_scheduler import LLMQueueFullError, LLMScheduler
+
+
+class _Request:
+    def __init__(self, disconnect_after: float) -> None:
+        self.disconnect_after = disconnect_after
+        self.started = None
+
+    async def is_disconnected(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self.started is None:
+            self.started = loop.time()
+        return loop.time() - self.started >= self.disconnect_after
+
+
+def test_disconnect_cancels_the_upstream_generation():
+    deadlines = LLMDeadlines(tokens_per_sec=10, min_num_predict=16, poll_sec=0.01)
+    closed = asyncio.Event()
+
+    async def generate() -> str:
+        try:
+            async with deadlines.upstream():
+                await asyncio.sleep(10)
+        finally:
+            closed.set()
+        return "never"
+
+    async def scenario() -> None:
+        with pytest.raises(ClientClosedRequest):
+            await deadlines.run(_Request(disconnect_after=0.03), 5, generate)
+        assert closed.is_set()
+
+    asyncio.run(scenario())
+    stats = deadlines.stats()
+    assert stats["client_disconnects"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["completed"] == 0
+    assert 0 < stats["cancelled_sec"] == stats["wasted_sec"] < 1
+
+
+def test_budget_bounds_generation_length_and_scheduler_wait():
+    deadlines = LLMDeadlines(tokens_per_sec=10, min_num_predict=16, poll_sec=0.01)
+    scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, max_queue=10, max_wait_sec=5)
+
+    async def generate() -> int:
+        tokens = deadlines.num_predict(1024)
+        async with deadlines.upstream():
+            await asyncio.sleep(10)
+        return tokens
+
+    async def queued() -> None:
+        async with scheduler.slot("waiting"):
+            pass
+
+    async def scenario() -> None:
+        assert deadlines.num_predict(1024) == 1024
+        with deadlines.budget(20):
+            assert 170 < deadlines.num_predict(1024) <= 180
+        with deadlines.budget(0.5):
+            assert deadlines.num_predict(1024) == 16
+
+        with pytest.raises(LLMDeadlineExceeded):
+            await deadlines.run(_Request(disconnect_after=60), 0.05, generate)
+
+        # A queued request gives up when its own budget runs out, not after max_wait_sec.
+        async with scheduler.slot("holder"):
+            with deadlines.budget(0.05):
+                started = asyncio.get_running_loop().time()
+                with pytest.raises(LLMQueueFullError):
+                    await queued()
+                assert asyncio.get_running_loop().time() - started < 1
+
+    asyncio.run(scenario())
+    stats = deadlines.stats()
+    assert stats["deadline_exceeded"] == 1
+    assert stats["cancelled"] == 0
+    assert stats["wasted_sec"] > 0
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.llm_scheduler import LLMQueueFullError, LLMScheduler
+
+
+def test_waiters_are_served_round_robin_with_priority_lane_first():
+    scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, max_queue=50, max_wait_sec=5)
+    order: list[str] = []
+
+    async def job(user_key: str, label: str, priority: bool = False) -> None:
+        async with scheduler.slot(user_key, priority):
+            order.append(label)
+            await asyncio.sleep(0.01)
+
+    async def scenario() -> None:
+        holder = asyncio.create_task(job("warmup", "warmup"))
+        await asyncio.sleep(0)
+        # One user floods the normal lane before anyone else arrives.
+        tasks = [asyncio.create_task(job("spammer", f"spammer-{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job("casual", "casual")))
+        tasks.append(asyncio.create_task(job("premium", "premium", priority=True)))
+        await asyncio.gather(holder, *tasks)
+
+    asyncio.run(scenario())
+    assert order == ["warmup", "premium", "spammer-0", "casual", "spammer-1", "spammer-2"]
+    stats = scheduler.stats()
+    assert stats["admitted"] == 6
+    assert stats["in_flight"] == 0
+    assert stats["queued_normal"] == stats["queued_priority"] == 0
+
+
+def test_requests_fail_fast_when_the_queue_cannot_drain_in_time():
+    scheduler = LLMScheduler(max_concurrency=1, per_user_concurrency=1, max_queue=1, max_wait_sec=0.05)
+
+    async def scenario() -> list[int]:
+        ticket = await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        statuses = []
+        # The queue is full: rejected immediately without waiting.
+        with pytest.raises(LLMQueueFullError) as rejected:
+            await scheduler.acquire("c")
+        statuses.append(rejected.value.status_code)
+        # The queued request times out because the slot is never released.
+        with pytest.raises(LLMQueueFullError) as timed_out:
+            await waiter
+        statuses.append(timed_out.value.status_code)
+        scheduler.release(ticket)
+        return statuses
+
+    assert asyncio.run(scenario()) == [503, 503]
+    stats = scheduler.stats()
+    assert stats["rejected"] == 1
+    assert stats["timed_out"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["queued_normal"] == 0
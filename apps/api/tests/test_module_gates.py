@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.models import Course, Lesson, LessonProgress, Module, ModuleMastery, User
+from app.services.mastery import mastery_service
+
+
+def _seed(db: Session, module_count: int) -> tuple[User, list[Module]]:
+    user = User(email="gates@example.com", full_name="Gate Tester")
+    course = Course(
+        slug="gates",
+        title="Gates",
+        description="Gate course",
+        difficulty="beginner",
+        order_index=1,
+        is_published=True,
+    )
+    modules = []
+    for index in range(module_count):
+        module = Module(title=f"Module {index}", description="", order_index=index + 1, xp_reward=10)
+        for lesson_index in range(2):
+            module.lessons.append(
+                Lesson(
+                    title=f"Lesson {index}.{lesson_index}",
+                    objective="",
+                    content_md="",
+                    order_index=lesson_index + 1,
+                    estimated_minutes=1,
+                )
+            )
+        modules.append(module)
+    course.modules.extend(modules)
+    db.add_all([user, course])
+    db.commit()
+
+    # Master the first module completely and half-finish the second one.
+    for lesson in modules[0].lessons:
+        db.add(LessonProgress(user_id=user.id, lesson_id=lesson.id, status="completed", quiz_score=90, challenge_passed=True))
+    db.add(
+        LessonProgress(
+            user_id=user.id,
+            lesson_id=modules[1].lessons[0].id,
+            status="completed",
+            quiz_score=50,
+            challenge_passed=False,
+        )
+    )
+    db.commit()
+    return user, modules
+
+
+def _count_statements(db: Session) -> list[str]:
+    statements: list[str] = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_gate_states_use_constant_queries_and_skip_unchanged_writes(db_session_factory: sessionmaker[Session]):
+    with db_session_factory() as db:
+        user, modules = _seed(db, module_count=6)
+        module_ids = [module.id for module in modules]
+        db.refresh(user)
+        statements = _count_statements(db)
+
+        states = mastery_service.module_gate_states(db, user)
+        reads = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+        assert len(reads) == 2
+        db.commit()
+
+        assert [state.module_id for state in states] == module_ids
+        first, second, third = states[:3]
+        assert (first.unlocked, first.mastered, first.lessons_completed, first.average_quiz_score) == (True, True, 2, 90)
+        assert (second.unlocked, second.mastered, second.lessons_completed, second.challenges_passed) == (True, False, 1, 0)
+        assert second.total_lessons == 2
+        assert (third.unlocked, third.mastered) == (False, False)
+
+        assert db.scalar(select(ModuleMastery.unlocked_at).where(ModuleMastery.module_id == module_ids[0])) is not None
+
+        statements.clear()
+        mastery_service.module_gate_states(db, user)
+        db.commit()
+        writes = [sql for sql in statements if sql.lstrip().upper().startswith(("INSERT", "UPDATE"))]
+        assert writes == []
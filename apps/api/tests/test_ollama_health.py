@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from app.services.ollama_health import OllamaHealthMonitor
+
+
+def test_circuit_opens_after_consecutive_failures_and_closes_on_success():
+    monitor = OllamaHealthMonitor(interval_sec=15, failure_threshold=3, open_sec=30)
+    assert monitor.state.available is True  # not probed yet
+
+    monitor.record_failure("ConnectError")
+    monitor.record_failure("ConnectError")
+    assert monitor.state.circuit_open is False
+    assert monitor.state.available is False
+
+    monitor.record_failure("ConnectError")
+    assert monitor.state.circuit_open is True
+    assert monitor.state.consecutive_failures == 3
+
+    monitor.record_success(("mistral:latest",))
+    assert monitor.state.available is True
+    assert monitor.state.circuit_open is False
+    assert monitor.state.models == ("mistral:latest",)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import copy
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import seed
+from app.db.models import CodingChallenge, DailyMission, Lesson, Module, QuizQuestion, TrackLesson
+
+
+def _counts(db: Session) -> dict[str, int]:
+    return {
+        model.__tablename__: db.scalar(select(func.count()).select_from(model))
+        for model in (Module, Lesson, QuizQuestion, CodingChallenge, TrackLesson, DailyMission)
+    }
+
+
+def test_seed_skips_unchanged_content_and_applies_diffs(db_session_factory: sessionmaker[Session], monkeypatch):
+    with db_session_factory() as db:
+        assert seed.seed_database(db) is True
+        counts = _counts(db)
+    assert counts["modules"] == len(seed.CURRICULUM["modules"])
+    assert counts["daily_missions"] == len(seed.DAILY_MISSIONS)
+
+    with db_session_factory() as db:
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, *args) -> None:
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", record)
+        try:
+            assert seed.seed_database(db) is False
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", record)
+        assert len(statements) == 2
+        assert _counts(db) == counts
+
+    curriculum = copy.deepcopy(seed.CURRICULUM)
+    curriculum["modules"][0]["description"] = "Updated description."
+    monkeypatch.setattr(seed, "CURRICULUM", curriculum)
+    with db_session_factory() as db:
+        first_lesson = db.scalar(select(Lesson).order_by(Lesson.id).limit(1))
+        db.delete(db.scalar(select(QuizQuestion).where(QuizQuestion.lesson_id == first_lesson.id).limit(1)))
+        db.commit()
+
+        assert seed.seed_database(db) is True
+        assert _counts(db) == counts
+        module = db.scalar(select(Module).where(Module.title == curriculum["modules"][0]["title"]))
+        assert module.description == "Updated description."
@@ -157,12 +157,32 @@ export function OfflineAITutorChat() {
       setMessages((prev) => [...prev, assistantMessage]);
 
       if (reader) {
-        while (true) {
+        // Server-sent events: frames are separated by a blank line; ":" lines are keepalives.
+        let buffer = "";
+        let finished = false;
+        while (!finished) {
           const { done, value } = await reader.read();
           if (done) break;
 
-          const chunk = decoder.decode(value);
-          assistantMessage.content += chunk;
+          buffer += decoder.decode(value, { stream: true });
+          const frames = buffer.split("\n\n");
+          buffer = frames.pop() ?? "";
+
+          for (const frame of frames) {
+            let event = "message";
+            const data: string[] = [];
+            for (const line of frame.split("\n")) {
+              if (line.startsWith("event: ")) event = line.slice(7);
+              else if (line.startsWith("data: ")) data.push(line.slice(6));
+            }
+            if (data.length === 0) continue;
+            const parsed = JSON.parse(data.join("\n"));
+            if (event === "done") {
+              finished = true;
+              break;
+            }
+            assistantMessage.content += event === "error" ? `\nError: ${parsed.message}` : parsed.text ?? "";
+          }
 
           // Update the last message (assistant's response) with new chunk
           setMessages((prev) => {
@@ -173,6 +193,7 @@ export function OfflineAITutorChat() {
             return updated;
           });
         }
+        await reader.cancel();
       }
     } catch (error) {
       console.error("Error:", error);
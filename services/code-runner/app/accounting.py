@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+
+# Runs the learner's file the way ``python main.py`` would, but first writes one byte to
+# the marker fd and closes it, so the parent can split interpreter start-up from user code.
+# The fd is closed before any learner code runs, so the program cannot forge the marker.
+FRESH_BOOTSTRAP = """
+import os, sys, traceback, types
+_marker, _path = int(sys.argv[1]), sys.argv[2]
+sys.argv = [_path]
+with open(_path, encoding="utf-8") as _source:
+    _code = compile(_source.read(), _path, "exec", dont_inherit=True)
+_main = types.ModuleType("__main__")
+_main.__file__ = _path
+sys.modules["__main__"] = _main
+os.write(_marker, b".")
+os.close(_marker)
+try:
+    exec(_code, _main.__dict__)
+except SystemExit:
+    raise
+except BaseException as _exc:
+    traceback.print_exception(type(_exc), _exc, _exc.__traceback__.tb_next)
+    sys.exit(1)
+"""
+
+
+def usage_from_rusage(rusage, startup_sec: float | None, user_code_sec: float | None) -> dict:
+    """Per-run accounting in response units; ``ru_maxrss`` is already KiB on Linux."""
+    return {
+        "cpu_user_ms": round(rusage.ru_utime * 1000, 1),
+        "cpu_system_ms": round(rusage.ru_stime * 1000, 1),
+        "peak_rss_kb": int(rusage.ru_maxrss),
+        "startup_ms": round(startup_sec * 1000, 1) if startup_sec is not None else None,
+        "user_code_ms": round(user_code_sec * 1000, 1) if user_code_sec is not None else None,
+    }
+
+
+def classify_limit(
+    *,
+    timed_out: bool,
+    truncated: bool,
+    term_signal: int | None,
+    cpu_sec: float,
+    cpu_limit_sec: float,
+    stderr: str,
+) -> str | None:
+    """Which sandbox limit, if any, ended the run.
+
+    The wall timeout equals the CPU limit, so a timed-out run that was busy for nearly
+    all of it counts as a CPU-limit hit rather than a wall-clock one.
+    """
+    if truncated:
+        return "output"
+    if term_signal == signal.SIGXCPU or (term_signal == signal.SIGKILL and cpu_sec >= cpu_limit_sec):
+        return "cpu"
+    if timed_out:
+        return "cpu" if cpu_sec >= 0.9 * cpu_limit_sec else "wall"
+    if "MemoryError" in stderr[-1000:]:
+        return "memory"
+    return None
+
+
+async def wait_for_exit(pid: int) -> tuple[int, object]:
+    """Reap ``pid`` with ``wait4`` without blocking the loop; returns ``(status, rusage)``.
+
+    Waits on a pidfd where the kernel supports it and polls otherwise. asyncio's own
+    child watcher discards the child's rusage, which is why sandbox processes are not
+    spawned through ``asyncio.create_subprocess_exec``.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd: int | None = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    try:
+        while True:
+            waited, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited == pid:
+                return status, rusage
+            if pidfd is None:
+                await asyncio.sleep(0.005)
+                continue
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+from collections.abc import Callable
+
+STREAMS = ("stdout", "stderr")
+
+
+class OutputCapture:
+    """Per-stream output buffers with a hard byte cap.
+
+    Bytes past ``limit_bytes`` on either stream are dropped and ``truncated`` is set so
+    the caller can stop the program. ``on_text`` receives decoded text as it arrives
+    (for live streaming); multi-byte characters split across reads are held back.
+    """
+
+    def __init__(self, limit_bytes: int, on_text: Callable[[str, str], None] | None = None) -> None:
+        self.limit_bytes = limit_bytes
+        self.on_text = on_text
+        self.truncated = False
+        self._chunks: dict[str, list[bytes]] = {name: [] for name in STREAMS}
+        self._sizes = dict.fromkeys(STREAMS, 0)
+        self._decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in STREAMS}
+
+    def feed(self, name: str, data: bytes) -> bool:
+        """Buffer ``data``; returns ``False`` once the stream has hit its cap."""
+        room = self.limit_bytes - self._sizes[name]
+        if len(data) > room:
+            data = data[: max(room, 0)]
+            self.truncated = True
+        if data:
+            self._chunks[name].append(data)
+            self._sizes[name] += len(data)
+            if self.on_text is not None:
+                text = self._decoders[name].decode(data)
+                if text:
+                    self.on_text(name, text)
+        return not self.truncated
+
+    def text(self, name: str) -> str:
+        return b"".join(self._chunks[name]).decode("utf-8", errors="replace")
+
+    async def pump(self, name: str, reader: asyncio.StreamReader, on_overflow: Callable[[], None]) -> None:
+        """Read ``reader`` to EOF, calling ``on_overflow`` (once) when the cap is hit."""
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            if not self.feed(name, data):
+                on_overflow()
+                return
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import ast
+import base64
+import hashlib
+import importlib.util
+import marshal
+import threading
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import CodeType
+
+from app.result_cache import is_deterministic
+
+# Same filename the sandbox uses, so tracebacks read identically on either path.
+SOURCE_FILENAME = "main.py"
+BYTECODE_MAGIC = importlib.util.MAGIC_NUMBER.hex()
+
+
+@dataclass(frozen=True)
+class SyntaxErrorInfo:
+    message: str
+    line: int | None
+    column: int | None
+    end_line: int | None
+    end_column: int | None
+    text: str | None
+    # Exactly what ``python main.py`` prints: location, source line, caret and message.
+    formatted: str
+
+
+@dataclass(frozen=True)
+class CompiledSource:
+    digest: str
+    code: CodeType | None = None
+    imports: frozenset[str] = field(default_factory=frozenset)
+    syntax_error: SyntaxErrorInfo | None = None
+    # Output depends only on source and stdin (see ``app.result_cache``).
+    deterministic: bool = False
+
+    def bytecode_job_fields(self) -> dict[str, str]:
+        """Fields for a warm-worker job so the forked child can skip compiling."""
+        if self.code is None:
+            return {}
+        return {"bytecode": base64.b64encode(marshal.dumps(self.code)).decode("ascii"), "magic": BYTECODE_MAGIC}
+
+
+def source_digest(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def _imported_roots(tree: ast.AST) -> frozenset[str]:
+    roots: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            roots.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            roots.add((node.module or "").split(".")[0])
+    return frozenset(roots)
+
+
+def _syntax_error_info(exc: SyntaxError, source: str) -> SyntaxErrorInfo:
+    if exc.text is None and exc.lineno:
+        # Errors raised while compiling the AST carry no source line; the interpreter
+        # would read it back from main.py, so fill it in the same way.
+        lines = source.splitlines(keepends=True)
+        if exc.lineno <= len(lines):
+            exc.text = lines[exc.lineno - 1]
+    return SyntaxErrorInfo(
+        message=exc.msg,
+        line=exc.lineno,
+        column=exc.offset,
+        end_line=getattr(exc, "end_lineno", None),
+        end_column=getattr(exc, "end_offset", None),
+        text=exc.text.rstrip("\n") if exc.text else None,
+        formatted="".join(traceback.format_exception_only(type(exc), exc)),
+    )
+
+
+def compile_source(source: str, digest: str | None = None) -> CompiledSource:
+    """Parse and compile learner code in-process; syntax errors never reach a sandbox."""
+    digest = digest or source_digest(source)
+    try:
+        tree = ast.parse(source, SOURCE_FILENAME)
+        code = compile(tree, SOURCE_FILENAME, "exec", dont_inherit=True, optimize=0)
+    except SyntaxError as exc:
+        return CompiledSource(digest=digest, syntax_error=_syntax_error_info(exc, source))
+    except (ValueError, RecursionError, MemoryError):
+        # Pathological input (null bytes, absurd nesting): let the sandbox report it.
+        return CompiledSource(digest=digest)
+    return CompiledSource(
+        digest=digest,
+        code=code,
+        imports=_imported_roots(tree),
+        deterministic=is_deterministic(tree),
+    )
+
+
+class CompileCache:
+    """LRU of ``CompiledSource`` keyed by source hash, so re-running unchanged code skips parsing."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CompiledSource] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.syntax_errors = 0
+
+    def get(self, source: str) -> CompiledSource:
+        digest = source_digest(source)
+        with self._lock:
+            cached = self._entries.get(digest)
+            if cached is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+        if cached is None:
+            cached = compile_source(source, digest)
+            with self._lock:
+                self.misses += 1
+                if self.max_entries > 0:
+                    self._entries[digest] = cached
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        if cached.syntax_error is not None:
+            with self._lock:
+                self.syntax_errors += 1
+        return cached
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "syntax_errors": self.syntax_errors,
+            }
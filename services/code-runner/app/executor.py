@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+
+class RunnerSaturated(HTTPException):
+    """Raised instead of queueing when a run could not start within the queue-wait deadline."""
+
+    def __init__(self, retry_after_sec: float) -> None:
+        super().__init__(
+            status_code=429,
+            detail="Code runner is busy. Please try again shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after_sec)))},
+        )
+
+
+def default_concurrency() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+class RunExecutor:
+    """Admission control for sandbox runs on the event loop.
+
+    At most ``max_concurrency`` runs execute at once; up to ``max_queue`` more wait in
+    FIFO order. A run that cannot start within ``max_wait_sec`` (or is estimated not to,
+    from the recent average run time) is rejected with a 429 and ``Retry-After``.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait_sec: float) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_sec = max_wait_sec
+        self._waiters: deque[asyncio.Future] = deque()
+        self._running = 0
+        self._run_time_sec: float | None = None  # EWMA of slot hold time
+        self._busy_sec = 0.0
+        self._started_at = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def _estimated_wait_sec(self) -> float:
+        if self._running < self.max_concurrency or self._run_time_sec is None:
+            return 0.0
+        return (len(self._waiters) + 1) / self.max_concurrency * self._run_time_sec
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._running < self.max_concurrency:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._running += 1
+            waiter.set_result(None)
+
+    async def acquire(self, max_wait_sec: float | None = None) -> float:
+        """Wait for a run slot and return its admission time.
+
+        ``max_wait_sec`` overrides the queue deadline; ``math.inf`` queues without limit
+        (used by ``/run/batch``, which bounds its own concurrency).
+        """
+        deadline = self.max_wait_sec if max_wait_sec is None else max_wait_sec
+        enqueued_at = time.monotonic()
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+        else:
+            estimated_wait = self._estimated_wait_sec()
+            if len(self._waiters) >= self.max_queue or estimated_wait > deadline:
+                self.rejected += 1
+                raise RunnerSaturated(estimated_wait)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=None if math.isinf(deadline) else deadline)
+            except asyncio.TimeoutError:
+                if not waiter.done():
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                    self.timed_out += 1
+                    raise RunnerSaturated(self._run_time_sec or deadline)
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Admitted just as the client went away: hand the slot straight back.
+                    self.release(time.monotonic())
+                else:
+                    waiter.cancel()
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                raise
+
+        now = time.monotonic()
+        wait_ms = (now - enqueued_at) * 1000
+        self.admitted += 1
+        self._total_wait_ms += wait_ms
+        self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        return now
+
+    def release(self, admitted_at: float) -> None:
+        held = time.monotonic() - admitted_at
+        self._busy_sec += held
+        previous = self._run_time_sec
+        self._run_time_sec = held if previous is None else 0.8 * previous + 0.2 * held
+        self._running = max(0, self._running - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, max_wait_sec: float | None = None):
+        admitted_at = await self.acquire(max_wait_sec)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        return {
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self._total_wait_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self._max_wait_ms, 2),
+            "avg_run_ms": round((self._run_time_sec or 0.0) * 1000, 2),
+            "utilization": round(self._busy_sec / (uptime * self.max_concurrency), 4),
+        }
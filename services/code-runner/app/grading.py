@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import secrets
+
+# Runs inside the sandbox. The learner's code executes once in its own
+# namespace, then every case is evaluated against that namespace and a single
+# marker-prefixed JSON report of actual values is printed on the real stdout.
+# Expected values never enter the sandbox: learner code shares the harness's
+# process and can print a report of its own, so the verdict is decided by
+# ``score_report`` outside it.
+HARNESS_TEMPLATE = '''
+import contextlib as _contextlib
+import io as _io
+import json as _json
+import sys as _sys
+import time as _time
+import traceback as _traceback
+
+_MARKER = {marker!r}
+_CODE = {code!r}
+_CASES = _json.loads({cases!r})
+
+
+def _normalize(value):
+    try:
+        return _json.loads(_json.dumps(value))
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def _error_text(exc):
+    return "".join(_traceback.format_exception_only(type(exc), exc)).strip()
+
+
+_namespace = {{"__name__": "__main__"}}
+_program_out = _io.StringIO()
+_setup_error = None
+with _contextlib.redirect_stdout(_program_out):
+    try:
+        exec(compile(_CODE, "main.py", "exec"), _namespace)
+    except SystemExit:
+        pass
+    except BaseException as _exc:
+        _setup_error = _error_text(_exc)
+
+_results = []
+for _index, _case in enumerate(_CASES):
+    _name = _case.get("name") or f"case_{{_index + 1}}"
+    _expression = (_case.get("input") or "").strip()
+    _result = {{"name": _name, "actual": None, "error": None, "time_ms": 0.0}}
+    _started = _time.perf_counter()
+    if _setup_error is not None:
+        _result["error"] = _setup_error
+    elif not _expression:
+        _result["actual"] = _program_out.getvalue().strip()
+    else:
+        try:
+            with _contextlib.redirect_stdout(_io.StringIO()):
+                _result["actual"] = _normalize(eval(_expression, _namespace))
+        except BaseException as _exc:
+            _result["error"] = _error_text(_exc)
+    _result["time_ms"] = round((_time.perf_counter() - _started) * 1000, 3)
+    _results.append(_result)
+
+_sys.__stdout__.write(_MARKER + _json.dumps({{"setup_error": _setup_error, "results": _results}}, default=repr) + "\\n")
+_sys.__stdout__.flush()
+'''
+
+
+def is_gradable(case: dict) -> bool:
+    """Only cases that declare an expected value can be graded; notes are skipped."""
+    return "expected" in case
+
+
+def new_marker() -> str:
+    return f"__pypilot_grade_{secrets.token_hex(8)}__"
+
+
+def build_grading_script(code: str, cases: list[dict], marker: str) -> str:
+    sandbox_cases = [{"name": case.get("name"), "input": case.get("input")} for case in cases]
+    return HARNESS_TEMPLATE.format(marker=marker, code=code, cases=json.dumps(sandbox_cases))
+
+
+def parse_grading_report(stdout: str, marker: str) -> dict | None:
+    """Return the harness report, or ``None`` if the run died before printing it."""
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(marker):
+            try:
+                report = json.loads(line[len(marker):])
+            except ValueError:
+                return None
+            return report if isinstance(report, dict) else None
+    return None
+
+
+def score_report(report: dict, cases: list[dict]) -> list[dict]:
+    """Judge each case's reported actual value against its expected value.
+
+    The report comes from the learner's process, so only its ``actual``/``error``/``time_ms``
+    fields are read, by case position; any ``passed`` it claims is ignored, and a case it
+    does not cover fails.
+    """
+    reported = report.get("results")
+    if not isinstance(reported, list):
+        reported = []
+    results = []
+    for index, case in enumerate(cases):
+        item = reported[index] if index < len(reported) and isinstance(reported[index], dict) else None
+        expected = case.get("expected")
+        actual = item.get("actual") if item else None
+        if item is None:
+            error = "No result was reported for this case."
+        else:
+            error = None if item.get("error") is None else str(item["error"])
+        if error is not None:
+            passed = False
+        elif (case.get("input") or "").strip():
+            passed = actual == expected
+        else:
+            passed = actual == str(expected).strip()
+        try:
+            time_ms = float(item.get("time_ms") or 0.0) if item else 0.0
+        except (TypeError, ValueError):
+            time_ms = 0.0
+        results.append(
+            {
+                "name": case.get("name") or f"case_{index + 1}",
+                "passed": passed,
+                "expected": expected,
+                "actual": actual,
+                "error": error,
+                "time_ms": time_ms,
+            }
+        )
+    return results
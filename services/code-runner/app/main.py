@@ -1,16 +1,33 @@
 ﻿from __future__ import annotations
 
-import ast
+import asyncio
+import json
+import math
 import os
+import platform
 import subprocess
+import sys
 import tempfile
 import time
+from collections.abc import AsyncIterator, Callable
 from pathlib import Path
+from typing import Any
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.accounting import FRESH_BOOTSTRAP, classify_limit, usage_from_rusage, wait_for_exit
+from app.capture import OutputCapture
+from app.compiler import CompileCache, CompiledSource
+from app.executor import RunExecutor, default_concurrency
+from app.grading import build_grading_script, is_gradable, new_marker, parse_grading_report, score_report
+from app.pool import WorkerPool
+from app.result_cache import ResultCache
+from app.worker import OUTPUT_LIMIT_MESSAGE, TIMEOUT_EXIT_CODE, apply_limits
+
 try:
     import resource
 except ImportError:  # pragma: no cover - Windows fallback for local dev.
@@ -22,6 +39,32 @@ class Settings(BaseSettings):
 
     run_timeout_sec: int = 4
     run_memory_mb: int = 128
+    # Per-stream output cap; a program writing more is killed and its response marked truncated.
+    run_max_output_bytes: int = 64 * 1024
+
+    # Warm interpreter pool; 0 disables it and every run spawns a fresh interpreter.
+    warm_pool_size: int = 4
+    warm_pool_max_runs: int = 50
+    warm_pool_acquire_timeout_sec: float = 1.0
+
+    # Concurrent jobs per /run/batch request; kept below the pool size so
+    # bulk re-grades leave warm workers for interactive runs.
+    batch_max_concurrency: int = 2
+
+    # Admission control: at most run_max_concurrency sandbox runs at once (0 = CPU count),
+    # up to run_max_queue waiting, each for at most run_queue_max_wait_sec before a 429.
+    # Keep wait + run_timeout_sec under the API's code_runner_timeout_sec.
+    run_max_concurrency: int = 0
+    run_max_queue: int = 64
+    run_queue_max_wait_sec: float = 3.0
+
+    # Compiled learner code by source hash; syntax errors are answered from here without a sandbox.
+    compile_cache_size: int = 512
+
+    # Results of deterministic /run programs, keyed by code, stdin, runtime and limits (0 disables).
+    result_cache_size: int = 2048
+    result_cache_ttl_sec: float = 900.0
+    result_cache_max_entry_bytes: int = 64 * 1024
 
 
 settings = Settings()
@@ -43,79 +86,550 @@ class CodeRunRequest(BaseModel):
     stdin: str | None = Field(default="", max_length=4000)
 
 
+class SyntaxErrorDetail(BaseModel):
+    message: str
+    line: int | None = None
+    column: int | None = None
+    end_line: int | None = None
+    end_column: int | None = None
+    text: str | None = None
+
+
+class RunUsage(BaseModel):
+    cpu_user_ms: float
+    cpu_system_ms: float
+    # Peak resident set of the run's process; warm-pool runs include the preloaded worker image.
+    peak_rss_kb: int
+    # Process creation and setup before the learner's first line, then the learner's code itself.
+    startup_ms: float | None = None
+    user_code_ms: float | None = None
+    limit_hit: str | None = None  # cpu | memory | wall | output
+
+
 class CodeRunResponse(BaseModel):
     stdout: str
     stderr: str
     exit_code: int
     execution_time_ms: int
+    # Set when the code failed to compile; such runs never reach a sandbox.
+    syntax_error: SyntaxErrorDetail | None = None
+    # Served from the result cache of an identical earlier run.
+    cached: bool = False
+    # Output hit run_max_output_bytes and the program was stopped.
+    truncated: bool = False
+    # Resource accounting for the sandbox run; absent for syntax errors and cached results.
+    usage: RunUsage | None = None
+
+
+class GradeRequest(BaseModel):
+    code: str = Field(min_length=1, max_length=20000)
+    # Raw ``tests_json`` entries; cases without an ``expected`` key are skipped.
+    cases: list[dict[str, Any]] = Field(default_factory=list, max_length=200)
+
+
+class GradeCaseResult(BaseModel):
+    name: str
+    passed: bool
+    expected: Any = None
+    actual: Any = None
+    error: str | None = None
+    time_ms: float
+
+
+class GradeResponse(BaseModel):
+    verdict: str  # passed | failed | error
+    passed_count: int
+    total_count: int
+    cases: list[GradeCaseResult]
+    stderr: str
+    exit_code: int
+    execution_time_ms: int
+    usage: RunUsage | None = None
+
+
+class BatchJob(BaseModel):
+    id: str = Field(min_length=1, max_length=64)
+    code: str = Field(min_length=1, max_length=20000)
+    stdin: str | None = Field(default="", max_length=4000)
+    # When present the job is graded like ``/grade`` instead of run like ``/run``.
+    cases: list[dict[str, Any]] | None = Field(default=None, max_length=200)
+
+
+class BatchRunRequest(BaseModel):
+    jobs: list[BatchJob] = Field(min_length=1, max_length=1000)
 
 
 app = FastAPI(title="PyPilot Code Runner", version="1.0.0")
 
+worker_pool: WorkerPool | None = None
+if settings.warm_pool_size > 0 and resource is not None and hasattr(os, "fork"):
+    worker_pool = WorkerPool(
+        size=settings.warm_pool_size,
+        max_runs=settings.warm_pool_max_runs,
+        acquire_timeout_sec=settings.warm_pool_acquire_timeout_sec,
+    )
 
-def validate_code_safety(code: str) -> None:
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
-        return
-
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                root_module = alias.name.split(".")[0]
-                if root_module in BLOCKED_IMPORTS:
-                    raise HTTPException(status_code=400, detail=f"Import '{root_module}' is blocked")
-        if isinstance(node, ast.ImportFrom):
-            module_name = (node.module or "").split(".")[0]
-            if module_name in BLOCKED_IMPORTS:
-                raise HTTPException(status_code=400, detail=f"Import '{module_name}' is blocked")
+
+run_executor = RunExecutor(
+    max_concurrency=settings.run_max_concurrency or default_concurrency(),
+    max_queue=settings.run_max_queue,
+    max_wait_sec=settings.run_queue_max_wait_sec,
+)
+compile_cache = CompileCache(max_entries=settings.compile_cache_size)
+result_cache = ResultCache(
+    max_entries=settings.result_cache_size,
+    ttl_sec=settings.result_cache_ttl_sec,
+    max_entry_bytes=settings.result_cache_max_entry_bytes,
+    runtime=f"{platform.python_implementation()}-{sys.version}",
+)
+
+
+def validate_code_safety(code: str) -> CompiledSource:
+    compiled = compile_cache.get(code)
+    blocked = sorted(compiled.imports & BLOCKED_IMPORTS)
+    if blocked:
+        raise HTTPException(status_code=400, detail=f"Import '{blocked[0]}' is blocked")
+    return compiled
+
+
+def syntax_error_response(compiled: CompiledSource) -> CodeRunResponse:
+    """What ``python main.py`` would have printed, answered without spawning an interpreter."""
+    error = compiled.syntax_error
+    assert error is not None
+    return CodeRunResponse(
+        stdout="",
+        stderr=error.formatted,
+        exit_code=1,
+        execution_time_ms=0,
+        syntax_error=SyntaxErrorDetail(
+            message=error.message,
+            line=error.line,
+            column=error.column,
+            end_line=error.end_line,
+            end_column=error.end_column,
+            text=error.text,
+        ),
+    )
+
+
+def run_usage(
+    usage: dict | None, *, timed_out: bool, truncated: bool, term_signal: int | None, stderr: str
+) -> RunUsage | None:
+    if usage is None:
+        return None
+    limit_hit = classify_limit(
+        timed_out=timed_out,
+        truncated=truncated,
+        term_signal=term_signal,
+        cpu_sec=(usage["cpu_user_ms"] + usage["cpu_system_ms"]) / 1000,
+        cpu_limit_sec=settings.run_timeout_sec,
+        stderr=stderr,
+    )
+    return RunUsage(**usage, limit_hit=limit_hit)
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    if worker_pool is not None:
+        worker_pool.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    if worker_pool is not None:
+        worker_pool.shutdown()
 
 
 @app.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
+def health() -> dict[str, Any]:
+    return {
+        "status": "ok",
+        "executor": run_executor.stats(),
+        "warm_pool_idle": worker_pool.idle_count if worker_pool is not None else 0,
+        "compile_cache": compile_cache.stats(),
+        "result_cache": result_cache.stats(),
+    }
 
 
-@app.post("/run", response_model=CodeRunResponse)
-def run_code(payload: CodeRunRequest) -> CodeRunResponse:
-    validate_code_safety(payload.code)
+async def run_in_fresh_interpreter(
+    code: str, stdin: str, on_text: Callable[[str, str], None] | None = None
+) -> CodeRunResponse:
+    """Run ``code`` in a new interpreter, reading its output incrementally up to the byte cap.
 
+    ``on_text(stream, text)`` is called as output arrives, for live streaming. The child
+    is reaped with ``wait4`` for its resource usage, and a marker written by the bootstrap
+    just before the learner's code starts splits interpreter start-up from user-code time.
+    """
+    loop = asyncio.get_running_loop()
     with tempfile.TemporaryDirectory(prefix="runner-") as tmp_dir:
         script_path = Path(tmp_dir) / "main.py"
-        script_path.write_text(payload.code, encoding="utf-8")
+        script_path.write_text(code, encoding="utf-8")
 
         def limit_resources() -> None:
-            if resource is None:
-                return
-            memory_bytes = settings.run_memory_mb * 1024 * 1024
-            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
-            resource.setrlimit(resource.RLIMIT_CPU, (settings.run_timeout_sec, settings.run_timeout_sec + 1))
+            apply_limits(settings.run_memory_mb, settings.run_timeout_sec)
 
+        marker_r, marker_w = os.pipe()
         start = time.perf_counter()
         try:
-            completed = subprocess.run(
-                ["python", "-I", str(script_path)],
-                input=payload.stdin or "",
-                capture_output=True,
-                text=True,
-                timeout=settings.run_timeout_sec,
+            process = subprocess.Popen(
+                ["python", "-I", "-c", FRESH_BOOTSTRAP, str(marker_w), str(script_path)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 cwd=tmp_dir,
                 env={"PYTHONIOENCODING": "utf-8", "PATH": os.environ.get("PATH", "")},
+                pass_fds=(marker_w,),
                 preexec_fn=limit_resources if resource is not None else None,
             )
-        except subprocess.TimeoutExpired:
-            elapsed_ms = int((time.perf_counter() - start) * 1000)
+        except BaseException:
+            os.close(marker_r)
+            raise
+        finally:
+            os.close(marker_w)
+
+        started_at: float | None = None
+
+        def on_marker() -> None:
+            nonlocal started_at
+            if os.read(marker_r, 1) and started_at is None:
+                started_at = time.perf_counter()
+            loop.remove_reader(marker_r)
+
+        def stop() -> None:
+            if process.returncode is None:
+                process.kill()
+
+        exit_status: tuple[int, Any] | None = None
+
+        async def reap() -> None:
+            nonlocal exit_status
+            exit_status = await wait_for_exit(process.pid)
+            process.returncode = os.waitstatus_to_exitcode(exit_status[0])
+
+        loop.add_reader(marker_r, on_marker)
+        capture = OutputCapture(settings.run_max_output_bytes, on_text)
+        readers: dict[str, asyncio.StreamReader] = {}
+        transports: list[asyncio.BaseTransport] = []
+        timed_out = False
+        try:
+            for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+                readers[name] = asyncio.StreamReader()
+                transport, _ = await loop.connect_read_pipe(
+                    lambda reader=readers[name]: asyncio.StreamReaderProtocol(reader), pipe
+                )
+                transports.append(transport)
+
+            # stdin is capped at 4000 bytes, well inside the pipe buffer, so this never blocks.
+            assert process.stdin is not None
+            try:
+                process.stdin.write(stdin.encode("utf-8"))
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+            await asyncio.wait_for(
+                asyncio.gather(
+                    capture.pump("stdout", readers["stdout"], stop),
+                    capture.pump("stderr", readers["stderr"], stop),
+                    reap(),
+                ),
+                timeout=settings.run_timeout_sec,
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            if exit_status is None:
+                stop()
+                await reap()
+            for transport in transports:
+                transport.close()
+            loop.remove_reader(marker_r)
+            os.close(marker_r)
+
+        exited_at = time.perf_counter()
+        elapsed_ms = int((exited_at - start) * 1000)
+        status, rusage = exit_status
+        usage = usage_from_rusage(
+            rusage,
+            startup_sec=(started_at or exited_at) - start,
+            user_code_sec=exited_at - started_at if started_at is not None else None,
+        )
+        term_signal = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+        if timed_out:
             return CodeRunResponse(
                 stdout="",
                 stderr="Execution timed out.",
-                exit_code=124,
+                exit_code=TIMEOUT_EXIT_CODE,
                 execution_time_ms=elapsed_ms,
+                usage=run_usage(usage, timed_out=True, truncated=False, term_signal=term_signal, stderr=""),
             )
 
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        stderr = capture.text("stderr")
+        if capture.truncated:
+            stderr += "\n" + OUTPUT_LIMIT_MESSAGE.format(limit=settings.run_max_output_bytes)
         return CodeRunResponse(
-            stdout=completed.stdout,
-            stderr=completed.stderr,
-            exit_code=completed.returncode,
+            stdout=capture.text("stdout"),
+            stderr=stderr,
+            exit_code=process.returncode,
             execution_time_ms=elapsed_ms,
+            truncated=capture.truncated,
+            usage=run_usage(
+                usage, timed_out=False, truncated=capture.truncated, term_signal=term_signal, stderr=stderr
+            ),
+        )
+
+
+async def run_on_warm_worker(code: str, stdin: str, bytecode: dict | None) -> dict | None:
+    """Run a job on the (blocking) warm pool from a thread.
+
+    A cancelled caller still waits for the worker to answer, so its run slot is not
+    handed to another job while the worker is busy.
+    """
+    assert worker_pool is not None
+    job = asyncio.ensure_future(
+        asyncio.to_thread(
+            worker_pool.run,
+            code,
+            stdin,
+            timeout_sec=settings.run_timeout_sec,
+            memory_mb=settings.run_memory_mb,
+            max_output_bytes=settings.run_max_output_bytes,
+            bytecode=bytecode,
+        )
+    )
+    try:
+        return await asyncio.shield(job)
+    except asyncio.CancelledError:
+        await asyncio.wait({job})
+        raise
+
+
+async def execute(
+    code: str,
+    stdin: str,
+    compiled: CompiledSource | None = None,
+    max_wait_sec: float | None = None,
+) -> CodeRunResponse:
+    async with run_executor.slot(max_wait_sec):
+        if worker_pool is not None:
+            start = time.perf_counter()
+            result = await run_on_warm_worker(
+                code, stdin, compiled.bytecode_job_fields() if compiled is not None else None
+            )
+            if result is not None:
+                return CodeRunResponse(
+                    stdout=result["stdout"],
+                    stderr=result["stderr"],
+                    exit_code=result["exit_code"],
+                    execution_time_ms=int((time.perf_counter() - start) * 1000),
+                    truncated=result.get("truncated", False),
+                    usage=run_usage(
+                        result.get("usage"),
+                        timed_out=result.get("timed_out", False),
+                        truncated=result.get("truncated", False),
+                        term_signal=result.get("signal"),
+                        stderr=result["stderr"],
+                    ),
+                )
+
+        # No warm worker took the job (disabled, unsupported platform, or saturated).
+        return await run_in_fresh_interpreter(code, stdin)
+
+
+async def run_program(
+    code: str, stdin: str, compiled: CompiledSource, max_wait_sec: float | None = None
+) -> CodeRunResponse:
+    """Run validated code, answering syntax errors and repeat deterministic runs without a sandbox."""
+    if compiled.syntax_error is not None:
+        return syntax_error_response(compiled)
+    if not compiled.deterministic:
+        result_cache.skip_nondeterministic()
+        return await execute(code, stdin, compiled, max_wait_sec)
+
+    key = result_cache.key(
+        compiled.digest,
+        stdin,
+        {"timeout_sec": settings.run_timeout_sec, "memory_mb": settings.run_memory_mb},
+    )
+    cached = result_cache.get(key)
+    if cached is not None:
+        return CodeRunResponse(**cached, cached=True)
+    response = await execute(code, stdin, compiled, max_wait_sec)
+    if not response.truncated:
+        result_cache.store(key, response.model_dump(exclude={"cached", "syntax_error", "truncated", "usage"}))
+    return response
+
+
+@app.post("/run", response_model=CodeRunResponse)
+async def run_code(payload: CodeRunRequest) -> CodeRunResponse:
+    compiled = validate_code_safety(payload.code)
+    return await run_program(payload.code, payload.stdin or "", compiled)
+
+
+@app.post("/run/stream")
+async def run_code_streaming(payload: CodeRunRequest) -> StreamingResponse:
+    """Run code and stream its output live as NDJSON.
+
+    Lines are ``{"type": "stdout" | "stderr", "data": ...}`` as output arrives, then one
+    ``{"type": "result", ...}`` line shaped like ``/run``. Streamed runs always use a fresh
+    interpreter, since warm workers only report once the program has finished.
+    """
+    compiled = validate_code_safety(payload.code)
+    if compiled.syntax_error is not None:
+        line = json.dumps({"type": "result", **syntax_error_response(compiled).model_dump()}) + "\n"
+        return StreamingResponse(iter([line]), media_type="application/x-ndjson")
+
+    # Admit before the response starts so a saturated runner still answers with a real 429.
+    admitted_at = await run_executor.acquire()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            run_executor.release(admitted_at)
+
+    async def events() -> AsyncIterator[str]:
+        queue: asyncio.Queue[dict | None] = asyncio.Queue()
+
+        async def run() -> None:
+            try:
+                result = await run_in_fresh_interpreter(
+                    payload.code,
+                    payload.stdin or "",
+                    on_text=lambda stream, text: queue.put_nowait({"type": stream, "data": text}),
+                )
+                queue.put_nowait({"type": "result", **result.model_dump()})
+            finally:
+                release()
+                queue.put_nowait(None)
+
+        task = asyncio.ensure_future(run())
+        try:
+            while (event := await queue.get()) is not None:
+                yield json.dumps(event) + "\n"
+        finally:
+            # Client went away: kill the program rather than let it run to the timeout.
+            task.cancel()
+
+    # The background task only matters if the stream never started; release() is idempotent.
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+
+@app.post("/grade", response_model=GradeResponse)
+async def grade_code(payload: GradeRequest) -> GradeResponse:
+    compiled = validate_code_safety(payload.code)
+    return await grade(payload.code, payload.cases, compiled)
+
+
+def syntax_error_grade(compiled: CompiledSource, cases: list[dict[str, Any]]) -> GradeResponse:
+    """The report the grading harness gives code that does not compile, without running it."""
+    assert compiled.syntax_error is not None
+    error = compiled.syntax_error.formatted.strip()
+    results = [
+        GradeCaseResult(
+            name=case.get("name") or f"case_{index + 1}",
+            passed=False,
+            expected=case.get("expected"),
+            error=error,
+            time_ms=0.0,
+        )
+        for index, case in enumerate(cases)
+    ]
+    return GradeResponse(
+        verdict="error",
+        passed_count=0,
+        total_count=len(results),
+        cases=results,
+        stderr=error,
+        exit_code=0,
+        execution_time_ms=0,
+    )
+
+
+async def grade(
+    code: str,
+    raw_cases: list[dict[str, Any]],
+    compiled: CompiledSource | None = None,
+    max_wait_sec: float | None = None,
+) -> GradeResponse:
+    cases = [case for case in raw_cases if is_gradable(case)]
+    compiled = compiled or compile_cache.get(code)
+    if compiled.syntax_error is not None:
+        return syntax_error_grade(compiled, cases)
+    marker = new_marker()
+    run = await execute(build_grading_script(code, cases, marker), "", max_wait_sec=max_wait_sec)
+    report = parse_grading_report(run.stdout, marker)
+
+    if report is None:
+        return GradeResponse(
+            verdict="error",
+            passed_count=0,
+            total_count=len(cases),
+            cases=[],
+            stderr=run.stderr,
+            exit_code=run.exit_code,
+            execution_time_ms=run.execution_time_ms,
+            usage=run.usage,
         )
+
+    results = [GradeCaseResult(**item) for item in score_report(report, cases)]
+    passed_count = sum(1 for item in results if item.passed)
+    setup_error = str(report["setup_error"]) if report.get("setup_error") else None
+    if setup_error:
+        verdict = "error"
+    elif passed_count == len(results):
+        verdict = "passed"
+    else:
+        verdict = "failed"
+    return GradeResponse(
+        verdict=verdict,
+        passed_count=passed_count,
+        total_count=len(results),
+        cases=results,
+        stderr=setup_error or run.stderr,
+        exit_code=run.exit_code,
+        execution_time_ms=run.execution_time_ms,
+        usage=run.usage,
+    )
+
+
+async def run_batch_job(job: BatchJob) -> dict[str, Any]:
+    try:
+        compiled = validate_code_safety(job.code)
+    except HTTPException as exc:
+        return {"id": job.id, "status_code": exc.status_code, "error": exc.detail}
+
+    # Batch jobs queue without a deadline; the per-request concurrency bound keeps them polite.
+    # The stream has already started, so a full queue (429) is reported on the job's own line.
+    try:
+        if job.cases is not None:
+            result = await grade(job.code, job.cases, compiled, max_wait_sec=math.inf)
+            return {"id": job.id, "kind": "grade", "result": result.model_dump()}
+        result = await run_program(job.code, job.stdin or "", compiled, max_wait_sec=math.inf)
+        return {"id": job.id, "kind": "run", "result": result.model_dump()}
+    except HTTPException as exc:
+        return {"id": job.id, "status_code": exc.status_code, "error": exc.detail}
+
+
+@app.post("/run/batch")
+async def run_batch(payload: BatchRunRequest) -> StreamingResponse:
+    """Run many jobs at bounded concurrency, streaming one NDJSON line per finished job."""
+
+    async def results() -> AsyncIterator[str]:
+        limit = asyncio.Semaphore(settings.batch_max_concurrency)
+
+        async def bounded(job: BatchJob) -> dict[str, Any]:
+            async with limit:
+                return await run_batch_job(job)
+
+        tasks = [asyncio.ensure_future(bounded(job)) for job in payload.jobs]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Stop queued jobs if the client goes away mid-stream.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import select
+import subprocess
+import threading
+from pathlib import Path
+
+WORKER_SCRIPT = Path(__file__).with_name("worker.py")
+WORKER_CRASHED_MESSAGE = "The code runner worker crashed while running this program; it was not re-run."
+
+
+class WorkerError(RuntimeError):
+    """Raised when a warm worker stops answering and has to be discarded."""
+
+
+class WorkerCrashedError(WorkerError):
+    """Raised when a worker fails after taking a job, so the program may already have run."""
+
+
+class WarmWorker:
+    """A pre-imported interpreter that forks a sandboxed child per job."""
+
+    def __init__(self, spawn_timeout_sec: float = 10.0) -> None:
+        self.runs = 0
+        self.process = subprocess.Popen(
+            ["python", "-I", str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            env={"PYTHONIOENCODING": "utf-8", "PATH": os.environ.get("PATH", "")},
+        )
+        try:
+            self._read_line(spawn_timeout_sec)
+        except WorkerError:
+            self.close()
+            raise
+
+    def _read_line(self, timeout_sec: float) -> dict:
+        assert self.process.stdout is not None
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout_sec)
+        if not ready:
+            raise WorkerError("Worker did not respond in time")
+        line = self.process.stdout.readline()
+        if not line:
+            raise WorkerError("Worker exited unexpectedly")
+        return json.loads(line)
+
+    def run(
+        self,
+        code: str,
+        stdin: str,
+        timeout_sec: int,
+        memory_mb: int,
+        max_output_bytes: int,
+        bytecode: dict | None = None,
+    ) -> dict:
+        assert self.process.stdin is not None
+        job = {
+            "code": code,
+            "stdin": stdin,
+            "timeout_sec": timeout_sec,
+            "memory_mb": memory_mb,
+            "max_output_bytes": max_output_bytes,
+            **(bytecode or {}),
+        }
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise WorkerError("Worker exited unexpectedly") from exc
+        self.runs += 1
+        try:
+            # The worker enforces the run timeout itself; the slack covers fork and cleanup.
+            return self._read_line(timeout_sec + 2)
+        except WorkerError as exc:
+            raise WorkerCrashedError(str(exc)) from exc
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+
+class WorkerPool:
+    """Fixed-size pool of warm workers, recycled after ``max_runs`` jobs or any violation."""
+
+    def __init__(self, size: int, max_runs: int, acquire_timeout_sec: float) -> None:
+        self.size = size
+        self.max_runs = max_runs
+        self.acquire_timeout_sec = acquire_timeout_sec
+        self._idle: queue.Queue[WarmWorker] = queue.Queue()
+        self._closed = False
+
+    def start(self) -> None:
+        self._closed = False
+        for _ in range(self.size):
+            self._spawn()
+
+    def _spawn(self) -> None:
+        if self._closed:
+            return
+        try:
+            worker = WarmWorker()
+        except (OSError, WorkerError):
+            return
+        if self._closed:
+            worker.close()
+            return
+        self._idle.put(worker)
+
+    def _recycle(self, worker: WarmWorker) -> None:
+        worker.close()
+        # Respawn off the request path so the caller never pays interpreter startup.
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def run(
+        self,
+        code: str,
+        stdin: str,
+        timeout_sec: int,
+        memory_mb: int,
+        max_output_bytes: int,
+        bytecode: dict | None = None,
+    ) -> dict | None:
+        """Run a job on a warm worker, or return ``None`` if it never reached one.
+
+        ``None`` (no worker free in time, or the job could not be handed over) is safe to retry
+        elsewhere. A worker that dies after taking the job yields a failed result instead,
+        since running the program again could repeat its side effects.
+        ``bytecode`` carries the API process's marshalled code object (see ``app.compiler``).
+        """
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout_sec)
+        except queue.Empty:
+            return None
+
+        try:
+            result = worker.run(code, stdin, timeout_sec, memory_mb, max_output_bytes, bytecode)
+        except WorkerCrashedError:
+            self._recycle(worker)
+            return {"stdout": "", "stderr": WORKER_CRASHED_MESSAGE, "exit_code": 1, "violation": True}
+        except WorkerError:
+            self._recycle(worker)
+            return None
+
+        if self._closed:
+            worker.close()
+        elif result.get("violation") or worker.runs >= self.max_runs:
+            self._recycle(worker)
+        else:
+            self._idle.put(worker)
+        return result
+
+    def shutdown(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.close()
+
+    @property
+    def idle_count(self) -> int:
+        return self._idle.qsize()
+
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Modules whose behaviour depends only on the program's own inputs.
+PURE_MODULES = {
+    "abc",
+    "bisect",
+    "collections",
+    "copy",
+    "dataclasses",
+    "decimal",
+    "enum",
+    "fractions",
+    "functools",
+    "heapq",
+    "itertools",
+    "json",
+    "math",
+    "operator",
+    "re",
+    "statistics",
+    "string",
+    "textwrap",
+    "typing",
+}
+
+# Builtins that read the clock, identity, hash seed or environment, or run code the
+# analysis cannot see. ``set``/``frozenset`` iterate strings in hash-seed order.
+IMPURE_NAMES = {
+    "__import__",
+    "breakpoint",
+    "compile",
+    "eval",
+    "exec",
+    "frozenset",
+    "globals",
+    "hash",
+    "id",
+    "locals",
+    "open",
+    "set",
+    "vars",
+}
+
+# Default reprs embed memory addresses, which differ on every run.
+ADDRESS_MARKER = " at 0x"
+
+
+def is_deterministic(tree: ast.AST) -> bool:
+    """Conservatively decide whether a program's output depends only on its code and stdin."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] not in PURE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] not in PURE_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in IMPURE_NAMES:
+            return False
+        elif isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            return False
+        elif isinstance(node, (ast.Set, ast.SetComp)):
+            return False
+    return True
+
+
+@dataclass
+class _Entry:
+    result: dict
+    expires_at: float
+    size: int
+
+
+class ResultCache:
+    """Bounded, TTL'd cache of run results for deterministic programs.
+
+    Keys hash the source, stdin, runtime and run limits, so the same program under
+    different limits or a different interpreter never shares an entry.
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float, max_entry_bytes: int, runtime: str) -> None:
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.max_entry_bytes = max_entry_bytes
+        self.runtime = runtime
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.uncacheable = 0
+        self.nondeterministic = 0
+
+    def key(self, source_digest: str, stdin: str, limits: dict) -> str:
+        payload = json.dumps([source_digest, stdin, self.runtime, limits], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry.result)
+
+    def store(self, key: str, result: dict) -> bool:
+        """Cache ``result`` unless it is too large or shows signs of nondeterminism."""
+        size = len(result["stdout"]) + len(result["stderr"])
+        if (
+            self.max_entries <= 0
+            or size > self.max_entry_bytes
+            or result["exit_code"] not in (0, 1)
+            or ADDRESS_MARKER in result["stdout"]
+            or ADDRESS_MARKER in result["stderr"]
+        ):
+            with self._lock:
+                self.uncacheable += 1
+            return False
+        with self._lock:
+            self._entries[key] = _Entry(result=dict(result), expires_at=time.monotonic() + self.ttl_sec, size=size)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stores += 1
+        return True
+
+    def skip_nondeterministic(self) -> None:
+        with self._lock:
+            self.nondeterministic += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "uncacheable": self.uncacheable,
+                "nondeterministic": self.nondeterministic,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,261 @@
+"""Warm interpreter worker for the code runner pool.
+
+This module is launched as a standalone ``python -I`` process and must not
+import anything from the ``app`` package. It pre-imports the modules learners
+commonly use, then serves one JSON job per stdin line: each job runs in a
+freshly forked child with a clean ``__main__`` namespace and the run rlimits
+applied, and exactly one JSON result line is written back to stdout.
+"""
+
+from __future__ import annotations
+
+import base64
+import builtins
+import importlib.util
+import json
+import marshal
+import os
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+import types
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows fallback for local dev.
+    resource = None
+
+PRELOADED_MODULES = (
+    "collections",
+    "datetime",
+    "decimal",
+    "fractions",
+    "functools",
+    "itertools",
+    "math",
+    "random",
+    "re",
+    "statistics",
+    "string",
+    "typing",
+)
+
+TIMEOUT_EXIT_CODE = 124
+OUTPUT_LIMIT_MESSAGE = "Output limit exceeded ({limit} bytes per stream); program stopped."
+
+
+def apply_limits(memory_mb: int, cpu_sec: int) -> None:
+    if resource is None:
+        return
+    memory_bytes = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_sec, cpu_sec + 1))
+
+
+def _system_exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _load_program(job: dict) -> str | types.CodeType:
+    """The API's precompiled code object when it was built for this interpreter, else the source."""
+    if job.get("bytecode") and job.get("magic") == importlib.util.MAGIC_NUMBER.hex():
+        try:
+            return marshal.loads(base64.b64decode(job["bytecode"]))
+        except (ValueError, EOFError, TypeError):
+            pass
+    return job["code"]
+
+
+def _usage(rusage, startup_sec: float | None, user_code_sec: float | None) -> dict:
+    # Mirrors ``app.accounting.usage_from_rusage``; this module cannot import ``app``.
+    return {
+        "cpu_user_ms": round(rusage.ru_utime * 1000, 1),
+        "cpu_system_ms": round(rusage.ru_stime * 1000, 1),
+        "peak_rss_kb": int(rusage.ru_maxrss),
+        "startup_ms": round(startup_sec * 1000, 1) if startup_sec is not None else None,
+        "user_code_ms": round(user_code_sec * 1000, 1) if user_code_sec is not None else None,
+    }
+
+
+def _exec_in_child(
+    program: str | types.CodeType,
+    workdir: str,
+    fds: tuple[int, int, int],
+    marker_fd: int,
+    memory_mb: int,
+    cpu_sec: int,
+) -> None:
+    # Own process group so a timeout can also reap anything the program forked.
+    os.setpgid(0, 0)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(workdir)
+    apply_limits(memory_mb, cpu_sec)
+
+    sys.stdin = open(0, encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", closefd=False)
+    sys.argv = ["main.py"]
+
+    namespace = {"__name__": "__main__", "__file__": "main.py", "__builtins__": builtins}
+    exit_code = 0
+    try:
+        if isinstance(program, str):
+            program = compile(program, "main.py", "exec", dont_inherit=True)
+        # Tell the parent setup is done, so it can split start-up from user-code time.
+        os.write(marker_fd, b".")
+        os.close(marker_fd)
+        exec(program, namespace)
+    except SystemExit as exc:
+        exit_code = _system_exit_code(exc)
+    except BaseException as exc:
+        # Drop this module's frame so the traceback matches ``python main.py``.
+        tb = exc.__traceback__.tb_next if exc.__traceback__ else None
+        traceback.print_exception(type(exc), exc, tb)
+        exit_code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    os._exit(exit_code)
+
+
+def run_job(job: dict) -> dict:
+    timeout_sec = job["timeout_sec"]
+    program = _load_program(job)
+    workdir = tempfile.mkdtemp(prefix="runner-")
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    marker_r, marker_w = os.pipe()
+
+    sys.stdout.flush()
+    forked_at = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(stdin_w)
+            os.close(stdout_r)
+            os.close(stderr_r)
+            os.close(marker_r)
+            _exec_in_child(
+                program, workdir, (stdin_r, stdout_w, stderr_w), marker_w, job["memory_mb"], timeout_sec
+            )
+        finally:
+            os._exit(70)
+
+    os.close(stdin_r)
+    os.close(stdout_w)
+    os.close(stderr_w)
+    os.close(marker_w)
+    try:
+        os.write(stdin_w, (job.get("stdin") or "").encode("utf-8"))
+    except BrokenPipeError:
+        pass
+    os.close(stdin_w)
+
+    max_output_bytes = job["max_output_bytes"]
+    chunks: dict[int, list[bytes]] = {stdout_r: [], stderr_r: []}
+    sizes = {stdout_r: 0, stderr_r: 0}
+    open_fds = [stdout_r, stderr_r, marker_r]
+    deadline = time.monotonic() + timeout_sec
+    started_at: float | None = None
+    timed_out = truncated = False
+    while open_fds and not truncated:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(open_fds, [], [], remaining)
+        # Marker first, so start-up is timed even if this batch of output truncates the run.
+        for fd in sorted(ready, key=lambda fd: fd != marker_r):
+            data = os.read(fd, 65536)
+            if fd == marker_r:
+                if data and started_at is None:
+                    started_at = time.perf_counter()
+                else:
+                    open_fds.remove(fd)
+                continue
+            if not data:
+                open_fds.remove(fd)
+                continue
+            room = max_output_bytes - sizes[fd]
+            if len(data) > room:
+                # Stop the program as soon as either stream passes the cap.
+                data = data[:room]
+                truncated = True
+            chunks[fd].append(data)
+            sizes[fd] += len(data)
+            if truncated:
+                break
+
+    if timed_out or truncated:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    for fd in (stdout_r, stderr_r, marker_r):
+        os.close(fd)
+    _, status, rusage = os.wait4(pid, 0)
+    exited_at = time.perf_counter()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    signaled = os.WIFSIGNALED(status)
+    usage = _usage(
+        rusage,
+        startup_sec=(started_at or exited_at) - forked_at,
+        user_code_sec=exited_at - started_at if started_at is not None else None,
+    )
+    if timed_out:
+        return {
+            "stdout": "",
+            "stderr": "Execution timed out.",
+            "exit_code": TIMEOUT_EXIT_CODE,
+            "timed_out": True,
+            "usage": usage,
+            "violation": True,
+        }
+
+    stderr = b"".join(chunks[stderr_r]).decode("utf-8", errors="replace")
+    if truncated:
+        stderr += "\n" + OUTPUT_LIMIT_MESSAGE.format(limit=max_output_bytes)
+    return {
+        "stdout": b"".join(chunks[stdout_r]).decode("utf-8", errors="replace"),
+        "stderr": stderr,
+        "exit_code": -os.WTERMSIG(status) if signaled else os.WEXITSTATUS(status),
+        "truncated": truncated,
+        "signal": os.WTERMSIG(status) if signaled else None,
+        "usage": usage,
+        # Our own kill on overflow says nothing about the worker's health.
+        "violation": signaled and not truncated,
+    }
+
+
+def main() -> None:
+    for name in PRELOADED_MODULES:
+        __import__(name)
+
+    sys.stdout.write(json.dumps({"ready": True}) + "\n")
+    sys.stdout.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = run_job(json.loads(line))
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
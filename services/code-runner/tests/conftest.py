@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.compiler import CompileCache
+from app.executor import RunExecutor
+from app.pool import WorkerPool
+from app.result_cache import ResultCache
+
+
+@pytest.fixture()
+def client(monkeypatch) -> TestClient:
+    # Fresh-interpreter runs with empty caches; tests that need the warm pool install their own.
+    monkeypatch.setattr(main, "worker_pool", None)
+    monkeypatch.setattr(main, "compile_cache", CompileCache(max_entries=64))
+    monkeypatch.setattr(
+        main,
+        "result_cache",
+        ResultCache(max_entries=64, ttl_sec=60.0, max_entry_bytes=64 * 1024, runtime="test"),
+    )
+    monkeypatch.setattr(main, "run_executor", RunExecutor(max_concurrency=2, max_queue=4, max_wait_sec=3.0))
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture()
+def warm_client(client: TestClient, monkeypatch) -> TestClient:
+    """``client`` backed by a single warm worker that is recycled after two jobs."""
+    pool = WorkerPool(size=1, max_runs=2, acquire_timeout_sec=10.0)
+    pool.start()
+    assert pool.idle_count == 1
+    monkeypatch.setattr(main, "worker_pool", pool)
+    try:
+        yield client
+    finally:
+        pool.shutdown()
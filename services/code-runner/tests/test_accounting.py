@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+RUNNERS = ["client", "warm_client"]
+
+
+@pytest.fixture(autouse=True)
+def short_limits(monkeypatch):
+    monkeypatch.setattr(main.settings, "run_timeout_sec", 1)
+    monkeypatch.setattr(main.settings, "run_max_output_bytes", 2000)
+
+
+def _usage(client: TestClient, code: str) -> tuple[dict, dict]:
+    response = client.post("/run", json={"code": code})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["usage"] is not None, payload
+    return payload, payload["usage"]
+
+
+@pytest.mark.parametrize("runner", RUNNERS)
+def test_clean_run_reports_usage_without_a_limit(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload, usage = _usage(client, "import os\ntotal = sum(range(200_000))\nprint(total)")
+    assert payload["exit_code"] == 0
+    assert usage["limit_hit"] is None
+    assert usage["peak_rss_kb"] > 1000
+    assert usage["cpu_user_ms"] + usage["cpu_system_ms"] > 0
+    assert usage["startup_ms"] > 0 and usage["user_code_ms"] is not None
+
+
+@pytest.mark.parametrize("runner", RUNNERS)
+def test_busy_loop_hits_the_cpu_limit(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload, usage = _usage(client, "import os\nwhile True:\n    pass")
+    assert payload["exit_code"] != 0
+    assert usage["limit_hit"] == "cpu"
+    assert usage["cpu_user_ms"] + usage["cpu_system_ms"] >= 800
+
+
+@pytest.mark.parametrize("runner", RUNNERS)
+def test_sleeping_program_hits_the_wall_limit(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload, usage = _usage(client, "import time\ntime.sleep(5)")
+    assert payload["exit_code"] == 124
+    assert usage["limit_hit"] == "wall"
+    assert usage["cpu_user_ms"] + usage["cpu_system_ms"] < 500
+    assert usage["user_code_ms"] >= 800
+
+
+@pytest.mark.parametrize("runner", RUNNERS)
+def test_large_allocation_hits_the_memory_limit(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload, usage = _usage(client, "import os\nblob = bytearray(1024 * 1024 * 1024)")
+    assert "MemoryError" in payload["stderr"]
+    assert usage["limit_hit"] == "memory"
+    assert usage["peak_rss_kb"] < main.settings.run_memory_mb * 1024
+
+
+@pytest.mark.parametrize("runner", RUNNERS)
+def test_flooding_program_hits_the_output_limit(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload, usage = _usage(client, "import os\nwhile True:\n    print('x' * 99)")
+    assert payload["truncated"] is True
+    assert usage["limit_hit"] == "output"
+
+
+def test_grade_reports_the_harness_run_usage(client: TestClient):
+    payload = client.post(
+        "/grade", json={"code": "def f():\n    return 1", "cases": [{"input": "f()", "expected": 1}]}
+    ).json()
+    assert payload["verdict"] == "passed"
+    assert payload["usage"]["limit_hit"] is None
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.executor import RunExecutor
+
+
+def test_saturated_batch_reports_busy_jobs_on_their_own_lines(client: TestClient, monkeypatch):
+    # No queue at all: every job past the single running one is turned away.
+    monkeypatch.setattr(main, "run_executor", RunExecutor(max_concurrency=1, max_queue=0, max_wait_sec=3.0))
+    jobs = [{"id": f"job-{index}", "code": f"import time\ntime.sleep(0.2)\nprint({index})"} for index in range(3)]
+
+    response = client.post("/run/batch", json={"jobs": jobs})
+    assert response.status_code == 200, response.text
+    lines = {line["id"]: line for line in map(json.loads, response.text.splitlines())}
+
+    assert set(lines) == {"job-0", "job-1", "job-2"}
+    finished = [line for line in lines.values() if line.get("kind") == "run"]
+    rejected = [line for line in lines.values() if line.get("status_code") == 429]
+    assert finished and rejected
+    assert len(finished) + len(rejected) == 3
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def _no_sandbox(*args, **kwargs):
+    raise AssertionError("syntax errors must be answered without a sandbox")
+
+
+def test_syntax_error_is_answered_from_the_compile_stage(client: TestClient, monkeypatch):
+    monkeypatch.setattr(main, "execute", _no_sandbox)
+
+    response = client.post("/run", json={"code": "print('hi'\nx = 1"})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["exit_code"] == 1
+    assert payload["usage"] is None
+    assert payload["syntax_error"]["line"] == 1
+    assert "SyntaxError" in payload["stderr"]
+
+    grade = client.post("/grade", json={"code": "def f(:\n    pass", "cases": [{"input": "f()", "expected": 1}]})
+    assert grade.json()["verdict"] == "error"
+
+    health = client.get("/health").json()
+    assert health["executor"]["admitted"] == 0
+    assert health["compile_cache"]["syntax_errors"] >= 1
+
+
+def test_blocked_import_is_rejected_before_running(client: TestClient, monkeypatch):
+    monkeypatch.setattr(main, "execute", _no_sandbox)
+    response = client.post("/run", json={"code": "import subprocess\nsubprocess.run(['ls'])"})
+    assert response.status_code == 400
+    assert "subprocess" in response.json()["detail"]
+
+
+def test_repeat_source_is_compiled_once(client: TestClient):
+    code = "import os\nprint(1 + 1)"
+    for _ in range(2):
+        assert client.post("/run", json={"code": code}).json()["stdout"] == "2\n"
+    stats = client.get("/health").json()["compile_cache"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.executor import RunExecutor
+
+SLOW = "import time\ntime.sleep(1)\nprint('done')"
+
+
+def _occupy_slot(client: TestClient) -> tuple[threading.Thread, list]:
+    results: list = []
+    thread = threading.Thread(target=lambda: results.append(client.post("/run", json={"code": SLOW})))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while main.run_executor.stats()["running"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert main.run_executor.stats()["running"] == 1
+    return thread, results
+
+
+def test_full_queue_is_rejected_with_429(client: TestClient, monkeypatch):
+    monkeypatch.setattr(main, "run_executor", RunExecutor(max_concurrency=1, max_queue=0, max_wait_sec=3.0))
+    thread, results = _occupy_slot(client)
+
+    response = client.post("/run", json={"code": "import os\nprint(1)"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    thread.join()
+    assert results[0].json()["stdout"] == "done\n"
+    stats = client.get("/health").json()["executor"]
+    assert (stats["admitted"], stats["rejected"]) == (1, 1)
+
+
+def test_queued_run_past_its_wait_deadline_is_rejected(client: TestClient, monkeypatch):
+    monkeypatch.setattr(main, "run_executor", RunExecutor(max_concurrency=1, max_queue=4, max_wait_sec=0.2))
+    thread, _ = _occupy_slot(client)
+
+    started = time.monotonic()
+    response = client.post("/run", json={"code": "import os\nprint(1)"})
+    assert response.status_code == 429
+    assert time.monotonic() - started < 1
+    thread.join()
+    assert client.get("/health").json()["executor"]["timed_out"] == 1
+
+    # Once the slot frees up, runs are admitted again.
+    assert client.post("/run", json={"code": "import os\nprint(1)"}).json()["stdout"] == "1\n"
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+CASES = [
+    {"name": "small", "input": "add(1, 2)", "expected": 3},
+    {"name": "large", "input": "add(40, 2)", "expected": 42},
+]
+
+
+def test_grade_runs_cases_in_the_real_harness(client: TestClient):
+    response = client.post("/grade", json={"code": "def add(a, b):\n    return a + b\n", "cases": CASES})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["verdict"] == "passed"
+    assert [case["actual"] for case in payload["cases"]] == [3, 42]
+
+    response = client.post("/grade", json={"code": "def add(a, b):\n    return a - b\n", "cases": CASES})
+    payload = response.json()
+    assert payload["verdict"] == "failed"
+    assert payload["passed_count"] == 0
+
+
+def test_forged_report_does_not_pass(client: TestClient):
+    # Read the harness's marker, print an all-passed report and exit before the harness reports.
+    forgery = """
+import json, os, sys
+harness = sys.modules["__main__"]
+results = [{"name": case["name"], "passed": True, "actual": None, "error": None, "time_ms": 0.0}
+           for case in harness._CASES]
+sys.__stdout__.write(harness._MARKER + json.dumps({"setup_error": None, "results": results}) + "\\n")
+sys.__stdout__.flush()
+os._exit(0)
+"""
+    response = client.post("/grade", json={"code": forgery, "cases": CASES})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["verdict"] == "failed"
+    assert payload["passed_count"] == 0
+    assert [case["passed"] for case in payload["cases"]] == [False, False]
+
+
+def test_expected_values_never_enter_the_sandbox(client: TestClient):
+    cases = [{"name": "secret", "input": "answer()", "expected": "expected-9f3a1c"}]
+    snoop = """
+import sys
+harness = sys.modules["__main__"]
+with open(harness.__file__, encoding="utf-8") as source:
+    sys.__stderr__.write(source.read())
+sys.__stderr__.write(repr(vars(harness)))
+def answer():
+    return None
+"""
+    payload = client.post("/grade", json={"code": snoop, "cases": cases}).json()
+    assert payload["verdict"] == "failed"
+    assert "_MARKER" in payload["stderr"]
+    assert "expected-9f3a1c" not in payload["stderr"]
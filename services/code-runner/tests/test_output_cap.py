@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+FLOOD = "import os\nwhile True:\n    print('x' * 99)"
+
+
+@pytest.fixture(autouse=True)
+def small_output_cap(monkeypatch):
+    monkeypatch.setattr(main.settings, "run_max_output_bytes", 2000)
+
+
+@pytest.mark.parametrize("runner", ["client", "warm_client"])
+def test_flooding_program_is_stopped_at_the_cap(runner: str, request):
+    client: TestClient = request.getfixturevalue(runner)
+    payload = client.post("/run", json={"code": FLOOD}).json()
+    assert payload["truncated"] is True
+    assert len(payload["stdout"]) == 2000
+    assert "Output limit exceeded (2000 bytes per stream)" in payload["stderr"]
+    # Killed long before the run timeout.
+    assert payload["execution_time_ms"] < 2000
+
+
+def test_truncated_results_are_not_cached(client: TestClient):
+    code = "while True:\n    print('x' * 99)"
+    for _ in range(2):
+        payload = client.post("/run", json={"code": code}).json()
+        assert (payload["truncated"], payload["cached"]) == (True, False)
+
+
+def test_stream_delivers_output_live_then_the_result(client: TestClient):
+    code = "import os\nprint('first', flush=True)\nimport sys\nprint('oops', file=sys.stderr)"
+    response = client.post("/run/stream", json={"code": code})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert {"type": "stdout", "data": "first\n"} in events
+    assert {"type": "stderr", "data": "oops\n"} in events
+    result = events[-1]
+    assert result["type"] == "result"
+    assert (result["stdout"], result["exit_code"]) == ("first\n", 0)
+    assert client.get("/health").json()["executor"]["running"] == 0
+
+
+def test_stream_stops_at_the_cap(client: TestClient):
+    response = client.post("/run/stream", json={"code": FLOOD})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    streamed = "".join(event["data"] for event in events if event["type"] == "stdout")
+    assert len(streamed) == 2000
+    assert events[-1]["truncated"] is True
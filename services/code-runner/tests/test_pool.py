@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+# Each job runs in a child forked from the warm worker, so its parent pid names the worker.
+WORKER_PID = "import os\nprint(os.getppid())"
+
+
+def _worker_pid(client: TestClient) -> str:
+    response = client.post("/run", json={"code": WORKER_PID})
+    assert response.status_code == 200, response.text
+    payload = response.json()
+    assert payload["exit_code"] == 0, payload
+    return payload["stdout"].strip()
+
+
+def test_worker_is_reused_then_recycled_after_max_runs(warm_client: TestClient):
+    first = _worker_pid(warm_client)
+    assert _worker_pid(warm_client) == first
+    # max_runs=2: the worker is replaced and the next job lands on a fresh one.
+    third = _worker_pid(warm_client)
+    assert third != first
+    assert _worker_pid(warm_client) == third
+
+
+def test_worker_is_recycled_after_a_timeout(warm_client: TestClient, monkeypatch):
+    monkeypatch.setattr(main.settings, "run_timeout_sec", 1)
+    before = _worker_pid(warm_client)
+
+    response = warm_client.post("/run", json={"code": "while True:\n    pass"})
+    payload = response.json()
+    assert payload["exit_code"] == 124
+    assert payload["stderr"] == "Execution timed out."
+
+    assert _worker_pid(warm_client) != before
+
+
+def test_warm_runs_keep_a_clean_namespace(warm_client: TestClient):
+    warm_client.post("/run", json={"code": "import os\nleak = 1"})
+    payload = warm_client.post("/run", json={"code": "import os\nprint('leak' in globals())"}).json()
+    assert payload["stdout"] == "False\n"
+
+
+def test_worker_crash_after_dispatch_is_not_rerun(warm_client: TestClient, tmp_path):
+    runs = tmp_path / "runs.log"
+    # Kills its warm worker on the first run only; a re-run would append a second line.
+    code = (
+        "import os\n"
+        f"with open({str(runs)!r}, 'a') as log:\n"
+        "    log.write('ran\\n')\n"
+        f"if open({str(runs)!r}).read() == 'ran\\n':\n"
+        "    os.kill(os.getppid(), 9)\n"
+    )
+    payload = warm_client.post("/run", json={"code": code}).json()
+    assert payload["exit_code"] == 1
+    assert "not re-run" in payload["stderr"]
+    assert runs.read_text() == "ran\n"
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+
+def _run(client: TestClient, code: str, stdin: str = "") -> dict:
+    response = client.post("/run", json={"code": code, "stdin": stdin})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_deterministic_program_is_served_from_the_cache(client: TestClient):
+    code = "import math\nprint(math.factorial(int(input())))"
+    first = _run(client, code, "5")
+    assert (first["stdout"], first["cached"]) == ("120\n", False)
+    assert first["usage"] is not None
+
+    second = _run(client, code, "5")
+    assert (second["stdout"], second["cached"]) == ("120\n", True)
+    # Nothing ran, so there is nothing to account for.
+    assert second["usage"] is None
+
+    # Different stdin is a different key.
+    assert _run(client, code, "6")["cached"] is False
+    stats = client.get("/health").json()["result_cache"]
+    assert (stats["hits"], stats["stores"]) == (1, 2)
+
+
+def test_nondeterministic_program_is_never_cached(client: TestClient):
+    code = "import random\nprint(random.random() < 2)"
+    for _ in range(2):
+        payload = _run(client, code)
+        assert (payload["stdout"], payload["cached"]) == ("True\n", False)
+    stats = client.get("/health").json()["result_cache"]
+    assert stats["nondeterministic"] == 2
+    assert stats["hits"] == 0
+
+
+def test_crashing_runs_are_not_cached(client: TestClient):
+    code = "import math\nraise SystemExit(3)"
+    assert _run(client, code)["exit_code"] == 3
+    assert _run(client, code)["cached"] is False
+    assert client.get("/health").json()["result_cache"]["uncacheable"] == 2